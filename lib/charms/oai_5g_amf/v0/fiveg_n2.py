@@ -4,10 +4,11 @@
 """Interface used by provider and requirer of the 5G N2."""
 
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 
-from ops.charm import CharmBase, CharmEvents, RelationChangedEvent
-from ops.framework import EventBase, EventSource, Handle, Object
+from ops.charm import CharmBase, CharmEvents, RelationChangedEvent, RelationEvent
+from ops.framework import EventBase, EventSource, Handle, Object, StoredState
 
 # The unique Charmhub library identifier, never change it
 LIBID = "9cffc4bd8216447a9463a14ac8ecae0b"
@@ -17,12 +18,22 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 1
+LIBPATCH = 4
 
 
 logger = logging.getLogger(__name__)
 
 
+def _stream_count(value: Optional[str]) -> Optional[int]:
+    """Returns a stream count published in relation data, None if it is missing or invalid."""
+    if not value:
+        return None
+    if not value.isdigit() or int(value) == 0:
+        logger.warning("Invalid SCTP stream count in relation data: %s", value)
+        return None
+    return int(value)
+
+
 class N2AvailableEvent(EventBase):
     """Charm event emitted when an N2 is available."""
 
@@ -46,6 +57,33 @@ class N2AvailableEvent(EventBase):
         self.amf_address = snapshot["amf_address"]
 
 
+@dataclass(frozen=True)
+class N2View:
+    """Snapshot of the N2 relation data.
+
+    Attributes:
+        amf_addresses: Addresses of the AMF endpoints, the application address first followed
+            by the addresses published by the AMF units.
+        generation: Incremented by the N2 relation events every time the AMF endpoints or SCTP
+            streams differ from the ones seen before, so that charms can cheaply tell whether N2
+            data changed.
+        amf_sctp_instreams: Maximum number of inbound SCTP streams supported by the AMF, None
+            if the AMF does not publish it.
+        amf_sctp_outstreams: Number of outbound SCTP streams requested by the AMF, None if the
+            AMF does not publish it.
+    """
+
+    amf_addresses: Tuple[str, ...]
+    generation: int
+    amf_sctp_instreams: Optional[int] = None
+    amf_sctp_outstreams: Optional[int] = None
+
+    @property
+    def amf_address(self) -> Optional[str]:
+        """Returns the address of the first AMF endpoint."""
+        return self.amf_addresses[0] if self.amf_addresses else None
+
+
 class FiveGN2RequirerCharmEvents(CharmEvents):
     """List of events that the 5G N2 requirer charm can leverage."""
 
@@ -56,16 +94,39 @@ class FiveGN2Requires(Object):
     """Class to be instantiated by the charm requiring the 5G N2 Interface."""
 
     on = FiveGN2RequirerCharmEvents()
+    _stored = StoredState()
 
     def __init__(self, charm: CharmBase, relationship_name: str):
         """Init."""
         super().__init__(charm, relationship_name)
         self.charm = charm
         self.relationship_name = relationship_name
+        self._stored.set_default(generation=0, amf_addresses=[], amf_sctp_streams=[None, None])
+        self._n2_view: Optional[N2View] = None
+        for event in (
+            charm.on[relationship_name].relation_created,
+            charm.on[relationship_name].relation_joined,
+            charm.on[relationship_name].relation_changed,
+            charm.on[relationship_name].relation_departed,
+            charm.on[relationship_name].relation_broken,
+        ):
+            self.framework.observe(event, self._on_n2_relation_event)
         self.framework.observe(
             charm.on[relationship_name].relation_changed, self._on_relation_changed
         )
 
+    def _on_n2_relation_event(self, event: RelationEvent) -> None:
+        """Reads the N2 relation data again and increments the generation if it changed."""
+        amf_addresses = self._read_amf_addresses()
+        amf_sctp_streams = self._read_amf_sctp_streams()
+        if amf_addresses != list(self._stored.amf_addresses) or amf_sctp_streams != list(
+            self._stored.amf_sctp_streams
+        ):
+            self._stored.generation += 1
+            self._stored.amf_addresses = amf_addresses
+            self._stored.amf_sctp_streams = amf_sctp_streams
+        self._n2_view = self._build_n2_view(amf_addresses, amf_sctp_streams)
+
     def _on_relation_changed(self, event: RelationChangedEvent) -> None:
         """Handler triggered on relation changed event.
 
@@ -87,6 +148,81 @@ class FiveGN2Requires(Object):
             amf_address=remote_app_relation_data["amf_address"],
         )
 
+    @property
+    def n2_view(self) -> N2View:
+        """Returns the N2 relation data, read from the relation once per hook."""
+        if self._n2_view is None:
+            self._n2_view = self._build_n2_view(
+                self._read_amf_addresses(), self._read_amf_sctp_streams()
+            )
+        return self._n2_view
+
+    @property
+    def generation(self) -> int:
+        """Returns the generation of the N2 relation data, without reading the relation."""
+        return self._stored.generation
+
+    def _build_n2_view(
+        self, amf_addresses: List[str], amf_sctp_streams: List[Optional[int]]
+    ) -> N2View:
+        return N2View(
+            amf_addresses=tuple(amf_addresses),
+            generation=self._stored.generation,
+            amf_sctp_instreams=amf_sctp_streams[0],
+            amf_sctp_outstreams=amf_sctp_streams[1],
+        )
+
+    def _read_amf_addresses(self) -> List[str]:
+        """Returns the AMF addresses published by the remote application and its units."""
+        relation = self.model.get_relation(relation_name=self.relationship_name)
+        if not relation or not relation.app:
+            return []
+        amf_addresses: List[str] = []
+        remote_databags = [relation.data[relation.app]] + [
+            relation.data[unit] for unit in sorted(relation.units, key=lambda unit: unit.name)
+        ]
+        for databag in remote_databags:
+            amf_address = databag.get("amf_address")
+            if amf_address and amf_address not in amf_addresses:
+                amf_addresses.append(amf_address)
+        return amf_addresses
+
+    def _read_amf_sctp_streams(self) -> List[Optional[int]]:
+        """Returns the SCTP inbound and outbound stream counts published by the AMF."""
+        relation = self.model.get_relation(relation_name=self.relationship_name)
+        if not relation or not relation.app:
+            return [None, None]
+        remote_app_relation_data = relation.data[relation.app]
+        return [
+            _stream_count(remote_app_relation_data.get(key))
+            for key in ("amf_sctp_instreams", "amf_sctp_outstreams")
+        ]
+
+    def set_gnb_sctp_streams(self, sctp_instreams: int, sctp_outstreams: int) -> bool:
+        """Publishes the SCTP stream counts of the gNB, so that the AMF can match them.
+
+        Only the leader unit can publish them. Nothing is written if they are already set.
+
+        Args:
+            sctp_instreams: Maximum number of inbound SCTP streams of the gNB.
+            sctp_outstreams: Number of outbound SCTP streams requested by the gNB.
+
+        Returns:
+            bool: Whether the relation data was written.
+        """
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
+        sctp_streams = {
+            "gnb_sctp_instreams": str(sctp_instreams),
+            "gnb_sctp_outstreams": str(sctp_outstreams),
+        }
+        local_app_data = relation.data[self.charm.app]
+        if all(local_app_data.get(key) == value for key, value in sctp_streams.items()):
+            return False
+        local_app_data.update(sctp_streams)
+        return True
+
     @property
     def amf_address_available(self) -> bool:
         """Returns whether amf address is available in relation data."""
@@ -98,11 +234,12 @@ class FiveGN2Requires(Object):
     @property
     def amf_address(self) -> Optional[str]:
         """Returns amf_address from relation data."""
-        relation = self.model.get_relation(relation_name=self.relationship_name)
-        remote_app_relation_data = relation.data.get(relation.app)
-        if not remote_app_relation_data:
-            return None
-        return remote_app_relation_data.get("amf_address", None)
+        return self.n2_view.amf_address
+
+    @property
+    def amf_addresses(self) -> Tuple[str, ...]:
+        """Returns the addresses of all the AMF endpoints from relation data."""
+        return self.n2_view.amf_addresses
 
 
 class FiveGN2Provides(Object):
@@ -136,3 +273,52 @@ class FiveGN2Provides(Object):
                 "amf_address": amf_address,
             }
         )
+
+    def set_amf_unit_information(
+        self,
+        amf_address: str,
+        relation_id: int,
+    ) -> None:
+        """Sets the N2 address of this AMF unit in unit relation data.
+
+        Args:
+            amf_address: N2 address of the unit
+            relation_id: Relation ID
+
+        Returns:
+            None
+        """
+        relation = self.model.get_relation(self.relationship_name, relation_id=relation_id)
+        if not relation:
+            raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
+        relation.data[self.charm.unit].update(
+            {
+                "amf_address": amf_address,
+            }
+        )
+
+    def set_amf_sctp_streams(
+        self,
+        sctp_instreams: int,
+        sctp_outstreams: int,
+        relation_id: int,
+    ) -> None:
+        """Publishes the SCTP stream counts supported by the AMF in relation data.
+
+        Args:
+            sctp_instreams: Maximum number of inbound SCTP streams of the AMF.
+            sctp_outstreams: Number of outbound SCTP streams requested by the AMF.
+            relation_id: Relation ID
+
+        Returns:
+            None
+        """
+        relation = self.model.get_relation(self.relationship_name, relation_id=relation_id)
+        if not relation:
+            raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
+        relation.data[self.charm.app].update(
+            {
+                "amf_sctp_instreams": str(sctp_instreams),
+                "amf_sctp_outstreams": str(sctp_outstreams),
+            }
+        )
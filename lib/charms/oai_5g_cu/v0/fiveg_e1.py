@@ -0,0 +1,153 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Interface used by provider and requirer of the 5G E1.
+
+The E1 interface connects a CU-CP, which provides it, to its CU-UPs, which require it. The
+CU-CP publishes the address and port it listens on for E1 in its application data. Every CU-UP
+unit publishes its own address in its unit data, as CU-UP units scale independently and each
+one sets up its own E1 association.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from ops.charm import CharmBase
+from ops.framework import Object
+from ops.model import Relation
+
+# The unique Charmhub library identifier, never change it
+# TODO: This library is not registered on Charmhub yet. Replace this placeholder with the ID
+# returned by `charmcraft create-lib oai-5g-cu fiveg_e1` before publishing or fetching it.
+LIBID = "placeholder-fiveg-e1-not-registered"
+
+# Increment this major API version when introducing breaking changes
+LIBAPI = 0
+
+# Increment this PATCH version before using `charmcraft publish-lib` or reset
+# to 0 if you are raising the major API version
+LIBPATCH = 1
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class E1CUUPEndpoint:
+    """E1 endpoint published by a CU-UP unit."""
+
+    relation_id: int
+    unit_name: str
+    cuup_address: str
+
+
+class FiveGE1Provides(Object):
+    """Class to be instantiated by the CU-CP charm providing the 5G E1 Interface."""
+
+    def __init__(self, charm: CharmBase, relationship_name: str):
+        """Init."""
+        super().__init__(charm, relationship_name)
+        self.relationship_name = relationship_name
+        self.charm = charm
+
+    def publish_cucp_information(self, cucp_address: str, cucp_port: str) -> int:
+        """Sets E1 information in relation data, only for the relations where it differs.
+
+        Args:
+            cucp_address: E1 CU-CP address
+            cucp_port: E1 CU-CP port
+
+        Returns:
+            int: Number of relations whose data was written.
+        """
+        cucp_information = {"cucp_address": cucp_address, "cucp_port": cucp_port}
+        outdated_relations = [
+            relation
+            for relation in self.model.relations[self.relationship_name]
+            if not self._cucp_data_is_set(relation, cucp_information)
+        ]
+        for relation in outdated_relations:
+            relation.data[self.charm.app].update(cucp_information)
+        if outdated_relations:
+            logger.info(
+                "CU-CP information set in %d %s relation(s)",
+                len(outdated_relations),
+                self.relationship_name,
+            )
+        return len(outdated_relations)
+
+    def _cucp_data_is_set(self, relation: Relation, cucp_information: dict) -> bool:
+        """Returns whether the CU-CP information is set in the data of a relation."""
+        local_app_relation_data = relation.data[self.charm.app]
+        return all(
+            local_app_relation_data.get(key) == value for key, value in cucp_information.items()
+        )
+
+    @property
+    def cuup_endpoints(self) -> List[E1CUUPEndpoint]:
+        """Returns the E1 endpoints of all the CU-UP units which published their address.
+
+        Returns:
+            List: CU-UP endpoints ordered by relation ID and unit name.
+        """
+        cuup_endpoints = []
+        for relation in sorted(self.model.relations[self.relationship_name], key=lambda r: r.id):
+            for unit in sorted(relation.units, key=lambda unit: unit.name):
+                cuup_address = relation.data[unit].get("cuup_address")
+                if cuup_address:
+                    cuup_endpoints.append(
+                        E1CUUPEndpoint(
+                            relation_id=relation.id,
+                            unit_name=unit.name,
+                            cuup_address=cuup_address,
+                        )
+                    )
+        return cuup_endpoints
+
+
+class FiveGE1Requires(Object):
+    """Class to be instantiated by the CU-UP charm requiring the 5G E1 Interface."""
+
+    def __init__(self, charm: CharmBase, relationship_name: str):
+        """Init."""
+        super().__init__(charm, relationship_name)
+        self.charm = charm
+        self.relationship_name = relationship_name
+
+    @property
+    def _remote_app_data(self) -> dict:
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation or not relation.app:
+            return {}
+        return dict(relation.data[relation.app])
+
+    @property
+    def cucp_address(self) -> Optional[str]:
+        """Returns cucp_address from relation data."""
+        return self._remote_app_data.get("cucp_address")
+
+    @property
+    def cucp_port(self) -> Optional[str]:
+        """Returns cucp_port from relation data."""
+        return self._remote_app_data.get("cucp_port")
+
+    def set_cuup_information(self, cuup_address: str) -> bool:
+        """Publishes the E1 address of this CU-UP unit in unit relation data.
+
+        Nothing is written if it is already set.
+
+        Args:
+            cuup_address: E1 address of the unit
+
+        Returns:
+            bool: Whether the relation data was written.
+        """
+        relation = self.model.get_relation(self.relationship_name)
+        if not relation:
+            raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
+        local_unit_relation_data = relation.data[self.charm.unit]
+        if local_unit_relation_data.get("cuup_address") == cuup_address:
+            return False
+        local_unit_relation_data["cuup_address"] = cuup_address
+        return True
@@ -4,10 +4,13 @@
 """Interface used by provider and requirer of the 5G F1."""
 
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Mapping, Optional
 
-from ops.charm import CharmBase, CharmEvents, RelationChangedEvent
+from ops.charm import CharmBase, CharmEvents, RelationChangedEvent, RelationEvent
 from ops.framework import EventBase, EventSource, Handle, Object
+from ops.model import Model, Relation, TooManyRelatedAppsError
 
 
 # The unique Charmhub library identifier, never change it
@@ -18,12 +21,88 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 4
+LIBPATCH = 7
 
 
 logger = logging.getLogger(__name__)
 
 
+def _remote_app_data_snapshot(
+    model: Model, relationship_name: str
+) -> Mapping[int, Mapping[str, str]]:
+    """Returns a read-only copy of the remote application data of all relations of an endpoint.
+
+    Args:
+        model: Juju model
+        relationship_name: Relation name
+
+    Returns:
+        Mapping: Remote application data by relation ID, for the relations whose remote
+            application is known.
+    """
+    return MappingProxyType(
+        {
+            relation.id: MappingProxyType(dict(relation.data[relation.app]))
+            for relation in model.relations[relationship_name]
+            if relation.app
+        }
+    )
+
+
+class _RemoteAppDataSnapshot(Object):
+    """Reads the remote application data of the relations once and serves it from memory.
+
+    The snapshot is invalidated on every event of the relation, so that its content is never
+    older than the event being handled.
+    """
+
+    def __init__(self, charm: CharmBase, relationship_name: str):
+        """Init."""
+        super().__init__(charm, f"{relationship_name}-remote-app-data")
+        self.relationship_name = relationship_name
+        self._snapshot: Optional[Mapping[int, Mapping[str, str]]] = None
+        for event in (
+            charm.on[relationship_name].relation_created,
+            charm.on[relationship_name].relation_joined,
+            charm.on[relationship_name].relation_changed,
+            charm.on[relationship_name].relation_departed,
+            charm.on[relationship_name].relation_broken,
+        ):
+            self.framework.observe(event, self._on_relation_event)
+
+    def _on_relation_event(self, event: RelationEvent) -> None:
+        """Invalidates the snapshot."""
+        self._snapshot = None
+
+    @property
+    def data_by_relation_id(self) -> Mapping[int, Mapping[str, str]]:
+        """Returns the remote application data of every relation, read on first access."""
+        if self._snapshot is None:
+            self._snapshot = _remote_app_data_snapshot(self.model, self.relationship_name)
+        return self._snapshot
+
+    @property
+    def data(self) -> Mapping[str, str]:
+        """Returns the remote application data of the only relation.
+
+        Raises:
+            TooManyRelatedAppsError: if there is more than one relation.
+        """
+        data_by_relation_id = self.data_by_relation_id
+        if len(data_by_relation_id) > 1:
+            raise TooManyRelatedAppsError(self.relationship_name, len(data_by_relation_id), 1)
+        return next(iter(data_by_relation_id.values()), MappingProxyType({}))
+
+
+@dataclass(frozen=True)
+class F1DUEndpoint:
+    """F1 endpoint published by a DU."""
+
+    relation_id: int
+    du_address: str
+    du_port: str
+
+
 class F1CUAvailableEvent(EventBase):
     """Charm event emitted when an F1 is available."""
 
@@ -99,6 +178,7 @@ class FiveGF1Requires(Object):
         super().__init__(charm, relationship_name)
         self.charm = charm
         self.relationship_name = relationship_name
+        self._remote_app_data = _RemoteAppDataSnapshot(charm, relationship_name)
         self.framework.observe(
             charm.on[relationship_name].relation_changed, self._on_relation_changed
         )
@@ -139,11 +219,7 @@ class FiveGF1Requires(Object):
     @property
     def cu_address(self) -> Optional[str]:
         """Returns cu_address from relation data."""
-        relation = self.model.get_relation(relation_name=self.relationship_name)
-        remote_app_relation_data = relation.data.get(relation.app)
-        if not remote_app_relation_data:
-            return None
-        return remote_app_relation_data.get("cu_address", None)
+        return self._remote_app_data.data.get("cu_address", None)
 
     @property
     def cu_port_available(self) -> bool:
@@ -156,11 +232,7 @@ class FiveGF1Requires(Object):
     @property
     def cu_port(self) -> Optional[str]:
         """Returns cu_port from relation data."""
-        relation = self.model.get_relation(relation_name=self.relationship_name)
-        remote_app_relation_data = relation.data.get(relation.app)
-        if not remote_app_relation_data:
-            return None
-        return remote_app_relation_data.get("cu_port", None)
+        return self._remote_app_data.data.get("cu_port", None)
     
     def set_du_information(
         self,
@@ -197,6 +269,7 @@ class FiveGF1Provides(Object):
         super().__init__(charm, relationship_name)
         self.relationship_name = relationship_name
         self.charm = charm
+        self._remote_app_data = _RemoteAppDataSnapshot(charm, relationship_name)
 
     def set_cu_information(
         self,
@@ -217,7 +290,7 @@ class FiveGF1Provides(Object):
         relation = self.model.get_relation(self.relationship_name, relation_id=relation_id)
         if not relation:
             raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
-        if self.cu_data_is_set(cu_address=cu_address, cu_port=cu_port):
+        if self._cu_data_is_set(relation=relation, cu_address=cu_address, cu_port=cu_port):
             return
         relation.data[self.charm.app].update(
             {
@@ -226,31 +299,78 @@ class FiveGF1Provides(Object):
             }
         )
 
-    def set_cu_information_for_all_relations(self, cu_address: str, cu_port: str):
-        relations = self.model.relations
-        for relation in relations[self.relationship_name]:
-            self.set_cu_information(
-                cu_address=cu_address,
-                cu_port=cu_port,
-                relation_id=relation.id,
+    def set_cu_information_for_all_relations(self, cu_address: str, cu_port: str) -> int:
+        """Sets F1 information in relation data for all relations.
+
+        Args:
+            cu_address: F1 CU address
+            cu_port: F1 CU port
+
+        Returns:
+            int: Number of relations whose data was written.
+        """
+        return self.publish_cu_information(cu_address=cu_address, cu_port=cu_port)
+
+    def publish_cu_information(self, cu_address: str, cu_port: str) -> int:
+        """Sets F1 information in relation data, only for the relations where it differs.
+
+        The relations to update are computed in a single pass over the local application data,
+        so that relations which already contain the CU information are neither read twice nor
+        written to.
+
+        Args:
+            cu_address: F1 CU address
+            cu_port: F1 CU port
+
+        Returns:
+            int: Number of relations whose data was written.
+        """
+        outdated_relations = [
+            relation
+            for relation in self.model.relations[self.relationship_name]
+            if not self._cu_data_is_set(relation=relation, cu_address=cu_address, cu_port=cu_port)
+        ]
+        for relation in outdated_relations:
+            relation.data[self.charm.app].update(
+                {
+                    "cu_address": cu_address,
+                    "cu_port": cu_port,
+                }
+            )
+        if outdated_relations:
+            logger.info(
+                "CU information set in %d %s relation(s)",
+                len(outdated_relations),
+                self.relationship_name,
             )
+        return len(outdated_relations)
+
+    def cu_data_is_set(
+        self, cu_address: str, cu_port: str, relation_id: Optional[int] = None
+    ) -> bool:
+        """Returns whether cu_address and cu_port are set in relation data.
+
+        Args:
+            cu_address: F1 CU address
+            cu_port: F1 CU port
+            relation_id: Relation ID, may be omitted when there is a single relation.
 
-    def cu_data_is_set(self, cu_address: str, cu_port: str) -> bool:
-        """Returns whether cu_address is set in relation data."""
-        relation = self.model.get_relation(self.relationship_name)
+        Returns:
+            bool: Whether the CU information is set in relation data.
+        """
+        relation = self.model.get_relation(self.relationship_name, relation_id=relation_id)
         if not relation:
             raise RuntimeError(f"Relation {self.relationship_name} not created yet.")
-        if "cu_address" not in relation.data[self.charm.app]:
-            logger.info("cu_address not set in relation data")
-            return False
-        if relation.data[self.charm.app]["cu_address"] != cu_address:
-            logger.info(f"cu_address not set to {cu_address} in relation data")
-            return False
-        if "cu_port" not in relation.data[self.charm.app]:
-            logger.info("cu_port not set in relation data")
+        return self._cu_data_is_set(relation=relation, cu_address=cu_address, cu_port=cu_port)
+
+    def _cu_data_is_set(self, relation: Relation, cu_address: str, cu_port: str) -> bool:
+        """Returns whether cu_address and cu_port are set in the data of a relation."""
+        local_app_relation_data = relation.data[self.charm.app]
+        if local_app_relation_data.get("cu_address") != cu_address:
+            logger.info(f"cu_address not set to {cu_address} in relation {relation.id} data")
             return False
-        if relation.data[self.charm.app]["cu_port"] != cu_port:
-            logger.info(f"cu_port not set to {cu_port} in relation data")
+        if local_app_relation_data.get("cu_port") != cu_port:
+            logger.info(f"cu_port not set to {cu_port} in relation {relation.id} data")
             return False
         return True
 
@@ -279,6 +399,25 @@ class FiveGF1Provides(Object):
             du_port=remote_app_relation_data["du_port"],
         )
 
+    @property
+    def du_endpoints(self) -> List[F1DUEndpoint]:
+        """Returns the F1 endpoints of all the DUs which published their address and port.
+
+        Returns:
+            List: DU endpoints ordered by relation ID.
+        """
+        return [
+            F1DUEndpoint(
+                relation_id=relation_id,
+                du_address=relation_data["du_address"],
+                du_port=relation_data["du_port"],
+            )
+            for relation_id, relation_data in sorted(
+                self._remote_app_data.data_by_relation_id.items()
+            )
+            if relation_data.get("du_address") and relation_data.get("du_port")
+        ]
+
     @property
     def du_address_available(self) -> bool:
         """Returns whether du address is available in relation data."""
@@ -290,11 +429,7 @@ class FiveGF1Provides(Object):
     @property
     def du_address(self) -> Optional[str]:
         """Returns du_address from relation data."""
-        relation = self.model.get_relation(relation_name=self.relationship_name)
-        remote_app_relation_data = relation.data.get(relation.app)
-        if not remote_app_relation_data:
-            return None
-        return remote_app_relation_data.get("du_address", None)
+        return self._remote_app_data.data.get("du_address", None)
 
     @property
     def du_port_available(self) -> bool:
@@ -307,8 +442,4 @@ class FiveGF1Provides(Object):
     @property
     def du_port(self) -> Optional[str]:
         """Returns du_port from relation data."""
-        relation = self.model.get_relation(relation_name=self.relationship_name)
-        remote_app_relation_data = relation.data.get(relation.app)
-        if not remote_app_relation_data:
-            return None
-        return remote_app_relation_data.get("du_port", None)
+        return self._remote_app_data.data.get("du_port", None)
@@ -0,0 +1,106 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""CPU allocation of a workload container, read from its cgroup through Pebble."""
+
+import logging
+from typing import Optional
+
+from ops.model import Container
+from ops.pebble import ConnectionError, PathError
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX_PATH = "/sys/fs/cgroup/cpu.max"
+CGROUP_V2_CPUSET_PATH = "/sys/fs/cgroup/cpuset.cpus.effective"
+CGROUP_V1_CPU_QUOTA_PATH = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD_PATH = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_V1_CPUSET_PATH = "/sys/fs/cgroup/cpuset/cpuset.effective_cpus"
+
+
+def parse_cpu_max(content: str) -> Optional[float]:
+    """Returns the number of CPUs allowed by a cgroup v2 `cpu.max` file.
+
+    Args:
+        content: Content of the file, e.g. `200000 100000` or `max 100000`.
+
+    Returns:
+        float: Number of CPUs, None if the cgroup has no CPU quota.
+    """
+    fields = content.split()
+    if not fields or fields[0] == "max":
+        return None
+    period = int(fields[1]) if len(fields) > 1 else 100000
+    return int(fields[0]) / period
+
+
+def parse_cfs_quota(quota: str, period: str) -> Optional[float]:
+    """Returns the number of CPUs allowed by the cgroup v1 CFS quota and period.
+
+    Args:
+        quota: Content of `cpu.cfs_quota_us`, -1 if the cgroup has no CPU quota.
+        period: Content of `cpu.cfs_period_us`.
+
+    Returns:
+        float: Number of CPUs, None if the cgroup has no CPU quota.
+    """
+    quota_us = int(quota)
+    if quota_us < 0:
+        return None
+    return quota_us / int(period)
+
+
+def parse_cpu_list(content: str) -> Optional[int]:
+    """Returns the number of CPUs of a cpuset list such as `0-3,6`.
+
+    Args:
+        content: CPU list.
+
+    Returns:
+        int: Number of CPUs, None if the list is empty.
+    """
+    cpu_count = 0
+    for cpu_range in content.strip().split(","):
+        if not cpu_range:
+            continue
+        first, _, last = cpu_range.partition("-")
+        cpu_count += int(last) - int(first) + 1 if last else 1
+    return cpu_count or None
+
+
+def container_cpu_count(container: Container) -> Optional[int]:
+    """Returns the number of CPUs the workload container can use.
+
+    The CPU quota is rounded down so that threads sized after it are not throttled, and it is
+    capped by the number of CPUs of the container's cpuset. Both cgroup v2 and v1 are supported.
+
+    Args:
+        container: Workload container.
+
+    Returns:
+        int: Number of CPUs, None if the cgroup has neither a CPU quota nor a cpuset.
+    """
+    cpu_max = _read(container, CGROUP_V2_CPU_MAX_PATH)
+    if cpu_max is not None:
+        quota = parse_cpu_max(cpu_max)
+        cpuset = _read(container, CGROUP_V2_CPUSET_PATH)
+    else:
+        cfs_quota = _read(container, CGROUP_V1_CPU_QUOTA_PATH)
+        cfs_period = _read(container, CGROUP_V1_CPU_PERIOD_PATH)
+        quota = parse_cfs_quota(cfs_quota, cfs_period) if cfs_quota and cfs_period else None
+        cpuset = _read(container, CGROUP_V1_CPUSET_PATH)
+    cpuset_cpu_count = parse_cpu_list(cpuset) if cpuset else None
+    cpu_counts = [max(1, int(quota)) if quota else None, cpuset_cpu_count]
+    allowed_cpu_counts = [cpu_count for cpu_count in cpu_counts if cpu_count]
+    if not allowed_cpu_counts:
+        return None
+    return min(allowed_cpu_counts)
+
+
+def _read(container: Container, path: str) -> Optional[str]:
+    """Returns the content of a file of the container, None if it can't be read."""
+    try:
+        return container.pull(path).read()
+    except (ConnectionError, PathError) as e:
+        logger.debug(f"Could not read {path}: {e}")
+        return None
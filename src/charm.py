@@ -4,113 +4,299 @@
 
 """Charmed Operator for the OpenAirInterface 5G Core CU component."""
 
-
+import hashlib
+import ipaddress
+import json
 import logging
+import re
+import time
+from dataclasses import asdict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 from charms.oai_5g_amf.v0.fiveg_n2 import FiveGN2Requires  # type: ignore[import]
-from charms.oai_5g_cu.v0.fiveg_f1 import FiveGF1Provides  # type: ignore[import]
-from charms.observability_libs.v1.kubernetes_service_patch import (  # type: ignore[import]
-    KubernetesServicePatch,
-    ServicePort,
+from charms.oai_5g_cu.v0.fiveg_e1 import (  # type: ignore[import]
+    FiveGE1Provides,
+    FiveGE1Requires,
+)
+from charms.oai_5g_cu.v0.fiveg_f1 import (  # type: ignore[import]
+    F1DUEndpoint,
+    FiveGF1Provides,
+)
+from charms.prometheus_k8s.v0.prometheus_scrape import (  # type: ignore[import]
+    MetricsEndpointProvider,
 )
-from jinja2 import Environment, FileSystemLoader
-from ops.charm import CharmBase, ConfigChangedEvent, InstallEvent
+from ops.charm import (
+    CharmBase,
+    InstallEvent,
+    PebbleCheckFailedEvent,
+    PebbleCheckRecoveredEvent,
+    PebbleReadyEvent,
+    RemoveEvent,
+    UpdateStatusEvent,
+    UpgradeCharmEvent,
+)
+from ops.framework import EventBase, StoredState
 from ops.main import main
-from ops.model import ActiveStatus, BlockedStatus, ModelError, WaitingStatus
+from ops.model import ActiveStatus, BlockedStatus, ModelError, StatusBase, WaitingStatus
+from ops.pebble import ChangeError, ConnectionError, Layer, Plan
 
+from cgroup import container_cpu_count
+from du_assignment import assign_dus
+from instrumentation import Tracer
 from kubernetes_client import KubernetesClient
+from log_config import (
+    GLOBAL_LOG_OPTIONS,
+    LOG_PROFILES,
+    log_levels,
+    parse_log_level_overrides,
+)
+
+if TYPE_CHECKING:
+    from jinja2 import Template
 
 logger = logging.getLogger(__name__)
 
 BASE_CONFIG_PATH = "/opt/oai-gnb/etc"
 CONFIG_FILE_NAME = "gnb.conf"
+WORKING_DIRECTORY = "/opt/oai-gnb"
+EXPORTER_SOURCE_PATH = "src/cu_exporter.py"
+EXPORTER_PATH = "/opt/oai-gnb/bin/cu-exporter.py"
+EXPORTER_SERVICE_NAME = "cu-exporter"
+METRICS_PORT = 9102
+TEMPLATES_DIRECTORY = "src/templates/"
+KUBERNETES_CACHE_TTL_SECONDS = 30
+LOAD_BALANCER_ADDRESS_TIMEOUT_SECONDS = 30
+F1_DU_WILDCARD_ADDRESS = "0.0.0.0"
+AUTO_THREAD_COUNT = "auto"
+DEFAULT_THREAD_COUNT = 8
+MEMORY_QUANTITY_PATTERN = re.compile(r"^[1-9][0-9]*(Ki|Mi|Gi|Ti|Pi|Ei|k|M|G|T|P|E)?$")
+HUGEPAGE_SIZES_IN_BYTES = {"2Mi": 2 * 1024**2, "1Gi": 1024**3}
+MIN_SCTP_STREAMS = 1
+MAX_SCTP_STREAMS = 1024
+F1C_PORT = 501  # local_s_portc in the config template
+NGAP_PORT = 38412
+SCTP_ENDPOINTS_PATH = "/proc/net/sctp/eps"
+SCTP_ASSOCIATIONS_PATH = "/proc/net/sctp/assocs"
+UDP_SOCKETS_PATH = "/proc/net/udp"
+CHECK_PERIOD = "10s"
+CHECK_THRESHOLD = 3
+FAILING_CHECKS_STATUS_MESSAGE = "Waiting for CU checks to pass"
+PEER_RELATION_NAME = "cu-peers"
+E1_PORT = 38462
+CU_ROLE = "cu"
+CU_CP_ROLE = "cu-cp"
+CU_UP_ROLE = "cu-up"
+CONFIG_TEMPLATE_NAMES = {
+    CU_ROLE: f"{CONFIG_FILE_NAME}.j2",
+    CU_CP_ROLE: f"{CONFIG_FILE_NAME}.j2",
+    CU_UP_ROLE: "cuup.conf.j2",
+}
+E1_CUUP_WILDCARD_ADDRESS = "0.0.0.0"
+F1U_INTERFACE_NAME = "f1u"
+NGU_INTERFACE_NAME = "ngu"
+MACVLAN_CNI_TYPE = "macvlan"
+SRIOV_CNI_TYPE = "sriov"
+CNI_VERSION = "0.3.1"
+POD_NAME_LABEL = "statefulset.kubernetes.io/pod-name"
+
+
+@lru_cache(maxsize=None)
+def _get_template(template_name: str) -> "Template":
+    """Returns a compiled jinja2 template, cached for the lifetime of the process.
+
+    Args:
+        template_name: Name of the template file in the templates directory.
+
+    Returns:
+        Template: Compiled jinja2 template.
+    """
+    from jinja2 import Environment, FileSystemLoader
+
+    jinja2_environment = Environment(loader=FileSystemLoader(TEMPLATES_DIRECTORY))
+    return jinja2_environment.get_template(template_name)
+
+
+def _thread_count_is_valid(config_value: str) -> bool:
+    """Returns whether a thread count config option is `auto` or a positive integer."""
+    if config_value == AUTO_THREAD_COUNT:
+        return True
+    return config_value.isdigit() and int(config_value) > 0
+
+
+def _sctp_stream_count_is_valid(config_value: str) -> bool:
+    """Returns whether an SCTP stream count config option is an integer within bounds."""
+    if not config_value.isdigit():
+        return False
+    return MIN_SCTP_STREAMS <= int(config_value) <= MAX_SCTP_STREAMS
+
+
+def _sctp_listener_check_command(port: int) -> str:
+    """Returns a command succeeding once an SCTP endpoint listens on the local port.
+
+    The local port is the 6th column of /proc/net/sctp/eps.
+    """
+    return f"grep -qE '^ *([^ ]+ +){{5}}{port} ' {SCTP_ENDPOINTS_PATH}"
+
+
+def _sctp_association_check_command(remote_port: int) -> str:
+    """Returns a command succeeding once an SCTP association is established to the remote port.
+
+    The remote port is the 13th column of /proc/net/sctp/assocs.
+    """
+    return f"grep -qE '^ *([^ ]+ +){{12}}{remote_port} ' {SCTP_ASSOCIATIONS_PATH}"
+
+
+def _udp_listener_check_command(port: int) -> str:
+    """Returns a command succeeding once a UDP socket is bound to the local port.
+
+    The local address is the 2nd column of /proc/net/udp, its port being in hexadecimal.
+    """
+    return f"grep -qE '^ *[0-9]+: [0-9A-F]+:{port:04X} ' {UDP_SOCKETS_PATH}"
+
+
+def _ipv4_interface_is_valid(config_value: str) -> bool:
+    """Returns whether a config option is an IPv4 address with its prefix, e.g. `10.0.0.5/24`."""
+    try:
+        interface = ipaddress.ip_interface(config_value)
+    except ValueError:
+        return False
+    return interface.version == 4 and "/" in config_value
+
+
+def _content_hash(content: str) -> str:
+    """Returns the SHA-256 hex digest of a file content."""
+    return hashlib.sha256(content.encode()).hexdigest()
 
 
 class Oai5GCUOperatorCharm(CharmBase):
     """Charm the service."""
 
+    _stored = StoredState()
+
     def __init__(self, *args):
         """Observes juju events."""
         super().__init__(*args)
+        self._stored.set_default(
+            statefulset_resources={},
+            statefulset_hugepages_page_size="",
+            statefulset_networks="{}",
+            statefulset_patch_pending=False,
+            failing_checks=[],
+            applied_fingerprint="",
+            service_fingerprints="{}",
+            installed_at=None,
+            time_to_active_seconds=None,
+            unit_service_name="",
+        )
         self._container_name = self._service_name = "cu"
         self._container = self.unit.get_container(self._container_name)
-        self.service_patcher = KubernetesServicePatch(
-            service_type="LoadBalancer",
-            charm=self,
-            ports=[
-                ServicePort(
-                    name="s1c",
-                    port=int(self._config_gnb_s1c_port),
-                    protocol="SCTP",
-                    targetPort=int(self._config_gnb_s1c_port),
-                ),
-                ServicePort(
-                    name="s1u",
-                    port=int(self._config_gnb_s1u_port),
-                    protocol="UDP",
-                    targetPort=int(self._config_gnb_s1u_port),
-                ),
-                ServicePort(
-                    name="x2c",
-                    port=int(self._config_gnb_x2c_port),
-                    protocol="UDP",
-                    targetPort=int(self._config_gnb_x2c_port),
-                ),
-                ServicePort(
-                    name="f1",
-                    port=int(self._config_f1_cu_port),
-                    protocol="UDP",
-                    targetPort=int(self._config_f1_cu_port),
-                ),
-            ],
-        )
         self.f1_provides = FiveGF1Provides(self, "fiveg-f1")
         self.amf_n2_requires = FiveGN2Requires(self, "fiveg-n2")
-        self.kubernetes = KubernetesClient(namespace=self.model.name)
+        self.e1_provides = FiveGE1Provides(self, "fiveg-e1")
+        self.e1_requires = FiveGE1Requires(self, "fiveg-e1-cu-cp")
+        self.kubernetes = KubernetesClient(
+            namespace=self.model.name, cache_ttl=KUBERNETES_CACHE_TTL_SECONDS
+        )
+        self._cpu_count: Optional[int] = None
+        self._reconciled_fingerprint: Optional[str] = None
+        self._load_balancer_has_address: Optional[bool] = None
+        self.tracer = Tracer()
+        self.metrics_endpoint = MetricsEndpointProvider(
+            self, jobs=[{"static_configs": [{"targets": [f"*:{METRICS_PORT}"]}]}]
+        )
         self.framework.observe(self.on.install, self._on_install)
-        self.framework.observe(self.on.config_changed, self._on_config_changed)
-        self.framework.observe(self.on.fiveg_n2_relation_changed, self._on_config_changed)
-        self.framework.observe(self.on.fiveg_f1_relation_joined, self._on_fiveg_f1_relation_joined)
-        self.framework.observe(self.on.fiveg_f1_relation_changed, self._on_config_changed)
-
-    def _on_fiveg_f1_relation_joined(self, event) -> None:
-        """Triggered when a relation is joined.
-
-        Args:
-            event: Relation Joined Event
-        """
-        if not self.unit.is_leader():
-            return
-        if not self._cu_service_started:
-            logger.info("CU service not started yet, deferring event")
-            event.defer()
-            return
-        self._set_f1_relation_data(event.relation.id)
-
-    def _set_f1_relation_data(self, relation_id: int) -> None:
-        """Sets F1 relation data."""
-        cu_hostname, cu_ipv4_address = self.kubernetes.get_service_load_balancer_address(
-            name=self.app.name
+        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
+        self.framework.observe(self.on.remove, self._on_remove)
+        for event in (
+            self.on.config_changed,
+            self.on.update_status,
+            self.on.leader_elected,
+            self.on[self._container_name].pebble_ready,
+            self.on.fiveg_n2_relation_changed,
+            self.on.fiveg_n2_relation_broken,
+            self.on.fiveg_f1_relation_joined,
+            self.on.fiveg_f1_relation_changed,
+            self.on.fiveg_f1_relation_broken,
+            self.on.fiveg_e1_relation_changed,
+            self.on.fiveg_e1_relation_broken,
+            self.on.fiveg_e1_cu_cp_relation_changed,
+            self.on.fiveg_e1_cu_cp_relation_broken,
+            self.on[PEER_RELATION_NAME].relation_changed,
+            self.on[PEER_RELATION_NAME].relation_departed,
+        ):
+            self.framework.observe(event, self._reconcile)
+        self.framework.observe(
+            self.on[self._container_name].pebble_check_failed, self._on_pebble_check_failed
         )
-        if not cu_ipv4_address:
-            raise Exception("Loadbalancer doesn't have an IP address")
-        self.f1_provides.set_cu_information(
-            cu_address=cu_ipv4_address,
-            cu_port=self._config_f1_cu_port,
-            relation_id=relation_id,
+        self.framework.observe(
+            self.on[self._container_name].pebble_check_recovered, self._on_pebble_check_recovered
         )
 
     @property
     def _cu_service_started(self) -> bool:
-        if not self._container.can_connect():
-            return False
+        """Returns whether the CU service is running, reading it from Pebble."""
         try:
             service = self._container.get_service(self._service_name)
-        except ModelError:
-            return False
-        if not service.is_running():
+        except (ConnectionError, ModelError):
             return False
-        return True
+        return service.is_running()
+
+    @property
+    def _cu_service_healthy(self) -> bool:
+        """Returns whether the CU service is running and none of its health checks is failing.
+
+        Failing checks are tracked from the Pebble check events rather than read from Pebble.
+        """
+        return not self._stored.failing_checks and self._cu_service_started
+
+    def _on_pebble_check_failed(self, event: PebbleCheckFailedEvent) -> None:
+        """Triggered when a check of the CU reached its failure threshold.
+
+        Args:
+            event: Pebble Check Failed Event
+        """
+        check_name = event.info.name
+        logger.warning(f"Pebble check failed: {check_name}")
+        if check_name not in self._stored.failing_checks:
+            self._stored.failing_checks.append(check_name)
+        self._update_workload_status()
+        # The status no longer is the outcome of the last reconciliation.
+        self._reconciled_fingerprint = None
+
+    def _on_pebble_check_recovered(self, event: PebbleCheckRecoveredEvent) -> None:
+        """Triggered when a failed check of the CU succeeded again.
+
+        Args:
+            event: Pebble Check Recovered Event
+        """
+        check_name = event.info.name
+        logger.info(f"Pebble check recovered: {check_name}")
+        if check_name in self._stored.failing_checks:
+            self._stored.failing_checks.remove(check_name)
+        if self._stored.failing_checks:
+            self._update_workload_status()
+            return
+        self._reconcile(event)
+
+    def _update_workload_status(self) -> None:
+        """Updates the status of a configured unit after the failing checks of the CU changed.
+
+        A unit that is not configured keeps the status explaining what it is waiting for.
+        """
+        status = self.unit.status
+        if isinstance(status, ActiveStatus) or status.message.startswith(
+            FAILING_CHECKS_STATUS_MESSAGE
+        ):
+            self.unit.status = self._workload_status
+
+    @property
+    def _workload_status(self) -> StatusBase:
+        """Returns the status of the configured unit, given the failing checks of the CU."""
+        if self._stored.failing_checks:
+            failing_checks = ", ".join(sorted(self._stored.failing_checks))
+            return WaitingStatus(f"{FAILING_CHECKS_STATUS_MESSAGE}: {failing_checks}")
+        return ActiveStatus()
 
     def _on_install(self, event: InstallEvent) -> None:
         """Triggered on install event.
@@ -121,67 +307,701 @@ class Oai5GCUOperatorCharm(CharmBase):
         Returns:
             None
         """
-        if not self.kubernetes.statefulset_is_patched(
+        self._stored.installed_at = time.time()
+        if self._block_on_invalid_configs():
+            self._stored.statefulset_patch_pending = True
+            return
+        self._patch_service()
+        self._patch_statefulset()
+        self._reconcile(event)
+
+    def _block_on_invalid_configs(self) -> bool:
+        """Blocks the unit if a config option is invalid, before anything is sent to Kubernetes.
+
+        Patching the service or the statefulset with invalid values would either fail the hook
+        or roll the pods with an invalid spec. The statefulset is then patched by the first
+        reconciliation with valid config options.
+
+        Returns:
+            bool: Whether a config option is invalid.
+        """
+        invalid_configs_status = self._invalid_configs_status
+        if invalid_configs_status:
+            self.unit.status = invalid_configs_status
+            return True
+        return False
+
+    def _patch_statefulset(self) -> None:
+        """Patches the statefulset with the security context, resources, volumes and networks.
+
+        The NetworkAttachmentDefinitions of the secondary networks are applied first, as pods
+        attached to a missing network do not start. The resources, hugepages and networks that
+        were applied are stored, so that the statefulset is only read again once the
+        corresponding config options change. Nothing is applied while the secondary network
+        config options are invalid, the patch then staying pending.
+        """
+        if self._get_invalid_network_configs():
+            logger.error("Statefulset not patched: secondary network config options are invalid")
+            self._stored.statefulset_patch_pending = True
+            return
+        resources = self._workload_resources
+        hugepages_page_size = self._config_hugepages_page_size
+        secondary_networks = self._secondary_networks
+        self._apply_network_attachment_definitions(secondary_networks)
+        if self.kubernetes.patch_statefulset(
             statefulset_name=self.app.name,
+            container_name=self._container_name,
+            resources=resources,
+            hugepages_page_size=hugepages_page_size or None,
+            networks=[
+                {
+                    "name": self._network_attachment_definition_name(interface_name),
+                    "interface": interface_name,
+                    "ips": [network["ip_address"]],
+                }
+                for interface_name, network in secondary_networks.items()
+            ],
         ):
-            self.kubernetes.patch_statefulset(
-                statefulset_name=self.app.name,
+            logger.info("Statefulset patched, its pods will be rolled")
+        self._stored.statefulset_resources = resources
+        self._stored.statefulset_hugepages_page_size = hugepages_page_size
+        self._stored.statefulset_networks = json.dumps(secondary_networks, sort_keys=True)
+        self._stored.statefulset_patch_pending = False
+
+    def _apply_network_attachment_definitions(self, secondary_networks: Dict[str, dict]) -> None:
+        """Applies the NetworkAttachmentDefinitions of the secondary networks.
+
+        The definitions of the networks which were applied before but are no longer configured
+        are deleted.
+
+        Args:
+            secondary_networks: Secondary networks by interface name.
+        """
+        for interface_name, network in secondary_networks.items():
+            self.kubernetes.apply_network_attachment_definition(
+                name=self._network_attachment_definition_name(interface_name),
+                config=network["config"],
+                resource_name=network.get("resource_name"),
             )
+        for interface_name in json.loads(self._stored.statefulset_networks):
+            if interface_name not in secondary_networks:
+                self.kubernetes.delete_network_attachment_definition(
+                    self._network_attachment_definition_name(interface_name)
+                )
 
-    def _on_config_changed(self, event: ConfigChangedEvent) -> None:
-        """Triggered on any change in configuration.
+    def _network_attachment_definition_name(self, interface_name: str) -> str:
+        """Returns the name of the NetworkAttachmentDefinition of a secondary interface."""
+        return f"{self.app.name}-{interface_name}"
+
+    @property
+    def _statefulset_patch_outdated(self) -> bool:
+        """Returns whether the install patch is pending or the config options it uses changed."""
+        if self._stored.statefulset_patch_pending:
+            return True
+        if dict(self._stored.statefulset_resources) != self._workload_resources:
+            return True
+        if self._stored.statefulset_networks != json.dumps(
+            self._secondary_networks, sort_keys=True
+        ):
+            return True
+        return self._stored.statefulset_hugepages_page_size != self._config_hugepages_page_size
+
+    def _on_upgrade_charm(self, event: UpgradeCharmEvent) -> None:
+        """Triggered on upgrade charm event.
 
         Args:
-            event: Config Changed Event
+            event: Juju event
 
         Returns:
             None
         """
-        if not self._container.can_connect():
-            self.unit.status = WaitingStatus("Waiting for Pebble in workload container")
-            event.defer()
+        if self._block_on_invalid_configs():
             return
+        self._patch_service()
+        self._reconcile(event)
+
+    def _patch_service(self) -> None:
+        """Patches the Kubernetes service created by Juju into a LoadBalancer for the CU ports."""
+        self.kubernetes.patch_service(
+            name=self.app.name, ports=self._service_ports, service_type="LoadBalancer"
+        )
+
+    @property
+    def _service_ports(self) -> List[dict]:
+        """Returns the ports of the CU exposed by its LoadBalancer services.
+
+        A CU-UP only serves the user plane, so the control plane ports are not exposed.
+        """
+        if self._config_role == CU_UP_ROLE:
+            ports = [
+                ("s1u", self._config_gnb_s1u_port, "UDP"),
+                ("f1", self._config_f1_cu_port, "UDP"),
+            ]
+        else:
+            ports = [
+                ("s1c", self._config_gnb_s1c_port, "SCTP"),
+                ("s1u", self._config_gnb_s1u_port, "UDP"),
+                ("x2c", self._config_gnb_x2c_port, "UDP"),
+                ("f1", self._config_f1_cu_port, "UDP"),
+            ]
+        if self._config_role == CU_CP_ROLE:
+            ports.append(("e1", str(E1_PORT), "SCTP"))
+        return [
+            {"name": name, "port": int(port), "protocol": protocol, "targetPort": int(port)}
+            for name, port, protocol in ports
+        ]
+
+    def _on_remove(self, event: RemoveEvent) -> None:
+        """Triggered on remove event.
+
+        Args:
+            event: Juju event
+
+        Returns:
+            None
+        """
+        if self._stored.unit_service_name:
+            self.kubernetes.delete_service(self._stored.unit_service_name)
+        # The NetworkAttachmentDefinitions are shared by the units, so the last one deletes them.
+        if self.app.planned_units() == 0:
+            for interface_name in (F1U_INTERFACE_NAME, NGU_INTERFACE_NAME):
+                self.kubernetes.delete_network_attachment_definition(
+                    self._network_attachment_definition_name(interface_name)
+                )
+
+    def _reconcile(self, event: EventBase) -> None:
+        """Brings the workload to the state desired by the config options and the relations.
+
+        Every observed event routes here and nothing is deferred: a step that can not complete
+        yet leaves a Waiting status and the next event, such as pebble-ready, a relation change
+        or update-status, reconciles again. Each step only applies what differs from the
+        current state. Reconciling the same desired state twice within a hook is skipped, and
+        update-status is skipped while the desired state is the one last applied. Install,
+        upgrade and pebble-ready always reconcile, as the workload may have changed without the
+        desired state changing.
+
+        The reconciliation and each of its phases are timed, its outcome being the resulting
+        unit status.
+
+        Args:
+            event: Juju event triggering the reconciliation.
+        """
+        fingerprint = self._desired_state_fingerprint
+        with self.tracer.span("reconcile", trigger=event.handle.kind) as span:
+            forced = isinstance(event, (InstallEvent, UpgradeCharmEvent, PebbleReadyEvent))
+            if not forced and fingerprint == self._reconciled_fingerprint:
+                span.outcome = "coalesced"
+                return
+            applied_already = fingerprint == self._stored.applied_fingerprint
+            if isinstance(event, UpdateStatusEvent) and applied_already:
+                span.outcome = "unchanged"
+                return
+            self._reconciled_fingerprint = fingerprint
+            self._load_balancer_has_address = None
+            applied = self._configure()
+            self._stored.applied_fingerprint = fingerprint if applied else ""
+            # Scaled out, the leader publishes the addresses of the units serving the DUs.
+            serves_f1c = self.unit.is_leader() and self._config_role != CU_UP_ROLE
+            if serves_f1c and (self._config_scale_out or self._cu_service_healthy):
+                with self.tracer.span("f1_publish"):
+                    self._set_cu_information_for_all_relations()
+            active = isinstance(self.unit.status, ActiveStatus)
+            if active and self._stored.installed_at is not None:
+                span.attributes["time_to_active_seconds"] = self._record_time_to_active()
+            span.outcome = self.unit.status.name
+
+    def _record_time_to_active(self) -> float:
+        """Records the time the unit took from its install hook to its first Active status.
+
+        Returns:
+            float: Time to active in seconds.
+        """
+        time_to_active = time.time() - self._stored.installed_at
+        logger.info(f"Unit active {time_to_active:.1f}s after install")
+        self._stored.time_to_active_seconds = time_to_active
+        self._stored.installed_at = None
+        return time_to_active
+
+    @property
+    def _desired_state_fingerprint(self) -> str:
+        """Returns a digest of everything the desired state of the workload derives from.
+
+        It is computed from the model only, without any Pebble or Kubernetes call, and only from
+        the relation fields the configuration consumes, read through the F1 and E1 endpoints and
+        the peer relation. N2 data is represented by its generation, which only changes when the
+        N2 relation events saw the AMF endpoints or SCTP streams move.
+        """
+        relations = {
+            relation_name: sorted(relation.id for relation in self.model.relations[relation_name])
+            for relation_name in (
+                "fiveg-n2",
+                "fiveg-f1",
+                "fiveg-e1",
+                "fiveg-e1-cu-cp",
+                PEER_RELATION_NAME,
+            )
+        }
+        desired_state_inputs = {
+            "config": dict(self.model.config),
+            "leader": self.unit.is_leader(),
+            "relations": relations,
+            "du_endpoints": [asdict(endpoint) for endpoint in self.f1_provides.du_endpoints],
+            "cuup_endpoints": [asdict(endpoint) for endpoint in self.e1_provides.cuup_endpoints],
+            "cucp_endpoint": [self.e1_requires.cucp_address, self.e1_requires.cucp_port],
+            "unit_f1_addresses": self._unit_f1_addresses,
+            "du_assignments": self._du_assignments,
+            "n2_generation": self.amf_n2_requires.generation,
+            "failing_checks": sorted(self._stored.failing_checks),
+        }
+        return _content_hash(json.dumps(desired_state_inputs, sort_keys=True))
+
+    def _configure(self) -> bool:
+        """Configures the workload once the config options, Pebble and the relations are ready.
+
+        Invalid config options are reported first, as the unit is blocked on them whether or not
+        Pebble is reachable.
+
+        Returns:
+            bool: Whether the workload was configured, False if a step can not complete yet.
+        """
+        with self.tracer.span("config_validation") as span:
+            invalid_configs_status = self._invalid_configs_status
+            span.outcome = "invalid" if invalid_configs_status else "ok"
+        if invalid_configs_status:
+            self.unit.status = invalid_configs_status
+            return False
+        with self.tracer.span("pebble_connectivity") as span:
+            can_connect = self._container.can_connect()
+            span.outcome = "ok" if can_connect else "unavailable"
+        if not can_connect:
+            self.unit.status = WaitingStatus("Waiting for Pebble in workload container")
+            return False
+        if self._statefulset_patch_outdated:
+            with self.tracer.span("statefulset_patch"):
+                self._patch_statefulset()
+        with self.tracer.span("scale_out") as span:
+            scale_out_status = self._reconcile_scale_out()
+            span.outcome = scale_out_status.name if scale_out_status else "ok"
+        if scale_out_status:
+            self.unit.status = scale_out_status
+            return False
+        with self.tracer.span("relation_validation") as span:
+            relations_status = self._relations_status
+            span.outcome = relations_status.name if relations_status else "ok"
+        if relations_status:
+            self.unit.status = relations_status
+            return False
+        if self._config_role != CU_UP_ROLE and not self._assigned_du_endpoints:
+            self._stop_workload_without_du()
+            return True
+        with self.tracer.span("load_balancer_lookup") as span:
+            load_balancer_has_address = self._wait_for_load_balancer_address()
+            span.outcome = "ok" if load_balancer_has_address else "unassigned"
+        if not load_balancer_has_address:
+            self.unit.status = WaitingStatus("Waiting for LoadBalancer IP address to be assigned")
+            return False
+        self._publish_n2_information()
+        self._publish_e1_information()
+        service_files = {
+            EXPORTER_SERVICE_NAME: self._push_exporter(),
+            self._service_name: self._push_config(),
+        }
+        with self.tracer.span("pebble_layer_update"):
+            self._update_pebble_layer(service_files=service_files)
+        self.unit.status = self._workload_status
+        return True
+
+    @property
+    def _relations_status(self) -> Optional[StatusBase]:
+        """Returns the status of the unit while its relations are not ready, None once they are.
+
+        Returns:
+            StatusBase: Blocked or Waiting status explaining which relation is not ready.
+        """
+        if self._config_role == CU_UP_ROLE:
+            return self._e1_relations_status
         if not self._amf_n2_relation_created:
-            self.unit.status = BlockedStatus("Waiting for relation to AMF to be created")
-            return
+            return BlockedStatus("Waiting for relation to AMF to be created")
         if not self._f1_relation_created:
-            self.unit.status = BlockedStatus("Waiting for relation to DU to be created")
-            return
+            return BlockedStatus("Waiting for relation to DU to be created")
         if not self.amf_n2_requires.amf_address_available:
-            self.unit.status = WaitingStatus(
-                "Waiting for AMF IPv4 address to be available in relation data"
-            )
-            return
-        if not self.f1_provides.du_address_available:
-            self.unit.status = WaitingStatus(
-                "Waiting for DU IPv4 address to be available in relation data"
+            return WaitingStatus("Waiting for AMF IPv4 address to be available in relation data")
+        if not self.f1_provides.du_endpoints:
+            return WaitingStatus("Waiting for DU IPv4 address to be available in relation data")
+        if self._assigned_du_endpoints and not self._f1_du_remote_endpoint:
+            return BlockedStatus("DUs advertise different F1-U ports")
+        if self._config_role == CU_CP_ROLE and not self._relation_created("fiveg-e1"):
+            return BlockedStatus("Waiting for relation to CU-UP to be created")
+        return None
+
+    def _stop_workload_without_du(self) -> None:
+        """Stops the CU service of a unit the leader assigned no DU to.
+
+        Scaled out, a unit may serve no DU. Its service is stopped rather than left running
+        with the config of the DUs it served before.
+        """
+        if self._cu_service_started:
+            self._container.stop(self._service_name)
+            logger.info(f"Stopped {self._service_name} service: no DU assigned to this unit")
+        self.unit.status = WaitingStatus("No DU assigned to this unit")
+
+    @property
+    def _e1_relations_status(self) -> Optional[StatusBase]:
+        """Returns the status of a CU-UP unit while its E1 relation is not ready.
+
+        Returns:
+            StatusBase: Blocked or Waiting status, None once the CU-CP address is available.
+        """
+        if not self._relation_created("fiveg-e1-cu-cp"):
+            return BlockedStatus("Waiting for relation to CU-CP to be created")
+        if not self.e1_requires.cucp_address:
+            return WaitingStatus("Waiting for CU-CP IPv4 address to be available in relation data")
+        return None
+
+    def _publish_n2_information(self) -> None:
+        """Publishes the SCTP streams of the gNB in the N2 relation, from the leader of a CU-CP."""
+        if self.unit.is_leader() and self._config_role != CU_UP_ROLE:
+            with self.tracer.span("n2_publish"):
+                self.amf_n2_requires.set_gnb_sctp_streams(
+                    sctp_instreams=self._config_sctp_instreams,
+                    sctp_outstreams=self._config_sctp_outstreams,
+                )
+
+    def _publish_e1_information(self) -> None:
+        """Publishes the E1 address of the CU-CP or of the CU-UP unit in the E1 relations.
+
+        The CU-CP leader publishes the address of the application, while every CU-UP unit
+        publishes the address of its own LoadBalancer service.
+        """
+        if self._config_role == CU_UP_ROLE:
+            with self.tracer.span("e1_publish"):
+                self.e1_requires.set_cuup_information(cuup_address=self._gnb_ipv4_address)
+        elif self._config_role == CU_CP_ROLE and self.unit.is_leader():
+            with self.tracer.span("e1_publish"):
+                self.e1_provides.publish_cucp_information(
+                    cucp_address=self._gnb_ipv4_address, cucp_port=str(E1_PORT)
+                )
+
+    def _reconcile_scale_out(self) -> Optional[StatusBase]:
+        """Gives the unit its own LoadBalancer service and assigns the DUs to the units.
+
+        Scaled out, the unit publishes the address of its service in the peer relation, and the
+        leader assigns every DU to one of the units that published an address. CU-UP units
+        also get their own service, each one setting up its own E1 association. Otherwise,
+        the service of the unit is deleted if it was created.
+
+        Returns:
+            StatusBase: Waiting status while the unit has no address yet, None once it has.
+        """
+        if not self._uses_unit_services:
+            if self._stored.unit_service_name:
+                self.kubernetes.delete_service(self._stored.unit_service_name)
+                self._stored.unit_service_name = ""
+            return None
+        peer_relation = self.model.get_relation(PEER_RELATION_NAME)
+        if self._config_scale_out and not peer_relation:
+            return WaitingStatus("Waiting for peer relation to be created")
+        if self._stored.unit_service_name != self._unit_service_name:
+            self.kubernetes.apply_load_balancer_service(
+                name=self._unit_service_name,
+                selector={POD_NAME_LABEL: self.unit.name.replace("/", "-")},
+                ports=self._service_ports,
             )
-            return
-        self._push_config()
-        self._update_pebble_layer()
+            self._stored.unit_service_name = self._unit_service_name
+        if not self._wait_for_load_balancer_address():
+            return WaitingStatus("Waiting for LoadBalancer IP address to be assigned")
+        if not self._config_scale_out:
+            return None
+        peer_relation.data[self.unit]["f1_address"] = self._gnb_ipv4_address  # type: ignore[union-attr]  # noqa: E501
         if self.unit.is_leader():
-            self._set_cu_information_for_all_relations()
-        self.unit.status = ActiveStatus()
+            self._assign_dus()
+        return None
 
-    def _set_cu_information_for_all_relations(self):
-        cu_hostname, cu_ipv4_address = self.kubernetes.get_service_load_balancer_address(
-            name=self.app.name
+    def _assign_dus(self) -> None:
+        """Assigns the DUs to the units with an address and publishes it in the peer relation."""
+        peer_relation = self.model.get_relation(PEER_RELATION_NAME)
+        assignments = assign_dus(
+            du_keys=[
+                str(du_endpoint.relation_id) for du_endpoint in self.f1_provides.du_endpoints
+            ],
+            unit_names=self._unit_f1_addresses.keys(),
+        )
+        content = json.dumps(assignments, sort_keys=True)
+        if peer_relation.data[self.app].get("du_assignments") != content:  # type: ignore[union-attr]  # noqa: E501
+            peer_relation.data[self.app]["du_assignments"] = content  # type: ignore[union-attr]
+            logger.info(f"DUs assigned to units: {content}")
+
+    @property
+    def _unit_f1_addresses(self) -> Dict[str, str]:
+        """Returns the F1 address published by each unit in the peer relation."""
+        peer_relation = self.model.get_relation(PEER_RELATION_NAME)
+        if not peer_relation:
+            return {}
+        addresses = {
+            unit.name: peer_relation.data[unit].get("f1_address")
+            for unit in [self.unit, *peer_relation.units]
+        }
+        return {unit_name: address for unit_name, address in addresses.items() if address}
+
+    @property
+    def _du_assignments(self) -> Dict[str, str]:
+        """Returns the unit assigned to each DU relation ID, as published by the leader."""
+        peer_relation = self.model.get_relation(PEER_RELATION_NAME)
+        if not peer_relation:
+            return {}
+        return json.loads(peer_relation.data[self.app].get("du_assignments", "{}"))
+
+    @property
+    def _assigned_du_endpoints(self) -> List[F1DUEndpoint]:
+        """Returns the endpoints of the DUs served by this unit, all of them unless scaled out."""
+        du_endpoints = self.f1_provides.du_endpoints
+        if not self._config_scale_out:
+            return du_endpoints
+        du_assignments = self._du_assignments
+        return [
+            du_endpoint
+            for du_endpoint in du_endpoints
+            if du_assignments.get(str(du_endpoint.relation_id)) == self.unit.name
+        ]
+
+    @property
+    def _uses_unit_services(self) -> bool:
+        """Returns whether each unit gets its own LoadBalancer service."""
+        return self._config_scale_out or self._config_role == CU_UP_ROLE
+
+    @property
+    def _unit_service_name(self) -> str:
+        """Returns the name of the LoadBalancer service of the unit when scaled out."""
+        return f"{self.app.name}-{self.unit.name.split('/')[1]}"
+
+    @property
+    def _load_balancer_service_name(self) -> str:
+        """Returns the name of the LoadBalancer service the DUs reach this unit through."""
+        return self._unit_service_name if self._uses_unit_services else self.app.name
+
+    def _wait_for_load_balancer_address(self) -> bool:
+        """Waits for the LoadBalancer service of the unit to be assigned an IP address.
+
+        The result is kept until the next reconciliation, so that scaling out and configuring
+        the workload wait at most once between them.
+
+        Returns:
+            bool: Whether the LoadBalancer has an IP address.
+        """
+        if self._load_balancer_has_address is not None:
+            return self._load_balancer_has_address
+        start_time = time.monotonic()
+        _, cu_ipv4_address = self.kubernetes.wait_for_service_load_balancer_address(
+            name=self._load_balancer_service_name, timeout=LOAD_BALANCER_ADDRESS_TIMEOUT_SECONDS
         )
+        logger.info(
+            f"Waited {time.monotonic() - start_time:.1f}s for LoadBalancer IP address: "
+            f"{cu_ipv4_address if cu_ipv4_address else 'not assigned'}"
+        )
+        self._load_balancer_has_address = bool(cu_ipv4_address)
+        return self._load_balancer_has_address
+
+    def _set_cu_information_for_all_relations(self):
+        if self._config_scale_out:
+            self._set_cu_information_for_assigned_relations()
+            return
+        cu_ipv4_address = self._secondary_ipv4_address(F1U_INTERFACE_NAME)
+        if not cu_ipv4_address:
+            _, cu_ipv4_address = self.kubernetes.get_service_load_balancer_address(
+                name=self.app.name
+            )
         if not cu_ipv4_address:
-            raise Exception("Loadbalancer doesn't have an IP address")
-        self.f1_provides.set_cu_information_for_all_relations(
+            logger.info("LoadBalancer doesn't have an IP address yet, not setting F1 data")
+            return
+        self.f1_provides.publish_cu_information(
             cu_address=cu_ipv4_address, cu_port=self._config_f1_cu_port
         )
 
-    def _update_pebble_layer(self) -> None:
-        """Updates pebble layer with new configuration.
+    def _set_cu_information_for_assigned_relations(self) -> None:
+        """Publishes in every F1 relation the address of the unit assigned to its DU."""
+        unit_f1_addresses = self._unit_f1_addresses
+        relation_ids = {relation.id for relation in self.model.relations["fiveg-f1"]}
+        for relation_id, unit_name in self._du_assignments.items():
+            cu_address = unit_f1_addresses.get(unit_name)
+            if not cu_address or int(relation_id) not in relation_ids:
+                continue
+            self.f1_provides.set_cu_information(
+                cu_address=cu_address,
+                cu_port=self._config_f1_cu_port,
+                relation_id=int(relation_id),
+            )
+
+    def _update_pebble_layer(self, service_files: Dict[str, str]) -> None:
+        """Updates pebble layer and restarts the services only if their configuration changed.
+
+        Replanning restarts the services whose definition changed in the layer. The other
+        services are restarted when the fingerprint of their file and definition differs from
+        the one stored once they were last (re)started, so that a hook failing between pushing
+        a file and restarting the service is caught up by the next one.
+
+        Args:
+            service_files: Content of the file of each service in the workload container.
+        """
+        plan = self._container.get_plan()
+        changed_services = self._changed_pebble_services(plan)
+        if changed_services or self._pebble_checks_changed(plan):
+            self._container.add_layer("cu", self._pebble_layer, combine=True)
+            self._container.replan()
+            logger.info(f"Replanned services {', '.join(changed_services)}: pebble layer changed")
+        layer_services = self._pebble_layer["services"]
+        applied_fingerprints = json.loads(self._stored.service_fingerprints)
+        fingerprints = {
+            service_name: _content_hash(
+                json.dumps([content, layer_services[service_name]], sort_keys=True)
+            )
+            for service_name, content in service_files.items()
+        }
+        outdated_services = {
+            service_name
+            for service_name, fingerprint in fingerprints.items()
+            if applied_fingerprints.get(service_name) != fingerprint
+        }
+        if self._service_name not in changed_services:
+            if self._service_name in outdated_services:
+                self._container.restart(self._service_name)
+                logger.info(f"Restarted {self._service_name} service: its files changed")
+            # The service is stopped while the unit serves no DU, with its files and layer kept.
+            elif not self._cu_service_started:
+                self._container.start(self._service_name)
+                logger.info(f"Started {self._service_name} service: it was not running")
+        self._start_exporter(
+            restart=bool({EXPORTER_SERVICE_NAME} & {*changed_services, *outdated_services})
+        )
+        self._stored.service_fingerprints = json.dumps(fingerprints, sort_keys=True)
+
+    def _start_exporter(self, restart: bool) -> None:
+        """Starts the metrics exporter if it is not running, without failing the hook.
+
+        The exporter runs with the python3 interpreter of the workload image, so the CU is
+        still configured when the image has no python3 or the exporter fails to start. Its
+        startup is disabled in the layer for the same reason, replanning never starting it.
+
+        Args:
+            restart: Whether the exporter file or definition changed since it was started.
+        """
+        try:
+            if restart:
+                self._container.restart(EXPORTER_SERVICE_NAME)
+            elif not self._container.get_service(EXPORTER_SERVICE_NAME).is_running():
+                self._container.start(EXPORTER_SERVICE_NAME)
+            else:
+                return
+        except ChangeError as e:
+            logger.warning(f"Metrics exporter could not start, is python3 in the image? {e}")
+            return
+        logger.info(f"Started {EXPORTER_SERVICE_NAME} service")
+
+    def _changed_pebble_services(self, plan: Plan) -> List[str]:
+        """Returns the services of the pebble layer which differ from the current plan."""
+        plan_services = plan.services
+        changed_services = []
+        for service_name, service in Layer(self._pebble_layer).services.items():
+            plan_service = plan_services.get(service_name)
+            if not plan_service or plan_service.to_dict() != service.to_dict():
+                changed_services.append(service_name)
+        return changed_services
+
+    def _pebble_checks_changed(self, plan: Plan) -> bool:
+        """Returns whether the checks of the pebble layer differ from the current plan."""
+        for check_name, check in Layer(self._pebble_layer).checks.items():
+            plan_check = plan.checks.get(check_name)
+            if not plan_check or plan_check.to_dict() != check.to_dict():
+                return True
+        return False
+
+    @property
+    def _invalid_configs_status(self) -> Optional[StatusBase]:
+        """Returns a Blocked status naming the invalid config options, None if all are valid."""
+        invalid_configs = self._get_invalid_configs()
+        if not invalid_configs:
+            return None
+        return BlockedStatus(f"The following configurations are not valid: {invalid_configs}")
+
+    def _get_invalid_configs(self) -> List[str]:
+        """Returns the names of the config options that have an invalid value.
 
         Returns:
-            None
+            List: Names of the invalid config options.
         """
-        self._container.add_layer("cu", self._pebble_layer, combine=True)
-        self._container.replan()
-        self._container.restart(self._service_name)
+        invalid_configs = []
+        for config_name in ["pusch-threads", "thread-pool-size"]:
+            if not _thread_count_is_valid(self.model.config[config_name]):
+                invalid_configs.append(config_name)
+        for config_name in ["sctp-instreams", "sctp-outstreams"]:
+            if not _sctp_stream_count_is_valid(self.model.config[config_name]):
+                invalid_configs.append(config_name)
+        if self.model.config["log-profile"] not in LOG_PROFILES:
+            invalid_configs.append("log-profile")
+        if self.model.config["role"] not in CONFIG_TEMPLATE_NAMES:
+            invalid_configs.append("role")
+        try:
+            parse_log_level_overrides(self.model.config["log-levels"])
+        except ValueError:
+            invalid_configs.append("log-levels")
+        invalid_configs.extend(self._get_invalid_resources_configs())
+        invalid_configs.extend(self._get_invalid_network_configs())
+        return invalid_configs
+
+    def _get_invalid_network_configs(self) -> List[str]:
+        """Returns the names of the secondary network config options that have an invalid value.
+
+        Returns:
+            List: Names of the invalid config options.
+        """
+        invalid_configs = []
+        cni_type = self._config_user_plane_cni_type
+        for interface_name in (F1U_INTERFACE_NAME, NGU_INTERFACE_NAME):
+            ip_address = self.model.config[f"{interface_name}-ip-address"]
+            if ip_address and not _ipv4_interface_is_valid(ip_address):
+                invalid_configs.append(f"{interface_name}-ip-address")
+            host_interface = self.model.config[f"{interface_name}-host-interface"]
+            if ip_address and cni_type == MACVLAN_CNI_TYPE and not host_interface:
+                invalid_configs.append(f"{interface_name}-host-interface")
+        if cni_type not in (MACVLAN_CNI_TYPE, SRIOV_CNI_TYPE):
+            invalid_configs.append("user-plane-cni-type")
+        configured_networks = self._secondary_networks
+        if cni_type == SRIOV_CNI_TYPE and configured_networks:
+            if not self.model.config["sriov-resource-name"]:
+                invalid_configs.append("sriov-resource-name")
+        # All the pods of the statefulset would get the same secondary addresses. CU-UP units
+        # are scaled out, each one serving its own E1 association.
+        if self._config_scale_out and configured_networks:
+            invalid_configs.append("scale-out")
+        elif self.app.planned_units() > 1 or self._config_role == CU_UP_ROLE:
+            invalid_configs.extend(
+                f"{interface_name}-ip-address"
+                for interface_name in configured_networks
+                if f"{interface_name}-ip-address" not in invalid_configs
+            )
+        return invalid_configs
+
+    def _get_invalid_resources_configs(self) -> List[str]:
+        """Returns the names of the resources config options that have an invalid value.
+
+        Returns:
+            List: Names of the invalid config options.
+        """
+        invalid_configs = []
+        cpu = self.model.config["cpu"]
+        memory = self.model.config["memory"]
+        if cpu and not (cpu.isdigit() and int(cpu) > 0) or memory and not cpu:
+            invalid_configs.append("cpu")
+        if memory and not MEMORY_QUANTITY_PATTERN.match(memory) or cpu and not memory:
+            invalid_configs.append("memory")
+        hugepages_size = self.model.config["hugepages-size"]
+        hugepages_memory = self.model.config["hugepages-memory"]
+        if hugepages_size and (hugepages_size not in HUGEPAGE_SIZES_IN_BYTES or not cpu):
+            invalid_configs.append("hugepages-size")
+        if hugepages_memory and not MEMORY_QUANTITY_PATTERN.match(hugepages_memory):
+            invalid_configs.append("hugepages-memory")
+        elif bool(hugepages_size) != bool(hugepages_memory):
+            invalid_configs.append("hugepages-memory")
+        return invalid_configs
 
     @property
     def _amf_n2_relation_created(self) -> bool:
@@ -192,14 +1012,69 @@ class Oai5GCUOperatorCharm(CharmBase):
         return self._relation_created("fiveg-f1")
 
     def _relation_created(self, relation_name: str) -> bool:
-        if not self.model.get_relation(relation_name):
+        if not self.model.relations[relation_name]:
             return False
         return True
 
-    def _push_config(self) -> None:
-        jinja2_environment = Environment(loader=FileSystemLoader("src/templates/"))
-        template = jinja2_environment.get_template(f"{CONFIG_FILE_NAME}.j2")
-        content = template.render(
+    @property
+    def _f1_du_remote_endpoint(self) -> Optional[Tuple[str, str]]:
+        """Returns the remote F1 address and port to render in the config file.
+
+        The CU listens for all its DUs on the wildcard address, even for a single one, so that
+        DUs joining or leaving do not change the config file and do not restart the CU, which
+        would drop the F1 associations of the other DUs. The DUs must then share the same F1-U
+        port.
+
+        Returns:
+            Tuple: Remote F1 address and port, None if the DUs advertise different ports.
+        """
+        du_endpoints = self._assigned_du_endpoints
+        du_ports = {du_endpoint.du_port for du_endpoint in du_endpoints}
+        if len(du_ports) != 1:
+            logger.warning(f"DUs advertise different F1-U ports: {', '.join(sorted(du_ports))}")
+            return None
+        return F1_DU_WILDCARD_ADDRESS, du_ports.pop()
+
+    def _push_config(self) -> str:
+        """Renders the config file and pushes it to the container if its content changed.
+
+        Returns:
+            str: Content of the config file.
+        """
+        with self.tracer.span("config_render"):
+            content = self._render_config()
+        with self.tracer.span("config_push", path=CONFIG_FILE_NAME) as span:
+            if self._config_file_content_matches(content):
+                logger.info(f"Config file is unchanged, not pushing: {CONFIG_FILE_NAME}")
+                span.outcome = "unchanged"
+                return content
+            self._container.push(path=f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}", source=content)
+        logger.info(f"Wrote file to container: {CONFIG_FILE_NAME}")
+        return content
+
+    def _push_exporter(self) -> str:
+        """Pushes the metrics exporter to the container if its content changed.
+
+        Returns:
+            str: Content of the exporter.
+        """
+        with open(EXPORTER_SOURCE_PATH) as exporter_file:
+            content = exporter_file.read()
+        with self.tracer.span("exporter_push", path=EXPORTER_PATH) as span:
+            if self._file_content_matches(EXPORTER_PATH, content):
+                span.outcome = "unchanged"
+                return content
+            self._container.push(path=EXPORTER_PATH, source=content, make_dirs=True)
+        logger.info(f"Wrote metrics exporter to container: {EXPORTER_PATH}")
+        return content
+
+    def _render_config(self) -> str:
+        """Renders the gnb config file.
+
+        Returns:
+            str: Content of the rendered config file.
+        """
+        return _get_template(CONFIG_TEMPLATE_NAMES[self._config_role]).render(
             gnb_cu_name=self._config_gnb_cu_name,
             gnb_cu_id=self._config_gnb_cu_id,
             tac=self._config_tac,
@@ -209,21 +1084,103 @@ class Oai5GCUOperatorCharm(CharmBase):
             nssai_sst=self._config_nssai_sst,
             nssai_sd=self._config_nssai_sd,
             f1_interface_name=self._config_f1_interface_name,
-            f1_cu_ipv4_address=self._gnb_ipv4_address,
+            f1_cu_ipv4_address=self._f1_ipv4_address,
             f1_cu_port=self._config_f1_cu_port,
-            f1_du_ipv4_address=self.f1_provides.du_address,
-            f1_du_port=self.f1_provides.du_port,
-            amf_ipv4_address=self.amf_n2_requires.amf_address,
             amf_ipv6_address=self._config_amf_ipv6_address,
             gnb_nga_interface_name=self._config_gnb_nga_interface_name,
             gnb_nga_ipv4_address=self._gnb_ipv4_address,
             gnb_ngu_interface_name=self._config_gnb_ngu_interface_name,
-            gnb_ngu_ipv4_address=self._gnb_ipv4_address,
+            gnb_ngu_ipv4_address=self._ngu_ipv4_address,
             gnb_s1u_port=self._config_gnb_s1u_port,
+            pusch_threads=self._config_pusch_threads,
+            sctp_instreams=self._config_sctp_instreams,
+            sctp_outstreams=self._sctp_outstreams,
+            **self._role_template_variables,
+            **self._log_config_template_variables,
         )
 
-        self._container.push(path=f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}", source=content)
-        logger.info(f"Wrote file to container: {CONFIG_FILE_NAME}")
+    @property
+    def _role_template_variables(self) -> dict:
+        """Returns the variables of the config template which depend on the role of the CU.
+
+        A CU-UP has no F1 relation: it learns the F1-U endpoints of the DUs from the CU-CP
+        over E1, so it accepts F1-U traffic from any address.
+
+        Returns:
+            dict: F1 remote endpoint, AMF addresses and E1 variables.
+        """
+        if self._config_role == CU_UP_ROLE:
+            return {
+                "gnb_cu_up_id": f"{int(self.unit.name.split('/')[1]):x}",
+                "f1_du_ipv4_address": F1_DU_WILDCARD_ADDRESS,
+                "f1_du_port": self._config_f1_cu_port,
+                "e1_interface_type": "up",
+                "e1_cucp_ipv4_address": self.e1_requires.cucp_address,
+                "e1_cucp_port": self.e1_requires.cucp_port or E1_PORT,
+                "e1_cuup_ipv4_address": self._gnb_ipv4_address,
+                "e1_cuup_port": E1_PORT,
+            }
+        f1_du_ipv4_address, f1_du_port = self._f1_du_remote_endpoint  # type: ignore[misc]
+        variables = {
+            "f1_du_ipv4_address": f1_du_ipv4_address,
+            "f1_du_port": f1_du_port,
+            "amf_ipv4_addresses": self.amf_n2_requires.amf_addresses,
+        }
+        if self._config_role == CU_CP_ROLE:
+            variables.update(
+                e1_interface_type="cp",
+                e1_cucp_ipv4_address=self._gnb_ipv4_address,
+                e1_cucp_port=E1_PORT,
+                e1_cuup_ipv4_address=self._e1_cuup_ipv4_address,
+                e1_cuup_port=E1_PORT,
+            )
+        return variables
+
+    @property
+    def _e1_cuup_ipv4_address(self) -> str:
+        """Returns the CU-UP address of the CU-CP config file.
+
+        With a single CU-UP unit, its own address is used. With several, the CU-CP accepts E1
+        associations from any address, so that CU-UP units joining or leaving do not restart it.
+        """
+        cuup_addresses = {endpoint.cuup_address for endpoint in self.e1_provides.cuup_endpoints}
+        if len(cuup_addresses) == 1:
+            return cuup_addresses.pop()
+        return E1_CUUP_WILDCARD_ADDRESS
+
+    @property
+    def _log_config_template_variables(self) -> dict:
+        profile = self.model.config["log-profile"]
+        return {
+            "log_levels": log_levels(profile, self.model.config["log-levels"]),
+            "global_log_options": GLOBAL_LOG_OPTIONS[profile],
+        }
+
+    def _config_file_content_matches(self, content: str) -> bool:
+        """Returns whether the config file in the container has the same content.
+
+        Args:
+            content: Expected content of the config file.
+
+        Returns:
+            bool: Whether the hash of the pushed config file matches the hash of `content`.
+        """
+        return self._file_content_matches(f"{BASE_CONFIG_PATH}/{CONFIG_FILE_NAME}", content)
+
+    def _file_content_matches(self, path: str, content: str) -> bool:
+        """Returns whether a file in the container has the same content.
+
+        Args:
+            path: Path of the file in the container.
+            content: Expected content of the file.
+
+        Returns:
+            bool: Whether the hash of the file matches the hash of `content`.
+        """
+        if not self._container.exists(path):
+            return False
+        existing_content = self._container.pull(path).read()
+        return _content_hash(existing_content) == _content_hash(content)
 
     @property
     def _config_file_is_pushed(self) -> bool:
@@ -268,17 +1225,83 @@ class Oai5GCUOperatorCharm(CharmBase):
 
     @property
     def _config_f1_interface_name(self) -> str:
+        if self.model.config["f1u-ip-address"]:
+            return F1U_INTERFACE_NAME
         return "eth0"
 
+    @property
+    def _f1_ipv4_address(self) -> str:
+        """Returns the F1 address of the CU, the one of its F1-U interface if it has one."""
+        return self._secondary_ipv4_address(F1U_INTERFACE_NAME) or self._gnb_ipv4_address
+
+    @property
+    def _ngu_ipv4_address(self) -> str:
+        """Returns the NG-U address of the CU, the one of its NG-U interface if it has one."""
+        return self._secondary_ipv4_address(NGU_INTERFACE_NAME) or self._gnb_ipv4_address
+
+    def _secondary_ipv4_address(self, interface_name: str) -> Optional[str]:
+        """Returns the IPv4 address of a secondary interface, without its prefix, if configured."""
+        ip_address = self.model.config[f"{interface_name}-ip-address"]
+        if not ip_address or not _ipv4_interface_is_valid(ip_address):
+            return None
+        return str(ipaddress.ip_interface(ip_address).ip)
+
+    @property
+    def _secondary_networks(self) -> Dict[str, dict]:
+        """Returns the Multus networks of the configured secondary interfaces.
+
+        The F1-U and NG-U traffic then bypasses the cluster network and the LoadBalancer. With
+        the `sriov` CNI, the interfaces are virtual functions allocated by the SR-IOV device
+        plugin, otherwise they are macvlan interfaces on top of a host interface.
+
+        Returns:
+            dict: CIDR address, CNI config and device plugin resource by interface name.
+        """
+        secondary_networks = {}
+        for interface_name in (F1U_INTERFACE_NAME, NGU_INTERFACE_NAME):
+            ip_address = self.model.config[f"{interface_name}-ip-address"]
+            if not ip_address:
+                continue
+            network: dict = {"ip_address": ip_address, "config": self._cni_config(interface_name)}
+            if self._config_user_plane_cni_type == SRIOV_CNI_TYPE:
+                network["resource_name"] = self.model.config["sriov-resource-name"]
+            secondary_networks[interface_name] = network
+        return secondary_networks
+
+    def _cni_config(self, interface_name: str) -> dict:
+        """Returns the CNI config of the network of a secondary interface.
+
+        The address of the interface is set from the pod annotation by the static IPAM plugin.
+        """
+        cni_config: dict = {"cniVersion": CNI_VERSION, "type": self._config_user_plane_cni_type}
+        if self._config_user_plane_cni_type == MACVLAN_CNI_TYPE:
+            cni_config["master"] = self.model.config[f"{interface_name}-host-interface"]
+            cni_config["mode"] = "bridge"
+        cni_config["capabilities"] = {"ips": True}
+        cni_config["ipam"] = {"type": "static"}
+        return cni_config
+
+    @property
+    def _config_user_plane_cni_type(self) -> str:
+        return self.model.config["user-plane-cni-type"]
+
     @property
     def _gnb_ipv4_address(self) -> str:
         cu_hostname, cu_ipv4_address = self.kubernetes.get_service_load_balancer_address(
-            name=self.app.name
+            name=self._load_balancer_service_name
         )
         if not cu_ipv4_address:
             raise ValueError("No IPv4 address found for CU")
         return cu_ipv4_address
 
+    @property
+    def _config_scale_out(self) -> bool:
+        return bool(self.model.config["scale-out"])
+
+    @property
+    def _config_role(self) -> str:
+        return self.model.config["role"]
+
     @property
     def _config_f1_cu_port(self) -> str:
         return "2153"
@@ -294,6 +1317,8 @@ class Oai5GCUOperatorCharm(CharmBase):
 
     @property
     def _config_gnb_ngu_interface_name(self) -> str:
+        if self.model.config["ngu-ip-address"]:
+            return NGU_INTERFACE_NAME
         return "eth0"
 
     @property
@@ -308,22 +1333,166 @@ class Oai5GCUOperatorCharm(CharmBase):
     def _config_gnb_x2c_port(self) -> str:
         return "36422"
 
+    @property
+    def _config_sctp_instreams(self) -> int:
+        return int(self.model.config["sctp-instreams"])
+
+    @property
+    def _config_sctp_outstreams(self) -> int:
+        return int(self.model.config["sctp-outstreams"])
+
+    @property
+    def _sctp_outstreams(self) -> int:
+        """Returns the number of outbound SCTP streams to request to the AMF.
+
+        The association can not use more outbound streams than the AMF accepts inbound, so
+        the configured count is capped by the count the AMF publishes in the N2 relation.
+        """
+        amf_sctp_instreams = self.amf_n2_requires.n2_view.amf_sctp_instreams
+        if amf_sctp_instreams and amf_sctp_instreams < self._config_sctp_outstreams:
+            logger.info(f"Capping SCTP outbound streams to the {amf_sctp_instreams} of the AMF")
+            return amf_sctp_instreams
+        return self._config_sctp_outstreams
+
+    @property
+    def _config_pusch_threads(self) -> int:
+        return self._thread_count(self.model.config["pusch-threads"])
+
+    @property
+    def _config_thread_pool_size(self) -> int:
+        return self._thread_count(self.model.config["thread-pool-size"])
+
+    def _thread_count(self, config_value: str) -> int:
+        """Returns the number of threads of a thread pool config option.
+
+        Args:
+            config_value: Number of threads, or `auto` to use one thread per CPU allocated to
+                the workload container.
+
+        Returns:
+            int: Number of threads.
+        """
+        if config_value != AUTO_THREAD_COUNT:
+            return int(config_value)
+        return self._workload_cpu_count
+
+    @property
+    def _workload_cpu_count(self) -> int:
+        """Returns the number of CPUs allocated to the workload container.
+
+        The cgroup is read once per hook. When it sets no CPU limit, the default thread count
+        of nr-softmodem is used.
+        """
+        if self._cpu_count is None:
+            cpu_count = container_cpu_count(self._container)
+            if cpu_count is None:
+                logger.info(f"Could not read CPU allocation, using {DEFAULT_THREAD_COUNT} CPUs")
+                cpu_count = DEFAULT_THREAD_COUNT
+            self._cpu_count = cpu_count
+        return self._cpu_count
+
+    @property
+    def _workload_resources(self) -> Dict[str, str]:
+        """Returns the CPU, memory, hugepages and SR-IOV VFs of the workload, empty if not set."""
+        resources: Dict[str, str] = {}
+        if self.model.config["cpu"] and self.model.config["memory"]:
+            resources.update(cpu=self.model.config["cpu"], memory=self.model.config["memory"])
+            if self._config_hugepages_page_size:
+                resources[f"hugepages-{self._config_hugepages_page_size}"] = self.model.config[
+                    "hugepages-memory"
+                ]
+        secondary_networks = self._secondary_networks
+        if self._config_user_plane_cni_type == SRIOV_CNI_TYPE and secondary_networks:
+            resources[self.model.config["sriov-resource-name"]] = str(len(secondary_networks))
+        return resources
+
+    @property
+    def _config_hugepages_page_size(self) -> str:
+        return self.model.config["hugepages-size"]
+
+    @property
+    def _thread_pool(self) -> str:
+        """Returns the nr-softmodem thread pool, with workers that are not pinned to a core."""
+        return ",".join(["-1"] * self._config_thread_pool_size)
+
     @property
     def _pebble_layer(self) -> dict:
         """Return a dictionary representing a Pebble layer."""
+        service: dict = {
+            "override": "replace",
+            "summary": "cu",
+            "command": self._workload_command,
+            "startup": "enabled",
+            "working-dir": WORKING_DIRECTORY,
+        }
+        if self._config_hugepages_page_size:
+            service["environment"] = {"GLIBC_TUNABLES": self._glibc_tunables}
         return {
             "summary": "cu layer",
             "description": "pebble config layer for cu",
             "services": {
-                self._service_name: {
+                self._service_name: service,
+                EXPORTER_SERVICE_NAME: {
                     "override": "replace",
-                    "summary": "cu",
-                    "command": f"/opt/oai-gnb/bin/nr-softmodem -O {BASE_CONFIG_PATH}/{CONFIG_FILE_NAME} --sa -E --rfsim --log_config.global_log_options level nocolor time",  # noqa: E501
-                    "startup": "enabled",
-                }
+                    "summary": "cu metrics exporter",
+                    "command": f"python3 {EXPORTER_PATH} --port {METRICS_PORT} --stats-directory {WORKING_DIRECTORY} --f1u-interface {self._config_f1_interface_name} --ngu-interface {self._config_gnb_ngu_interface_name} --role {self._config_role}",  # noqa: E501
+                    "startup": "disabled",
+                },
+            },
+            "checks": {
+                check_name: self._check(command)
+                for check_name, command in self._check_commands.items()
             },
         }
 
+    @property
+    def _workload_command(self) -> str:
+        """Returns the command of the CU service, nr-cuup for a CU-UP, nr-softmodem otherwise."""
+        if self._config_role == CU_UP_ROLE:
+            return f"/opt/oai-gnb/bin/nr-cuup -O {BASE_CONFIG_PATH}/{CONFIG_FILE_NAME} --sa"
+        return f"/opt/oai-gnb/bin/nr-softmodem -O {BASE_CONFIG_PATH}/{CONFIG_FILE_NAME} --sa -E --rfsim --thread-pool {self._thread_pool}"  # noqa: E501
+
+    @property
+    def _check_commands(self) -> Dict[str, str]:
+        """Returns the commands of the readiness checks of the interfaces served by the role."""
+        control_plane_checks = {
+            "f1c-listener": _sctp_listener_check_command(F1C_PORT),
+            "ngap-association": _sctp_association_check_command(NGAP_PORT),
+        }
+        user_plane_checks = {
+            "f1u-listener": _udp_listener_check_command(int(self._config_f1_cu_port)),
+            "ngu-listener": _udp_listener_check_command(int(self._config_gnb_s1u_port)),
+        }
+        if self._config_role == CU_CP_ROLE:
+            return {**control_plane_checks, "e1-listener": _sctp_listener_check_command(E1_PORT)}
+        if self._config_role == CU_UP_ROLE:
+            return {
+                **user_plane_checks,
+                "e1-association": _sctp_association_check_command(E1_PORT),
+            }
+        return {**control_plane_checks, **user_plane_checks}
+
+    @staticmethod
+    def _check(command: str) -> dict:
+        """Returns a readiness check of the CU running a command in the workload container."""
+        return {
+            "override": "replace",
+            "level": "ready",
+            "period": CHECK_PERIOD,
+            "threshold": CHECK_THRESHOLD,
+            "exec": {"command": command},
+        }
+
+    @property
+    def _glibc_tunables(self) -> str:
+        """Returns the glibc tunables making malloc back its allocations with hugepages.
+
+        glibc then maps the large allocations of nr-softmodem, such as the PDCP buffers, with
+        MAP_HUGETLB using the configured page size, from the hugepages reserved for the pod.
+        """
+        page_size = HUGEPAGE_SIZES_IN_BYTES[self._config_hugepages_page_size]
+        return f"glibc.malloc.hugetlb={page_size}"
+
 
 if __name__ == "__main__":
     main(Oai5GCUOperatorCharm)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Prometheus exporter for the KPIs of the nr-softmodem CU.
+
+The exporter is pushed to the workload container and run by Pebble next to the CU process,
+nr-softmodem or nr-cuup. It only depends on the Python standard library, but needs python3 in
+the workload image. It gathers, on every scrape:
+    - the connected DUs, UEs and PDU sessions from the RRC stats written by nr-softmodem,
+    - the packets and bytes of the F1-U and NG-U network interfaces from /proc/net/dev. On a
+      dedicated NG-U interface, the NG-U bytes are the PDCP throughput of the CU. An interface
+      shared by both endpoints, such as the cluster network one, is exported once, labelled
+      with both endpoints,
+    - the CPU time and resident memory of the CU process from /proc.
+"""
+
+import argparse
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+RRC_STATS_FILE_NAME = "nrRRC_stats.log"
+# The CU-UP runs nr-cuup, a CU or a CU-CP nr-softmodem.
+PROCESS_NAMES = {"cu": "nr-softmodem", "cu-cp": "nr-softmodem", "cu-up": "nr-cuup"}
+UE_PATTERN = re.compile(r"^UE \d+ ", re.MULTILINE)
+PDU_SESSION_PATTERN = re.compile(r"^\s+PDU session \d+", re.MULTILINE)
+CONNECTED_DUS_PATTERN = re.compile(r"^(\d+) connected DUs", re.MULTILINE)
+DU_PATTERN = re.compile(r"^\[\d+\] DU ID ", re.MULTILINE)
+
+
+class Metric(NamedTuple):
+    """Prometheus metric with its samples, each made of labels and a value."""
+
+    name: str
+    type: str
+    help: str
+    samples: List[Tuple[Dict[str, str], float]]
+
+
+class InterfaceCounters(NamedTuple):
+    """Counters of a network interface."""
+
+    rx_bytes: int
+    rx_packets: int
+    tx_bytes: int
+    tx_packets: int
+
+
+class ProcessStats(NamedTuple):
+    """CPU time and resident memory of a process."""
+
+    cpu_seconds: float
+    resident_memory_bytes: int
+
+
+class StatsSource:
+    """Reads the stats output of nr-softmodem and /proc."""
+
+    def __init__(
+        self,
+        stats_directory: str,
+        process_name: str = "nr-softmodem",
+        proc_directory: str = "/proc",
+    ):
+        """Init.
+
+        Args:
+            stats_directory: Working directory of nr-softmodem, where it writes its stats.
+            process_name: Name of the CU process, nr-cuup for a CU-UP.
+            proc_directory: Mount point of procfs.
+        """
+        self.stats_directory = stats_directory
+        self.process_name = process_name
+        self.proc_directory = proc_directory
+
+    def read_rrc_stats(self) -> Optional[str]:
+        """Returns the RRC stats of nr-softmodem, None if it did not write them yet."""
+        return _read(os.path.join(self.stats_directory, RRC_STATS_FILE_NAME))
+
+    def read_net_dev(self) -> Optional[str]:
+        """Returns the content of /proc/net/dev."""
+        return _read(os.path.join(self.proc_directory, "net", "dev"))
+
+    def read_process_stat(self) -> Optional[Tuple[str, str]]:
+        """Returns the content of the `stat` and `status` files of the CU process.
+
+        Returns:
+            Tuple: Content of both files, None if the CU process is not running.
+        """
+        for pid in filter(str.isdigit, os.listdir(self.proc_directory)):
+            process_directory = os.path.join(self.proc_directory, pid)
+            if _read(os.path.join(process_directory, "comm")) != f"{self.process_name}\n":
+                continue
+            stat = _read(os.path.join(process_directory, "stat"))
+            status = _read(os.path.join(process_directory, "status"))
+            if stat and status:
+                return stat, status
+        return None
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def parse_rrc_stats(content: str) -> Dict[str, int]:
+    """Returns the number of connected DUs, UEs and PDU sessions in RRC stats.
+
+    Args:
+        content: Content of the RRC stats file.
+
+    Returns:
+        dict: `connected_dus`, `rrc_connected_ues` and `pdu_sessions`.
+    """
+    connected_dus = CONNECTED_DUS_PATTERN.search(content)
+    return {
+        "connected_dus": (
+            int(connected_dus.group(1)) if connected_dus else len(DU_PATTERN.findall(content))
+        ),
+        "rrc_connected_ues": len(UE_PATTERN.findall(content)),
+        "pdu_sessions": len(PDU_SESSION_PATTERN.findall(content)),
+    }
+
+
+def parse_net_dev(content: str) -> Dict[str, InterfaceCounters]:
+    """Returns the counters of every network interface of /proc/net/dev.
+
+    Args:
+        content: Content of /proc/net/dev.
+
+    Returns:
+        dict: Counters by interface name.
+    """
+    interfaces = {}
+    for line in content.splitlines()[2:]:
+        name, _, counters = line.partition(":")
+        fields = counters.split()
+        if len(fields) < 10:
+            continue
+        interfaces[name.strip()] = InterfaceCounters(
+            rx_bytes=int(fields[0]),
+            rx_packets=int(fields[1]),
+            tx_bytes=int(fields[8]),
+            tx_packets=int(fields[9]),
+        )
+    return interfaces
+
+
+def parse_process_stat(stat: str, status: str, clock_ticks: int, page_size: int) -> ProcessStats:
+    """Returns the CPU time and resident memory of a process.
+
+    Args:
+        stat: Content of /proc/<pid>/stat.
+        status: Content of /proc/<pid>/status.
+        clock_ticks: Number of clock ticks per second.
+        page_size: Size of a memory page in bytes, used if status has no VmRSS.
+
+    Returns:
+        ProcessStats: CPU time and resident memory of the process.
+    """
+    # The command name may contain spaces, the fields of interest follow its closing bracket.
+    fields = stat.rpartition(")")[2].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / clock_ticks
+    resident_memory_bytes = int(fields[21]) * page_size
+    vm_rss = re.search(r"^VmRSS:\s+(\d+) kB", status, re.MULTILINE)
+    if vm_rss:
+        resident_memory_bytes = int(vm_rss.group(1)) * 1024
+    return ProcessStats(cpu_seconds=cpu_seconds, resident_memory_bytes=resident_memory_bytes)
+
+
+def collect(source: StatsSource, f1u_interface: str, ngu_interface: str) -> List[Metric]:
+    """Gathers the CU metrics.
+
+    Metrics whose source can not be read, for instance before nr-softmodem wrote its first
+    stats, are left out.
+
+    Args:
+        source: Stats source.
+        f1u_interface: Name of the network interface carrying F1-U.
+        ngu_interface: Name of the network interface carrying NG-U.
+
+    Returns:
+        list: Metrics.
+    """
+    metrics = []
+    rrc_stats = source.read_rrc_stats()
+    if rrc_stats is not None:
+        rrc_counts = parse_rrc_stats(rrc_stats)
+        metrics += [
+            Metric(
+                "oai_cu_connected_dus",
+                "gauge",
+                "Number of DUs connected over F1.",
+                [({}, rrc_counts["connected_dus"])],
+            ),
+            Metric(
+                "oai_cu_rrc_connected_ues",
+                "gauge",
+                "Number of UEs with an RRC context.",
+                [({}, rrc_counts["rrc_connected_ues"])],
+            ),
+            Metric(
+                "oai_cu_pdu_sessions",
+                "gauge",
+                "Number of established PDU sessions.",
+                [({}, rrc_counts["pdu_sessions"])],
+            ),
+        ]
+    net_dev = source.read_net_dev()
+    if net_dev is not None:
+        metrics += _interface_metrics(
+            parse_net_dev(net_dev), {"f1u": f1u_interface, "ngu": ngu_interface}
+        )
+    process_stat = source.read_process_stat()
+    if process_stat is not None:
+        process_stats = parse_process_stat(
+            *process_stat,
+            clock_ticks=os.sysconf("SC_CLK_TCK"),
+            page_size=os.sysconf("SC_PAGE_SIZE"),
+        )
+        metrics += [
+            Metric(
+                "oai_cu_process_cpu_seconds_total",
+                "counter",
+                "CPU time consumed by the CU process in seconds.",
+                [({}, process_stats.cpu_seconds)],
+            ),
+            Metric(
+                "oai_cu_process_resident_memory_bytes",
+                "gauge",
+                "Resident memory of the CU process in bytes.",
+                [({}, process_stats.resident_memory_bytes)],
+            ),
+        ]
+    return metrics
+
+
+def _interface_metrics(
+    interfaces: Dict[str, InterfaceCounters], interface_names: Dict[str, str]
+) -> List[Metric]:
+    packets = Metric(
+        "oai_cu_interface_packets_total",
+        "counter",
+        "Packets received and sent on the network interface of an F1-U or NG-U endpoint.",
+        [],
+    )
+    octets = Metric(
+        "oai_cu_interface_bytes_total",
+        "counter",
+        "Bytes received and sent on the network interface of an F1-U or NG-U endpoint.",
+        [],
+    )
+    endpoints_by_interface: Dict[str, List[str]] = {}
+    for endpoint, interface_name in interface_names.items():
+        endpoints_by_interface.setdefault(interface_name, []).append(endpoint)
+    for interface_name, endpoints in endpoints_by_interface.items():
+        counters = interfaces.get(interface_name)
+        if not counters:
+            continue
+        endpoint = ",".join(endpoints)
+        for direction in ("rx", "tx"):
+            labels = {"endpoint": endpoint, "interface": interface_name, "direction": direction}
+            packets.samples.append((labels, getattr(counters, f"{direction}_packets")))
+            octets.samples.append((labels, getattr(counters, f"{direction}_bytes")))
+    return [metric for metric in (packets, octets) if metric.samples]
+
+
+def render(metrics: List[Metric]) -> str:
+    """Returns metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for labels, value in metric.samples:
+            label_pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            lines.append(
+                f"{metric.name}{{{label_pairs}}} {value}" if labels else f"{metric.name} {value}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def _handler(source: StatsSource, f1u_interface: str, ngu_interface: str) -> type:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render(collect(source, f1u_interface, ngu_interface)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def main() -> None:
+    """Serves the CU metrics until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--stats-directory", required=True)
+    parser.add_argument("--f1u-interface", required=True)
+    parser.add_argument("--ngu-interface", required=True)
+    parser.add_argument("--role", choices=sorted(PROCESS_NAMES), default="cu")
+    args = parser.parse_args()
+    handler = _handler(
+        StatsSource(stats_directory=args.stats_directory, process_name=PROCESS_NAMES[args.role]),
+        f1u_interface=args.f1u_interface,
+        ngu_interface=args.ngu_interface,
+    )
+    ThreadingHTTPServer(("", args.port), handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
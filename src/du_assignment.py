@@ -0,0 +1,42 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Assignment of the DUs to the CU units when the CU is scaled out."""
+
+import hashlib
+import math
+from typing import Dict, Iterable, List
+
+
+def _rank(du_key: str, unit_name: str) -> int:
+    """Returns the rendezvous hashing weight of a unit for a DU."""
+    return int.from_bytes(hashlib.sha256(f"{du_key}/{unit_name}".encode()).digest()[:8], "big")
+
+
+def assign_dus(du_keys: Iterable[str], unit_names: Iterable[str]) -> Dict[str, str]:
+    """Assigns every DU to a CU unit with rendezvous hashing bounded by load.
+
+    Each DU ranks the units by the hash of the DU and unit names, and is assigned to the best
+    ranked unit that serves fewer than `ceil(DUs / units)` DUs. The assignment only depends on
+    its inputs, and adding or removing a unit mostly moves the DUs which rank that unit first.
+
+    Args:
+        du_keys: Unique keys of the DUs.
+        unit_names: Names of the CU units able to serve DUs.
+
+    Returns:
+        dict: Name of the assigned unit by DU key, empty if there is no unit.
+    """
+    units = sorted(set(unit_names))
+    dus = sorted(set(du_keys))
+    if not units:
+        return {}
+    capacity = math.ceil(len(dus) / len(units))
+    loads = {unit: 0 for unit in units}
+    assignments = {}
+    for du in dus:
+        ranked_units: List[str] = sorted(units, key=lambda unit: _rank(du, unit), reverse=True)
+        unit = next(unit for unit in ranked_units if loads[unit] < capacity)
+        loads[unit] += 1
+        assignments[du] = unit
+    return assignments
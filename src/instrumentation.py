@@ -0,0 +1,140 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Timing of the phases of a hook.
+
+Every phase runs in a span recording its duration and outcome. Finished spans are logged as
+structured (JSON) log lines and, once the outermost span of the hook ends, handed to a span
+exporter. The default exporter drops them; an exporter forwarding them to an OpenTelemetry
+collector can be plugged in without touching the instrumented code.
+"""
+
+import json
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+OK_OUTCOME = "ok"
+ERROR_OUTCOME = "error"
+
+
+@dataclass
+class Span:
+    """Timed phase of a hook, modelled after an OpenTelemetry span.
+
+    Attributes:
+        name: Name of the phase.
+        trace_id: Identifier shared by all the spans of a hook, as 32 hex digits.
+        span_id: Identifier of the span, as 16 hex digits.
+        parent_span_id: Identifier of the enclosing span, None for the outermost span.
+        start_time_ns: Wall clock time at which the phase started, in nanoseconds.
+        duration_ns: Duration of the phase in nanoseconds, measured with a monotonic clock.
+        outcome: `ok` unless set by the phase, `error` if the phase raised an exception.
+        attributes: Additional details of the phase.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_time_ns: int
+    duration_ns: int = 0
+    outcome: str = OK_OUTCOME
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> float:
+        """Returns the duration of the phase in seconds."""
+        return self.duration_ns / 1e9
+
+    def to_dict(self) -> dict:
+        """Returns the span as a JSON serializable dictionary."""
+        return {
+            "span": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "outcome": self.outcome,
+            **self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives the spans of a hook once its outermost span ended.
+
+    This exporter drops the spans. Subclasses forward them, e.g. to an OpenTelemetry collector.
+    """
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Exports the finished spans of a hook.
+
+        Args:
+            spans: Spans in the order in which they finished, the outermost span last.
+        """
+
+
+class Tracer:
+    """Records the phases of a hook as nested spans."""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        """Init.
+
+        Args:
+            exporter: Exporter of the finished spans, spans are only logged if None.
+        """
+        self.exporter = exporter or SpanExporter()
+        self._active_spans: List[Span] = []
+        self._finished_spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Times the phase run in the context.
+
+        The outcome of the span can be set by the phase, it is set to `error` if the phase
+        raises an exception.
+
+        Args:
+            name: Name of the phase.
+            attributes: Additional details of the phase.
+
+        Yields:
+            Span: Span of the phase.
+        """
+        parent = self._active_spans[-1] if self._active_spans else None
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else None,
+            start_time_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        self._active_spans.append(span)
+        start_time = time.monotonic_ns()
+        try:
+            yield span
+        except BaseException as e:
+            span.outcome = ERROR_OUTCOME
+            span.attributes["exception"] = type(e).__name__
+            raise
+        finally:
+            span.duration_ns = time.monotonic_ns() - start_time
+            self._active_spans.pop()
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        logger.info(json.dumps(span.to_dict(), default=str))
+        self._finished_spans.append(span)
+        if span.parent_span_id is not None:
+            return
+        spans, self._finished_spans = self._finished_spans, []
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            logger.warning(f"Could not export spans of trace {span.trace_id}: {e}")
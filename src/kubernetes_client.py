@@ -1,97 +1,610 @@
 # Copyright 2022 Guillaume Belanger
 # See LICENSE file for licensing details.
 
-"""Kubernetes specific utilities."""
+"""Kubernetes specific utilities.
 
+lightkube is only imported once the Kubernetes API is used, so that hooks which never talk to
+Kubernetes do not pay for importing it.
+"""
+
+import json
 import logging
-from typing import Optional, Tuple
+import queue
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type
 
-from lightkube import Client
-from lightkube.resources.apps_v1 import StatefulSet
-from lightkube.resources.core_v1 import Service
-from lightkube.types import PatchType
+if TYPE_CHECKING:
+    from lightkube import Client
+    from lightkube.generic_resource import GenericNamespacedResource
+    from lightkube.models.core_v1 import Container, PodSpec
+    from lightkube.resources.apps_v1 import StatefulSet
+    from lightkube.resources.core_v1 import Service
 
 logger = logging.getLogger(__name__)
 
+FIELD_MANAGER = "oai-5g-cu-operator"
+HUGEPAGES_VOLUME_NAME = "hugepages"
+HUGEPAGES_MOUNT_PATH = "/dev/hugepages"
+NETWORKS_ANNOTATION = "k8s.v1.cni.cncf.io/networks"
+RESOURCE_NAME_ANNOTATION = "k8s.v1.cni.cncf.io/resourceName"
+# Requests and limits of the charm container and of the init container that Juju adds to the
+# pod, as every container must have equal requests and limits for the pod to be Guaranteed.
+SIDECAR_CONTAINER_RESOURCES = {"cpu": "250m", "memory": "512Mi"}
+
+
+@lru_cache(maxsize=None)
+def get_lightkube_client() -> "Client":
+    """Returns the lightkube client shared by the hook process, creating it on first use.
+
+    Creating a client parses the kubeconfig and sets up a TLS connection pool, so a single
+    instance is shared between the charm and the charm libraries that talk to Kubernetes.
+    """
+    from lightkube import Client
+
+    return Client()
+
+
+@lru_cache(maxsize=None)
+def _network_attachment_definition_resource() -> Type["GenericNamespacedResource"]:
+    """Returns the lightkube resource of the Multus NetworkAttachmentDefinitions."""
+    from lightkube.generic_resource import create_namespaced_resource
+
+    return create_namespaced_resource(
+        group="k8s.cni.cncf.io",
+        version="v1",
+        kind="NetworkAttachmentDefinition",
+        plural="network-attachment-definitions",
+    )
+
+
+def _load_balancer_address(service: "Service") -> Tuple[Optional[str], Optional[str]]:
+    """Returns the hostname and IP of the first ingress of a LoadBalancer service."""
+    if not service.status or not service.status.loadBalancer:
+        return None, None
+    ingress = service.status.loadBalancer.ingress
+    if not ingress:
+        return None, None
+    return ingress[0].hostname, ingress[0].ip
+
+
+def _container(pod_spec: "PodSpec", container_name: str) -> "Container":
+    """Returns a container of a pod spec based on its name."""
+    for container in pod_spec.containers:
+        if container.name == container_name:
+            return container
+    raise RuntimeError(f"Could not find container {container_name} in pod spec")
+
+
+def _container_resources_match(container: "Container", resources: Dict[str, str]) -> bool:
+    """Returns whether both the requests and the limits of a container equal `resources`.
+
+    Quantities are compared canonically, as `1Gi` and `1024Mi` are the same amount of memory.
+    """
+    from lightkube.utils.quantity import equals_canonically
+
+    if not container.resources:
+        return not resources
+    requests = container.resources.requests or {}
+    limits = container.resources.limits or {}
+    return equals_canonically(requests, resources) and equals_canonically(limits, resources)
+
+
+def _sidecar_containers(pod_spec: "PodSpec", container_name: str) -> List["Container"]:
+    """Returns the containers and init containers of a pod spec other than the workload one."""
+    return [
+        container
+        for container in [*pod_spec.containers, *(pod_spec.initContainers or [])]
+        if container.name != container_name
+    ]
+
+
+def _hugepages_page_size(pod_spec: "PodSpec", container: "Container") -> Optional[str]:
+    """Returns the page size of the hugepages volume mounted in a container, None if absent."""
+    volumes = [volume for volume in pod_spec.volumes or [] if volume.name == HUGEPAGES_VOLUME_NAME]
+    volume_mounts = [
+        volume_mount
+        for volume_mount in container.volumeMounts or []
+        if volume_mount.name == HUGEPAGES_VOLUME_NAME
+    ]
+    if not volumes or not volume_mounts or volume_mounts[0].mountPath != HUGEPAGES_MOUNT_PATH:
+        return None
+    empty_dir = volumes[0].emptyDir
+    if not empty_dir or not empty_dir.medium:
+        return None
+    return empty_dir.medium.partition("HugePages-")[2] or None
+
+
+def _pod_networks(statefulset: "StatefulSet") -> List[dict]:
+    """Returns the Multus networks attached to the pods of a statefulset, empty if none."""
+    metadata = statefulset.spec.template.metadata  # type: ignore[union-attr]
+    annotations = metadata.annotations if metadata and metadata.annotations else {}
+    return json.loads(annotations.get(NETWORKS_ANNOTATION, "[]"))
+
 
 class KubernetesClient:
     """Kubernetes main class."""
 
-    def __init__(self, namespace: str):
-        """Initializes K8s client."""
-        self.client = Client()
+    def __init__(self, namespace: str, cache_ttl: Optional[float] = None):
+        """Initializes K8s client.
+
+        Args:
+            namespace: Kubernetes namespace.
+            cache_ttl: Number of seconds during which a service lookup is served from memory.
+                Caching is disabled if None.
+        """
         self.namespace = namespace
+        self.cache_ttl = cache_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._service_cache: Dict[str, Tuple[float, "Service"]] = {}
+
+    @property
+    def client(self) -> "Client":
+        """Returns the shared lightkube client."""
+        return get_lightkube_client()
+
+    def get_service(self, name: str) -> "Service":
+        """Gets service based on name.
+
+        When caching is enabled, a service fetched less than `cache_ttl` seconds ago is
+        returned from memory instead of being fetched again from the Kubernetes API.
+        """
+        from lightkube.resources.core_v1 import Service
 
-    def get_service(self, name: str) -> Service:
-        """Gets service based on name."""
-        return self.client.get(Service, name, namespace=self.namespace)  # type: ignore[return-value]  # noqa: E501
+        if self.cache_ttl is None:
+            return self.client.get(Service, name, namespace=self.namespace)  # type: ignore[return-value]  # noqa: E501
+        cached = self._service_cache.get(name)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            self.cache_hits += 1
+            return cached[1]
+        self.cache_misses += 1
+        service = self.client.get(Service, name, namespace=self.namespace)
+        self._cache_service(name, service)  # type: ignore[arg-type]
+        return service  # type: ignore[return-value]
+
+    def _cache_service(self, name: str, service: "Service") -> None:
+        if self.cache_ttl is None:
+            return
+        self._service_cache[name] = (time.monotonic(), service)
+
+    def _invalidate_service(self, name: str) -> None:
+        """Drops a service from the cache once the charm changed it."""
+        self._service_cache.pop(name, None)
 
     def get_service_load_balancer_address(self, name: str) -> Tuple[Optional[str], Optional[str]]:
-        """Retrieves LoadBalancer address based on service name."""
+        """Retrieves LoadBalancer address based on service name.
+
+        Returns:
+            Tuple: Hostname and IP of the LoadBalancer, both None if no ingress is assigned yet.
+        """
         service = self.get_service(name)
         if service.spec.type != "LoadBalancer":
             raise RuntimeError("Service is not of type LoadBalancer.")
-        ingress = service.status.loadBalancer.ingress
-        if not ingress:
-            raise RuntimeError("The service has no ingress address.")
-        return ingress[0].hostname, ingress[0].ip
+        return _load_balancer_address(service)
+
+    def wait_for_service_load_balancer_address(
+        self, name: str, timeout: int
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Waits for the LoadBalancer of a service to be assigned an address.
+
+        The service is watched so that the address is returned as soon as it is assigned. The
+        watch runs in a daemon thread so that the wait is bounded by `timeout` even when the API
+        server sends no event.
+
+        Args:
+            name: Service name.
+            timeout: Maximum number of seconds to wait for.
+
+        Returns:
+            Tuple: Hostname and IP of the LoadBalancer, both None if none was assigned in time.
+        """
+        hostname, ip = self.get_service_load_balancer_address(name)
+        if ip:
+            return hostname, ip
+        services: "queue.Queue[Optional[Service]]" = queue.Queue()
+        watch_thread = threading.Thread(
+            target=self._watch_service_until_load_balancer_address,
+            kwargs={"name": name, "timeout": timeout, "services": services},
+            daemon=True,
+        )
+        watch_thread.start()
+        try:
+            service = services.get(timeout=timeout)
+        except queue.Empty:
+            service = None
+        if not service:
+            logger.info(f"Service {name} was not assigned a LoadBalancer address in {timeout}s")
+            return None, None
+        self._cache_service(name, service)
+        return _load_balancer_address(service)
+
+    def _watch_service_until_load_balancer_address(
+        self, name: str, timeout: int, services: "queue.Queue[Optional[Service]]"
+    ) -> None:
+        """Puts the service in `services` once it has an address, or None when the watch ends."""
+        from lightkube.resources.core_v1 import Service
+
+        try:
+            for _, service in self.client.watch(
+                Service,
+                namespace=self.namespace,
+                fields={"metadata.name": name},
+                server_timeout=timeout,
+            ):
+                if _load_balancer_address(service)[1]:  # type: ignore[arg-type]
+                    services.put(service)  # type: ignore[arg-type]
+                    return
+        except Exception as e:
+            logger.warning(f"Watch of service {name} failed: {e}")
+        services.put(None)
+
+    def apply_load_balancer_service(
+        self, name: str, selector: Dict[str, str], ports: List[dict]
+    ) -> None:
+        """Creates or updates a LoadBalancer service with a server-side apply patch.
+
+        Args:
+            name: Service name.
+            selector: Labels of the pods the service routes to.
+            ports: Ports of the service, e.g. `{"name": "f1", "port": 2153, "protocol": "UDP"}`.
+        """
+        from lightkube.resources.core_v1 import Service
+        from lightkube.types import PatchType
+
+        self.client.patch(
+            res=Service,
+            name=name,
+            obj={
+                "apiVersion": "v1",
+                "kind": "Service",
+                "metadata": {"name": name},
+                "spec": {"type": "LoadBalancer", "selector": selector, "ports": ports},
+            },
+            patch_type=PatchType.APPLY,
+            namespace=self.namespace,
+            field_manager=FIELD_MANAGER,
+            force=True,
+        )
+        self._invalidate_service(name)
+        logger.info(f"Service {name} applied")
+
+    def patch_service(self, name: str, ports: List[dict], service_type: str) -> bool:
+        """Patches the type and ports of the service Juju created for the application.
+
+        This replaces `KubernetesServicePatch` from the observability libraries: it uses the
+        shared client and does not register an ops Object, so that the hooks which need it
+        can call it directly. The service is only patched if its ports differ.
+
+        Args:
+            name: Service name.
+            ports: Ports of the service, e.g. `{"name": "f1", "port": 2153, "protocol": "UDP"}`.
+            service_type: Type of the service, e.g. `LoadBalancer`.
+
+        Returns:
+            bool: Whether the service was patched.
+        """
+        from lightkube.core.exceptions import ApiError
+        from lightkube.resources.core_v1 import Service
+        from lightkube.types import PatchType
+
+        expected_ports = [(port["port"], port["targetPort"]) for port in ports]
+        try:
+            spec = self.client.get(Service, name, namespace=self.namespace).spec
+            fetched_ports = (
+                [(port.port, port.targetPort) for port in spec.ports or []] if spec else []
+            )
+            if spec and spec.type == service_type and fetched_ports == expected_ports:
+                return False
+            self.client.patch(
+                Service,
+                name,
+                {"spec": {"type": service_type, "ports": ports}},
+                patch_type=PatchType.MERGE,
+                namespace=self.namespace,
+            )
+        except ApiError as e:
+            if e.status.code == 403:
+                logger.error("Kubernetes service patch failed: `juju trust` this application.")
+            else:
+                logger.error(f"Kubernetes service patch failed: {e}")
+            return False
+        self._invalidate_service(name)
+        logger.info(f"Service {name} patched")
+        return True
+
+    def delete_service(self, name: str) -> None:
+        """Deletes a service, doing nothing if it does not exist.
+
+        Args:
+            name: Service name.
+        """
+        from lightkube.core.exceptions import ApiError
+        from lightkube.resources.core_v1 import Service
+
+        try:
+            self.client.delete(Service, name, namespace=self.namespace)
+        except ApiError as e:
+            if e.status.code != 404:
+                raise
+        self._invalidate_service(name)
+        logger.info(f"Service {name} deleted")
+
+    def apply_network_attachment_definition(
+        self, name: str, config: dict, resource_name: Optional[str] = None
+    ) -> None:
+        """Creates or updates a Multus NetworkAttachmentDefinition with a server-side apply patch.
+
+        Args:
+            name: NetworkAttachmentDefinition name.
+            config: CNI configuration of the network, e.g. `{"type": "macvlan", ...}`.
+            resource_name: Device plugin resource the interfaces of the network are allocated
+                from, e.g. SR-IOV virtual functions. No resource is set if None.
+        """
+        from lightkube.types import PatchType
+
+        metadata: dict = {"name": name}
+        if resource_name:
+            metadata["annotations"] = {RESOURCE_NAME_ANNOTATION: resource_name}
+        self.client.patch(
+            res=_network_attachment_definition_resource(),
+            name=name,
+            obj={
+                "apiVersion": "k8s.cni.cncf.io/v1",
+                "kind": "NetworkAttachmentDefinition",
+                "metadata": metadata,
+                "spec": {"config": json.dumps(config)},
+            },
+            patch_type=PatchType.APPLY,
+            namespace=self.namespace,
+            field_manager=FIELD_MANAGER,
+            force=True,
+        )
+        logger.info(f"NetworkAttachmentDefinition {name} applied")
+
+    def delete_network_attachment_definition(self, name: str) -> None:
+        """Deletes a NetworkAttachmentDefinition, doing nothing if it does not exist.
+
+        Args:
+            name: NetworkAttachmentDefinition name.
+        """
+        from lightkube.core.exceptions import ApiError
+
+        try:
+            self.client.delete(
+                _network_attachment_definition_resource(), name, namespace=self.namespace
+            )
+        except ApiError as e:
+            if e.status.code != 404:
+                raise
+        logger.info(f"NetworkAttachmentDefinition {name} deleted")
 
     def patch_statefulset(
         self,
         statefulset_name: str,
-    ) -> None:
-        """Patches a statefulset with volumes and volume mounts.
+        container_name: str,
+        resources: Optional[Dict[str, str]] = None,
+        hugepages_page_size: Optional[str] = None,
+        networks: Optional[List[dict]] = None,
+    ) -> bool:
+        """Runs the workload container of a statefulset as privileged root if it is not already.
+
+        The statefulset is read once. If it is not patched yet, a server-side apply patch that
+        only contains the fields managed by the charm is sent, so that repeating it is a no-op.
 
         Args:
             statefulset_name: Statefulset name.
+            container_name: Name of the workload container.
+            resources: Resources of the workload container (e.g. `{"cpu": "2"}`), used as both
+                its requests and its limits. The charm and init containers then get equal
+                requests and limits too, so that the pod gets the Guaranteed QoS class. If
+                empty, the resources previously applied by the charm are removed. Resources are
+                not checked if None.
+            hugepages_page_size: Size of the hugepages (e.g. `2Mi`) backing a hugetlbfs volume
+                mounted in the workload container at `/dev/hugepages`. The hugepages themselves
+                must be requested in `resources`. No hugepages volume is mounted if None.
+            networks: Multus networks attached to the pods as secondary interfaces, e.g.
+                `{"name": "f1u", "interface": "f1u", "ips": ["192.168.251.5/24"]}`. Their
+                NetworkAttachmentDefinitions must exist. No network is attached if None.
 
         Returns:
-            None
+            bool: Whether the statefulset was patched, in which case its pods are rolled.
         """
+        from lightkube.resources.apps_v1 import StatefulSet
+        from lightkube.types import PatchType
+
         statefulset = self.client.get(
             res=StatefulSet, name=statefulset_name, namespace=self.namespace
         )
-        if not hasattr(statefulset, "spec"):
-            raise RuntimeError(f"Could not find `spec` in the {statefulset_name} statefulset")
-
-        statefulset.spec.template.spec.securityContext.runAsUser = 0
-        statefulset.spec.template.spec.securityContext.runAsGroup = 0
-        statefulset.spec.template.spec.containers[1].securityContext.privileged = True
-
+        if self._statefulset_is_patched(
+            statefulset=statefulset,  # type: ignore[arg-type]
+            container_name=container_name,
+            resources=resources,
+            hugepages_page_size=hugepages_page_size,
+            networks=networks,
+        ):
+            logger.info(f"Statefulset {statefulset_name} is already patched")
+            return False
         self.client.patch(
             res=StatefulSet,
             name=statefulset_name,
-            obj=statefulset,
-            patch_type=PatchType.MERGE,
+            obj=self._statefulset_patch(
+                statefulset_name=statefulset_name,
+                container_name=container_name,
+                resources=resources,
+                hugepages_page_size=hugepages_page_size,
+                networks=networks,
+                pod_spec=statefulset.spec.template.spec,  # type: ignore[union-attr]
+            ),
+            patch_type=PatchType.APPLY,
             namespace=self.namespace,
+            field_manager=FIELD_MANAGER,
+            force=True,
         )
-        logger.info(f"Statefulset {statefulset_name} patched with security group")
+        logger.info(f"Statefulset {statefulset_name} patched with security context and resources")
+        return True
 
-    def statefulset_is_patched(self, statefulset_name: str) -> bool:
+    def statefulset_is_patched(
+        self,
+        statefulset_name: str,
+        container_name: str,
+        resources: Optional[Dict[str, str]] = None,
+        hugepages_page_size: Optional[str] = None,
+        networks: Optional[List[dict]] = None,
+    ) -> bool:
         """Returns whether the statefulset is patched or not.
 
         Args:
             statefulset_name: Statefulset name.
+            container_name: Name of the workload container.
+            resources: Expected requests and limits of the workload container, not checked if
+                None.
+            hugepages_page_size: Expected size of the hugepages of the hugepages volume, which
+                must be absent if None.
+            networks: Expected Multus networks of the pods, which must be absent if None.
 
         Returns:
             True if the statefulset is patched, False otherwise.
         """
+        from lightkube.resources.apps_v1 import StatefulSet
+
         statefulset = self.client.get(
             res=StatefulSet, name=statefulset_name, namespace=self.namespace
         )
-        if not hasattr(statefulset, "spec"):
-            raise RuntimeError(f"Could not find `spec` in the {statefulset_name} statefulset")
+        return self._statefulset_is_patched(
+            statefulset=statefulset,  # type: ignore[arg-type]
+            container_name=container_name,
+            resources=resources,
+            hugepages_page_size=hugepages_page_size,
+            networks=networks,
+        )
+
+    @staticmethod
+    def _statefulset_patch(
+        statefulset_name: str,
+        container_name: str,
+        resources: Optional[Dict[str, str]] = None,
+        hugepages_page_size: Optional[str] = None,
+        networks: Optional[List[dict]] = None,
+        pod_spec: Optional["PodSpec"] = None,
+    ) -> dict:
+        """Returns the minimal statefulset manifest to server-side apply.
+
+        Args:
+            statefulset_name: Statefulset name.
+            container_name: Name of the workload container.
+            resources: Requests and limits of the workload container.
+            hugepages_page_size: Size of the hugepages backing the hugepages volume.
+            networks: Multus networks attached to the pods.
+            pod_spec: Current pod spec of the statefulset, whose other containers and init
+                containers get `SIDECAR_CONTAINER_RESOURCES` when `resources` are set.
+
+        Returns:
+            dict: Statefulset manifest with only the fields managed by the charm.
+        """
+        container: dict = {"name": container_name, "securityContext": {"privileged": True}}
+        containers = [container]
+        init_containers = []
+        if resources:
+            container["resources"] = {"requests": dict(resources), "limits": dict(resources)}
+            sidecar_resources = {
+                "requests": dict(SIDECAR_CONTAINER_RESOURCES),
+                "limits": dict(SIDECAR_CONTAINER_RESOURCES),
+            }
+            if pod_spec:
+                containers.extend(
+                    {"name": sidecar.name, "resources": sidecar_resources}
+                    for sidecar in pod_spec.containers
+                    if sidecar.name != container_name
+                )
+                init_containers = [
+                    {"name": init_container.name, "resources": sidecar_resources}
+                    for init_container in pod_spec.initContainers or []
+                ]
+        pod_spec_patch: dict = {
+            "securityContext": {"runAsUser": 0, "runAsGroup": 0},
+            "containers": containers,
+        }
+        if init_containers:
+            pod_spec_patch["initContainers"] = init_containers
+        if hugepages_page_size:
+            container["volumeMounts"] = [
+                {"name": HUGEPAGES_VOLUME_NAME, "mountPath": HUGEPAGES_MOUNT_PATH}
+            ]
+            pod_spec_patch["volumes"] = [
+                {
+                    "name": HUGEPAGES_VOLUME_NAME,
+                    "emptyDir": {"medium": f"HugePages-{hugepages_page_size}"},
+                }
+            ]
+        template: dict = {"spec": pod_spec_patch}
+        if networks:
+            template["metadata"] = {"annotations": {NETWORKS_ANNOTATION: json.dumps(networks)}}
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "StatefulSet",
+            "metadata": {"name": statefulset_name},
+            "spec": {"template": template},
+        }
+
+    @staticmethod
+    def _statefulset_is_patched(
+        statefulset: "StatefulSet",
+        container_name: str,
+        resources: Optional[Dict[str, str]] = None,
+        hugepages_page_size: Optional[str] = None,
+        networks: Optional[List[dict]] = None,
+    ) -> bool:
+        """Returns whether the statefulset contains the fields managed by the charm.
 
-        if statefulset.spec.template.spec.securityContext.runAsUser != 0:
+        Args:
+            statefulset: Statefulset.
+            container_name: Name of the workload container.
+            resources: Expected requests and limits of the workload container, not checked if
+                None.
+            hugepages_page_size: Expected size of the hugepages of the hugepages volume, which
+                must be absent if None.
+            networks: Expected Multus networks of the pods, which must be absent if None.
+
+        Returns:
+            True if the statefulset is patched, False otherwise.
+        """
+        if not statefulset.spec:
+            raise RuntimeError("Could not find `spec` in the statefulset")
+        pod_spec = statefulset.spec.template.spec
+        pod_security_context = pod_spec.securityContext  # type: ignore[union-attr]
+
+        if not pod_security_context or pod_security_context.runAsUser != 0:
             logger.info("runAsUser is not set to 0")
             return False
 
-        if statefulset.spec.template.spec.securityContext.runAsGroup != 0:
+        if pod_security_context.runAsGroup != 0:
             logger.info("runAsGroup is not set to 0")
             return False
 
-        if not statefulset.spec.template.spec.containers[1].securityContext.privileged:
+        container = _container(pod_spec, container_name)  # type: ignore[arg-type]
+        if not container.securityContext or not container.securityContext.privileged:
             logger.info("workload container is not privileged")
             return False
 
+        if resources is not None and not _container_resources_match(container, resources):
+            logger.info("workload container resources differ")
+            return False
+
+        if resources and not all(
+            _container_resources_match(sidecar, SIDECAR_CONTAINER_RESOURCES)
+            for sidecar in _sidecar_containers(pod_spec, container_name)  # type: ignore[arg-type]
+        ):
+            logger.info("charm or init container resources differ")
+            return False
+
+        if _hugepages_page_size(pod_spec, container) != hugepages_page_size:  # type: ignore[arg-type]  # noqa: E501
+            logger.info("hugepages volume differs")
+            return False
+
+        if _pod_networks(statefulset) != (networks or []):
+            logger.info("pod networks differ")
+            return False
+
         return True
@@ -0,0 +1,87 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Log levels of the nr-softmodem layers, derived from a log profile and per-layer overrides."""
+
+from typing import Dict
+
+LOG_LAYERS = ["global", "hw", "phy", "mac", "rlc", "pdcp", "rrc", "f1ap", "ngap"]
+LOG_LEVELS = ["error", "warn", "analysis", "info", "debug", "trace"]
+PRODUCTION_LOG_PROFILE = "production"
+DEBUG_LOG_PROFILE = "debug"
+CUSTOM_LOG_PROFILE = "custom"
+LOG_PROFILES = [PRODUCTION_LOG_PROFILE, DEBUG_LOG_PROFILE, CUSTOM_LOG_PROFILE]
+
+# Layers handling every PDU only log warnings in production, as logging them at a higher level
+# costs CPU proportional to the user traffic.
+PRODUCTION_LOG_LEVELS = {
+    "global": "info",
+    "hw": "warn",
+    "phy": "warn",
+    "mac": "warn",
+    "rlc": "warn",
+    "pdcp": "warn",
+    "rrc": "info",
+    "f1ap": "info",
+    "ngap": "info",
+}
+DEBUG_LOG_LEVELS = {
+    "global": "info",
+    "hw": "info",
+    "phy": "info",
+    "mac": "info",
+    "rlc": "debug",
+    "pdcp": "info",
+    "rrc": "info",
+    "f1ap": "debug",
+    "ngap": "debug",
+}
+# Pebble already timestamps every line of the service output.
+GLOBAL_LOG_OPTIONS = {
+    PRODUCTION_LOG_PROFILE: ["level", "nocolor"],
+    DEBUG_LOG_PROFILE: ["level", "nocolor", "time"],
+    CUSTOM_LOG_PROFILE: ["level", "nocolor"],
+}
+
+
+def parse_log_level_overrides(value: str) -> Dict[str, str]:
+    """Parses per-layer log levels such as `rlc=debug,f1ap=info`.
+
+    Args:
+        value: Comma separated `<layer>=<level>` pairs.
+
+    Returns:
+        dict: Log level by layer.
+
+    Raises:
+        ValueError: if a layer or a level is not known.
+    """
+    overrides = {}
+    for override in value.split(","):
+        if not override.strip():
+            continue
+        layer, _, level = (part.strip() for part in override.partition("="))
+        if layer not in LOG_LAYERS:
+            raise ValueError(f"Unknown log layer: {layer}")
+        if level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level for layer {layer}: {level}")
+        overrides[layer] = level
+    return overrides
+
+
+def log_levels(profile: str, overrides: str) -> Dict[str, str]:
+    """Returns the log level of every layer.
+
+    Args:
+        profile: Log profile. The `custom` profile starts from the production levels.
+        overrides: Per-layer log levels, only applied to the `custom` profile.
+
+    Returns:
+        dict: Log level by layer.
+    """
+    if profile == DEBUG_LOG_PROFILE:
+        return dict(DEBUG_LOG_LEVELS)
+    levels = dict(PRODUCTION_LOG_LEVELS)
+    if profile == CUSTOM_LOG_PROFILE:
+        levels.update(parse_log_level_overrides(overrides))
+    return levels
@@ -0,0 +1,83 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import unittest
+from unittest.mock import MagicMock
+
+from ops.pebble import PathError
+
+from cgroup import container_cpu_count, parse_cfs_quota, parse_cpu_list, parse_cpu_max
+
+
+def _container_with_files(files: dict) -> MagicMock:
+    def pull(path):
+        if path not in files:
+            raise PathError(kind="not-found", message=f"{path} not found")
+        file = MagicMock()
+        file.read.return_value = files[path]
+        return file
+
+    container = MagicMock()
+    container.pull.side_effect = pull
+    return container
+
+
+class TestCgroup(unittest.TestCase):
+    def test_given_cpu_quota_when_parse_cpu_max_then_number_of_cpus_is_returned(self):
+        self.assertEqual(parse_cpu_max("250000 100000\n"), 2.5)
+
+    def test_given_no_cpu_quota_when_parse_cpu_max_then_none_is_returned(self):
+        self.assertIsNone(parse_cpu_max("max 100000\n"))
+
+    def test_given_unlimited_cfs_quota_when_parse_cfs_quota_then_none_is_returned(self):
+        self.assertIsNone(parse_cfs_quota("-1\n", "100000\n"))
+
+    def test_given_cfs_quota_when_parse_cfs_quota_then_number_of_cpus_is_returned(self):
+        self.assertEqual(parse_cfs_quota("200000\n", "100000\n"), 2)
+
+    def test_given_cpu_ranges_and_single_cpus_when_parse_cpu_list_then_all_cpus_are_counted(self):
+        self.assertEqual(parse_cpu_list("0-3,6,8-9\n"), 7)
+
+    def test_given_empty_cpu_list_when_parse_cpu_list_then_none_is_returned(self):
+        self.assertIsNone(parse_cpu_list("\n"))
+
+    def test_given_cgroup_v2_quota_below_cpuset_when_container_cpu_count_then_quota_is_rounded_down(  # noqa: E501
+        self,
+    ):
+        container = _container_with_files(
+            {
+                "/sys/fs/cgroup/cpu.max": "350000 100000\n",
+                "/sys/fs/cgroup/cpuset.cpus.effective": "0-15\n",
+            }
+        )
+
+        self.assertEqual(container_cpu_count(container), 3)
+
+    def test_given_cgroup_v2_without_quota_when_container_cpu_count_then_cpuset_is_used(self):
+        container = _container_with_files(
+            {
+                "/sys/fs/cgroup/cpu.max": "max 100000\n",
+                "/sys/fs/cgroup/cpuset.cpus.effective": "0-3\n",
+            }
+        )
+
+        self.assertEqual(container_cpu_count(container), 4)
+
+    def test_given_cgroup_v1_when_container_cpu_count_then_cfs_quota_is_used(self):
+        container = _container_with_files(
+            {
+                "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "200000\n",
+                "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+                "/sys/fs/cgroup/cpuset/cpuset.effective_cpus": "0-7\n",
+            }
+        )
+
+        self.assertEqual(container_cpu_count(container), 2)
+
+    def test_given_quota_below_one_cpu_when_container_cpu_count_then_one_cpu_is_returned(self):
+        container = _container_with_files({"/sys/fs/cgroup/cpu.max": "50000 100000\n"})
+
+        self.assertEqual(container_cpu_count(container), 1)
+
+    def test_given_no_cgroup_file_when_container_cpu_count_then_none_is_returned(self):
+        self.assertIsNone(container_cpu_count(_container_with_files({})))
@@ -1,31 +1,48 @@
 # Copyright 2022 Guillaume Belanger
 # See LICENSE file for licensing details.
 
+import json
+import time
 import unittest
-from unittest.mock import patch
+from typing import List, Optional
+from unittest.mock import MagicMock, patch
 
 import ops.testing
+from lightkube.models.apps_v1 import StatefulSetSpec
 from lightkube.models.core_v1 import (
+    Container,
     LoadBalancerIngress,
     LoadBalancerStatus,
+    PodSecurityContext,
+    PodSpec,
+    PodTemplateSpec,
+    ResourceRequirements,
+    SecurityContext,
     Service,
     ServiceSpec,
 )
 from lightkube.models.core_v1 import ServiceStatus as K8sServiceStatus
-from ops.model import ActiveStatus
-from ops.pebble import ServiceInfo, ServiceStartup, ServiceStatus
+from lightkube.models.meta_v1 import LabelSelector
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.types import PatchType
+from ops.model import ActiveStatus, BlockedStatus, WaitingStatus
+from ops.pebble import ChangeError, ServiceInfo, ServiceStartup, ServiceStatus
 from ops.testing import Harness
 
 from charm import Oai5GCUOperatorCharm
+from instrumentation import Span
+from kubernetes_client import get_lightkube_client
 
 
 class TestCharm(unittest.TestCase):
-    @patch("lightkube.core.client.GenericSyncClient")
-    @patch(
-        "charm.KubernetesServicePatch",
-        lambda charm, ports, service_type: None,
-    )
-    def setUp(self, patch_lightkube_client):
+    def setUp(self):
+        lightkube_client_patcher = patch("lightkube.core.client.GenericSyncClient")
+        lightkube_client_patcher.start()
+        self.addCleanup(lightkube_client_patcher.stop)
+        patch_service_patcher = patch("kubernetes_client.KubernetesClient.patch_service")
+        self.patch_service = patch_service_patcher.start()
+        self.addCleanup(patch_service_patcher.stop)
+        self.addCleanup(get_lightkube_client.cache_clear)
         self.model_name = "whatever"
         self.addCleanup(setattr, ops.testing, "SIMULATE_CAN_CONNECT", False)
         self.harness = Harness(Oai5GCUOperatorCharm)
@@ -98,7 +115,7 @@ class TestCharm(unittest.TestCase):
             '    tr_s_preference = "f1";\n\n'
             '    local_s_if_name = "eth0";\n'
             '    local_s_address = "1.2.3.4";\n'
-            f'    remote_s_address = "{du_address}";\n'
+            '    remote_s_address = "0.0.0.0";\n'
             "    local_s_portc   = 501;\n"
             "    local_s_portd   = 2153;\n"
             "    remote_s_portc  = 500;\n"
@@ -228,8 +245,8 @@ class TestCharm(unittest.TestCase):
             "    SCTP :\n"
             "    {\n"
             "        # Number of streams to use in input/output\n"
-            "        SCTP_INSTREAMS  = 2;\n"
-            "        SCTP_OUTSTREAMS = 2;\n"
+            "        SCTP_INSTREAMS  = 16;\n"
+            "        SCTP_OUTSTREAMS = 16;\n"
             "    };\n\n\n"
             "    ////////// AMF parameters:\n"
             f'        amf_ip_address      = ( {{ ipv4       = "{amf_address}";\n'
@@ -265,14 +282,15 @@ class TestCharm(unittest.TestCase):
             "     log_config :\n"
             "     {\n"
             '       global_log_level                      ="info";\n'
-            '       hw_log_level                          ="info";\n'
-            '       phy_log_level                         ="info";\n'
-            '       mac_log_level                         ="info";\n'
-            '       rlc_log_level                         ="debug";\n'
-            '       pdcp_log_level                        ="info";\n'
+            '       hw_log_level                          ="warn";\n'
+            '       phy_log_level                         ="warn";\n'
+            '       mac_log_level                         ="warn";\n'
+            '       rlc_log_level                         ="warn";\n'
+            '       pdcp_log_level                        ="warn";\n'
             '       rrc_log_level                         ="info";\n'
-            '       f1ap_log_level                         ="debug";\n'
-            '       ngap_log_level                         ="debug";\n'
+            '       f1ap_log_level                         ="info";\n'
+            '       ngap_log_level                         ="info";\n'
+            '       global_log_options                    =("level", "nocolor");\n'
             "    };",
         )
 
@@ -297,9 +315,46 @@ class TestCharm(unittest.TestCase):
                 "cu": {
                     "override": "replace",
                     "summary": "cu",
-                    "command": "/opt/oai-gnb/bin/nr-softmodem -O /opt/oai-gnb/etc/gnb.conf --sa -E --rfsim --log_config.global_log_options level nocolor time",  # noqa: E501
+                    "command": "/opt/oai-gnb/bin/nr-softmodem -O /opt/oai-gnb/etc/gnb.conf --sa -E --rfsim --thread-pool -1,-1,-1,-1,-1,-1,-1,-1",  # noqa: E501
                     "startup": "enabled",
-                }
+                    "working-dir": "/opt/oai-gnb",
+                },
+                "cu-exporter": {
+                    "override": "replace",
+                    "summary": "cu metrics exporter",
+                    "command": "python3 /opt/oai-gnb/bin/cu-exporter.py --port 9102 --stats-directory /opt/oai-gnb --f1u-interface eth0 --ngu-interface eth0 --role cu",  # noqa: E501
+                    "startup": "disabled",
+                },
+            },
+            "checks": {
+                "f1c-listener": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "10s",
+                    "threshold": 3,
+                    "exec": {"command": "grep -qE '^ *([^ ]+ +){5}501 ' /proc/net/sctp/eps"},
+                },
+                "f1u-listener": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "10s",
+                    "threshold": 3,
+                    "exec": {"command": "grep -qE '^ *[0-9]+: [0-9A-F]+:0869 ' /proc/net/udp"},
+                },
+                "ngu-listener": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "10s",
+                    "threshold": 3,
+                    "exec": {"command": "grep -qE '^ *[0-9]+: [0-9A-F]+:0868 ' /proc/net/udp"},
+                },
+                "ngap-association": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "10s",
+                    "threshold": 3,
+                    "exec": {"command": "grep -qE '^ *([^ ]+ +){12}38412 ' /proc/net/sctp/assocs"},
+                },
             },
         }
         self.harness.container_pebble_ready("cu")
@@ -337,3 +392,1517 @@ class TestCharm(unittest.TestCase):
         )
 
         assert relation_data["cu_address"] == load_balancer_ip
+
+    @patch("lightkube.Client.get")
+    def test_given_config_file_already_pushed_with_same_content_when_config_changed_then_config_file_is_not_pushed_again(  # noqa: E501
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch("ops.model.Container.push") as mock_push:
+            self.harness.update_config(key_values={})
+
+        mock_push.assert_not_called()
+
+    @patch("lightkube.Client.get")
+    def test_given_config_and_pebble_layer_unchanged_when_config_changed_then_service_is_not_restarted(  # noqa: E501
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch("ops.model.Container.restart") as mock_restart, patch(
+            "ops.model.Container.replan"
+        ) as mock_replan:
+            self.harness.update_config(key_values={})
+
+        mock_restart.assert_not_called()
+        mock_replan.assert_not_called()
+
+    @patch("lightkube.Client.get")
+    def test_given_config_file_content_changed_when_config_changed_then_service_is_restarted(
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch("ops.model.Container.restart") as mock_restart:
+            self.harness.update_config(key_values={"mcc": "001"})
+
+        mock_restart.assert_called_once_with("cu")
+
+    @patch("lightkube.Client.get")
+    def test_given_exporter_fails_to_start_when_config_changed_then_cu_is_still_active(
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+
+        with patch("ops.model.Container.restart") as mock_restart:
+            mock_restart.side_effect = ChangeError("python3: not found", change=MagicMock())
+            self._create_amf_relation_with_valid_data()
+            self._create_du_relation_with_valid_data()
+
+        mock_restart.assert_called_with("cu-exporter")
+        container = self.harness.model.unit.get_container("cu")
+        self.assertTrue(container.get_service("cu").is_running())
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("lightkube.Client.get")
+    def test_given_restart_failed_after_config_file_pushed_when_next_hook_then_service_is_restarted(  # noqa: E501
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        with patch("ops.model.Container.restart") as mock_restart:
+            mock_restart.side_effect = ChangeError("restart failed", change=MagicMock())
+            with self.assertRaises(ChangeError):
+                self.harness.update_config(key_values={"mcc": "001"})
+        self.harness.charm._reconciled_fingerprint = None  # the next event runs in a new hook
+
+        with patch("ops.model.Container.restart") as mock_restart:
+            self.harness.charm.on.config_changed.emit()
+
+        mock_restart.assert_called_once_with("cu")
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_unit_is_leader_when_config_changed_then_load_balancer_service_is_fetched_once(
+        self, _, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        patch_k8s_get.assert_called_once()
+
+    @patch("lightkube.Client.watch")
+    @patch("lightkube.Client.get")
+    def test_given_load_balancer_has_no_ip_address_when_config_changed_then_status_is_waiting(
+        self, patch_k8s_get, patch_k8s_watch
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(loadBalancer=LoadBalancerStatus(ingress=[])),
+        )
+        patch_k8s_watch.return_value = iter([])
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            WaitingStatus("Waiting for LoadBalancer IP address to be assigned"),
+        )
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.watch")
+    @patch("lightkube.Client.get")
+    def test_given_load_balancer_ip_address_assigned_while_watching_when_config_changed_then_status_is_active(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_watch, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(loadBalancer=LoadBalancerStatus(ingress=[])),
+        )
+        patch_k8s_watch.return_value = iter(
+            [
+                (
+                    "MODIFIED",
+                    Service(
+                        spec=ServiceSpec(type="LoadBalancer"),
+                        status=K8sServiceStatus(
+                            loadBalancer=LoadBalancerStatus(
+                                ingress=[LoadBalancerIngress(ip="1.2.3.4")]
+                            )
+                        ),
+                    ),
+                )
+            ]
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @staticmethod
+    def _exported_spans(patch_export: MagicMock) -> List[Span]:
+        return [span for call in patch_export.call_args_list for span in call.args[0]]
+
+    @staticmethod
+    def _statefulset(privileged: bool, resources: Optional[dict] = None) -> StatefulSet:
+        sidecar_resources = (
+            ResourceRequirements(
+                requests={"cpu": "250m", "memory": "512Mi"},
+                limits={"cpu": "250m", "memory": "512Mi"},
+            )
+            if resources
+            else None
+        )
+        return StatefulSet(
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="oai-5g-cu",
+                template=PodTemplateSpec(
+                    spec=PodSpec(
+                        containers=[
+                            Container(name="charm", resources=sidecar_resources),
+                            Container(
+                                name="cu",
+                                securityContext=SecurityContext(privileged=privileged),
+                                resources=(
+                                    ResourceRequirements(requests=resources, limits=resources)
+                                    if resources
+                                    else None
+                                ),
+                            ),
+                        ],
+                        initContainers=[Container(name="charm-init", resources=sidecar_resources)],
+                        securityContext=PodSecurityContext(
+                            runAsUser=0 if privileged else None,
+                            runAsGroup=0 if privileged else None,
+                        ),
+                    )
+                ),
+            )
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_statefulset_not_patched_when_install_then_statefulset_is_read_once_and_patched_with_server_side_apply(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=False)
+
+        self.harness.charm.on.install.emit()
+
+        patch_k8s_get.assert_called_once()
+        patch_k8s_patch.assert_called_once_with(
+            res=StatefulSet,
+            name="oai-5g-cu",
+            obj={
+                "apiVersion": "apps/v1",
+                "kind": "StatefulSet",
+                "metadata": {"name": "oai-5g-cu"},
+                "spec": {
+                    "template": {
+                        "spec": {
+                            "securityContext": {"runAsUser": 0, "runAsGroup": 0},
+                            "containers": [
+                                {"name": "cu", "securityContext": {"privileged": True}}
+                            ],
+                        }
+                    }
+                },
+            },
+            patch_type=PatchType.APPLY,
+            namespace=self.model_name,
+            field_manager="oai-5g-cu-operator",
+            force=True,
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_statefulset_already_patched_when_install_then_statefulset_is_not_patched(
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+
+        self.harness.charm.on.install.emit()
+
+        patch_k8s_get.assert_called_once()
+        patch_k8s_patch.assert_not_called()
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_invalid_config_when_install_then_nothing_is_patched_until_config_is_valid(
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=False)
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.update_config(
+            {
+                "cpu": "1.5",
+                "memory": "4Gi",
+                "hugepages-size": "3Mi",
+                "hugepages-memory": "x",
+                "f1u-ip-address": "garbage",
+            }
+        )
+
+        self.harness.charm.on.install.emit()
+
+        self.assertIsInstance(self.harness.model.unit.status, BlockedStatus)
+        self.patch_service.assert_not_called()
+        patch_k8s_patch.assert_not_called()
+
+        self.harness.update_config(
+            {"cpu": "2", "hugepages-size": "", "hugepages-memory": "", "f1u-ip-address": ""}
+        )
+
+        statefulset_patch = patch_k8s_patch.call_args.kwargs["obj"]
+        self.assertEqual(
+            statefulset_patch["spec"]["template"]["spec"]["containers"][0]["resources"]["limits"],
+            {"cpu": "2", "memory": "4Gi"},
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_when_install_then_kubernetes_service_is_patched(self, patch_k8s_get, _):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+
+        self.harness.charm.on.install.emit()
+
+        self.patch_service.assert_called_once_with(
+            name="oai-5g-cu",
+            ports=[
+                {"name": "s1c", "port": 36412, "protocol": "SCTP", "targetPort": 36412},
+                {"name": "s1u", "port": 2152, "protocol": "UDP", "targetPort": 2152},
+                {"name": "x2c", "port": 36422, "protocol": "UDP", "targetPort": 36422},
+                {"name": "f1", "port": 2153, "protocol": "UDP", "targetPort": 2153},
+            ],
+            service_type="LoadBalancer",
+        )
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_du_address_changes_when_f1_relation_changed_then_cu_listens_on_wildcard_address(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        relation = self.harness.model.get_relation("fiveg-f1")
+        assert relation is not None
+        relation_id = relation.id
+
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="du", key_values={"du_address": "9.9.9.9"}
+        )
+
+        config = mock_push.call_args.kwargs["source"]
+        self.assertIn('remote_s_address = "0.0.0.0";', config)
+        self.assertIn("remote_s_portd  = 5678;", config)
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_amf_units_publish_their_own_addresses_when_config_changed_then_all_amf_endpoints_are_rendered(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_du_relation_with_valid_data()
+        relation_id = self.harness.add_relation("fiveg-n2", "amf")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="amf/0")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="amf/1")
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="amf/1", key_values={"amf_address": "5.6.7.9"}
+        )
+
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="amf", key_values={"amf_address": "5.6.7.8"}
+        )
+
+        self.assertEqual(self.harness.charm.amf_n2_requires.amf_addresses, ("5.6.7.8", "5.6.7.9"))
+        self.assertIn(
+            '        amf_ip_address      = ( { ipv4       = "5.6.7.8";\n'
+            '                              ipv6       = "192:168:30::17";\n'
+            '                              active     = "yes";\n'
+            '                              preference = "ipv4";\n'
+            "                            },\n"
+            '                                { ipv4       = "5.6.7.9";\n',
+            mock_push.call_args.kwargs["source"],
+        )
+
+    def test_given_amf_address_changes_when_n2_view_read_then_generation_is_incremented(self):
+        relation_id = self.harness.add_relation("fiveg-n2", "amf")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="amf/0")
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="amf", key_values={"amf_address": "5.6.7.8"}
+        )
+        first_generation = self.harness.charm.amf_n2_requires.n2_view.generation
+
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="amf", key_values={"amf_address": "5.6.7.9"}
+        )
+
+        self.assertEqual(
+            self.harness.charm.amf_n2_requires.n2_view.generation, first_generation + 1
+        )
+
+    def test_given_n2_relation_data_read_again_when_n2_view_read_then_generation_is_unchanged(
+        self,
+    ):
+        relation_id = self.harness.add_relation("fiveg-n2", "amf")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="amf/0")
+        self.harness.update_relation_data(
+            relation_id=relation_id, app_or_unit="amf", key_values={"amf_address": "5.6.7.8"}
+        )
+        generation = self.harness.charm.amf_n2_requires.generation
+
+        self.harness.charm.amf_n2_requires._n2_view = None
+        n2_view = self.harness.charm.amf_n2_requires.n2_view
+
+        self.assertEqual(n2_view.amf_addresses, ("5.6.7.8",))
+        self.assertEqual(n2_view.generation, generation)
+        self.assertEqual(self.harness.charm.amf_n2_requires.generation, generation)
+
+    def test_given_some_f1_relations_already_contain_cu_information_when_publish_cu_information_then_only_outdated_relations_are_written(  # noqa: E501
+        self,
+    ):
+        self.harness.set_leader(True)
+        relation_ids = [
+            self.harness.add_relation(relation_name="fiveg-f1", remote_app=f"du{index}")
+            for index in range(3)
+        ]
+        self.harness.update_relation_data(
+            relation_id=relation_ids[0],
+            app_or_unit=self.harness.model.app.name,
+            key_values={"cu_address": "1.2.3.4", "cu_port": "2153"},
+        )
+
+        written_relations = self.harness.charm.f1_provides.publish_cu_information(
+            cu_address="1.2.3.4", cu_port="2153"
+        )
+
+        self.assertEqual(written_relations, 2)
+        for relation_id in relation_ids:
+            relation_data = self.harness.get_relation_data(
+                relation_id=relation_id, app_or_unit=self.harness.model.app.name
+            )
+            self.assertEqual(relation_data, {"cu_address": "1.2.3.4", "cu_port": "2153"})
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_two_dus_with_same_port_when_f1_relations_changed_then_wildcard_du_address_is_rendered_and_status_is_active(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        relation_id = self.harness.add_relation("fiveg-f1", "du2")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="du2/0")
+
+        self.harness.update_relation_data(
+            relation_id=relation_id,
+            app_or_unit="du2",
+            key_values={"du_address": "5.6.7.9", "du_port": "5678"},
+        )
+
+        self.assertEqual(
+            [
+                du_endpoint.du_address
+                for du_endpoint in self.harness.charm.f1_provides.du_endpoints
+            ],
+            ["5.6.7.8", "5.6.7.9"],
+        )
+        self.assertIn('remote_s_address = "0.0.0.0";', mock_push.call_args.kwargs["source"])
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_two_dus_with_different_ports_when_f1_relations_changed_then_status_is_blocked(  # noqa: E501
+        self, _, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        relation_id = self.harness.add_relation("fiveg-f1", "du2")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="du2/0")
+
+        self.harness.update_relation_data(
+            relation_id=relation_id,
+            app_or_unit="du2",
+            key_values={"du_address": "5.6.7.9", "du_port": "9999"},
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status, BlockedStatus("DUs advertise different F1-U ports")
+        )
+
+    @patch("lightkube.Client.get")
+    def test_given_one_du_when_second_du_joins_and_leaves_then_cu_is_not_restarted(
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch("ops.model.Container.restart") as mock_restart, patch(
+            "ops.model.Container.replan"
+        ) as mock_replan:
+            relation_id = self.harness.add_relation("fiveg-f1", "du2")
+            self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="du2/0")
+            self.harness.update_relation_data(
+                relation_id=relation_id,
+                app_or_unit="du2",
+                key_values={"du_address": "5.6.7.9", "du_port": "5678"},
+            )
+            self.harness.remove_relation(relation_id)
+
+        mock_restart.assert_not_called()
+        mock_replan.assert_not_called()
+        config = (
+            self.harness.model.unit.get_container("cu").pull("/opt/oai-gnb/etc/gnb.conf").read()
+        )
+        self.assertIn('remote_s_address = "0.0.0.0";', config)
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_cgroup_cpu_quota_when_config_changed_then_thread_pools_are_sized_after_allocated_cpus(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        cgroup_directory = self.harness.get_filesystem_root("cu") / "sys" / "fs" / "cgroup"
+        cgroup_directory.mkdir(parents=True)
+        (cgroup_directory / "cpu.max").write_text("400000 100000\n")
+        (cgroup_directory / "cpuset.cpus.effective").write_text("0-7\n")
+        self._create_amf_relation_with_valid_data()
+
+        self._create_du_relation_with_valid_data()
+
+        self.assertIn("Num_Threads_PUSCH = 4;", mock_push.call_args.kwargs["source"])
+        self.assertIn(
+            "--thread-pool -1,-1,-1,-1",
+            self.harness.get_container_pebble_plan("cu").services["cu"].command,
+        )
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_thread_counts_configured_when_config_changed_then_configured_thread_counts_are_used(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        self.harness.update_config({"pusch-threads": "2", "thread-pool-size": "3"})
+
+        self.assertIn("Num_Threads_PUSCH = 2;", mock_push.call_args.kwargs["source"])
+        self.assertTrue(
+            self.harness.get_container_pebble_plan("cu")
+            .services["cu"]
+            .command.endswith("--thread-pool -1,-1,-1")
+        )
+
+    def test_given_invalid_thread_count_when_config_changed_then_status_is_blocked(self):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"pusch-threads": "0", "thread-pool-size": "many"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['pusch-threads', 'thread-pool-size']"
+            ),
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_cpu_and_memory_configured_when_config_changed_then_every_container_is_patched_with_guaranteed_resources(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"cpu": "2", "memory": "4Gi"})
+
+        patch_k8s_patch.assert_called_once()
+        pod_spec = patch_k8s_patch.call_args.kwargs["obj"]["spec"]["template"]["spec"]
+        sidecar_resources = {
+            "requests": {"cpu": "250m", "memory": "512Mi"},
+            "limits": {"cpu": "250m", "memory": "512Mi"},
+        }
+        self.assertEqual(
+            pod_spec["containers"],
+            [
+                {
+                    "name": "cu",
+                    "securityContext": {"privileged": True},
+                    "resources": {
+                        "requests": {"cpu": "2", "memory": "4Gi"},
+                        "limits": {"cpu": "2", "memory": "4Gi"},
+                    },
+                },
+                {"name": "charm", "resources": sidecar_resources},
+            ],
+        )
+        self.assertEqual(
+            pod_spec["initContainers"], [{"name": "charm-init", "resources": sidecar_resources}]
+        )
+        for container in [*pod_spec["containers"], *pod_spec["initContainers"]]:
+            self.assertEqual(container["resources"]["requests"], container["resources"]["limits"])
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_statefulset_has_canonically_equal_resources_when_config_changed_then_statefulset_is_not_patched(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(
+            privileged=True, resources={"cpu": "2000m", "memory": "4096Mi"}
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"cpu": "2", "memory": "4Gi"})
+
+        patch_k8s_get.assert_called_once()
+        patch_k8s_patch.assert_not_called()
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_resources_already_applied_when_config_changed_again_then_statefulset_is_not_read(  # noqa: E501
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.update_config({"cpu": "2", "memory": "4Gi"})
+        patch_k8s_get.reset_mock()
+
+        self.harness.update_config({"mcc": "001"})
+
+        patch_k8s_get.assert_not_called()
+
+    def test_given_cpu_configured_without_memory_when_config_changed_then_status_is_blocked(self):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"cpu": "1.5"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['cpu', 'memory']"),
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_hugepages_configured_when_config_changed_then_statefulset_is_patched_with_hugepages_volume(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config(
+            {"cpu": "2", "memory": "4Gi", "hugepages-size": "2Mi", "hugepages-memory": "1Gi"}
+        )
+
+        pod_spec = patch_k8s_patch.call_args.kwargs["obj"]["spec"]["template"]["spec"]
+        self.assertEqual(
+            pod_spec["volumes"], [{"name": "hugepages", "emptyDir": {"medium": "HugePages-2Mi"}}]
+        )
+        self.assertEqual(
+            pod_spec["containers"][0]["volumeMounts"],
+            [{"name": "hugepages", "mountPath": "/dev/hugepages"}],
+        )
+        self.assertEqual(
+            pod_spec["containers"][0]["resources"]["limits"],
+            {"cpu": "2", "memory": "4Gi", "hugepages-2Mi": "1Gi"},
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_hugepages_configured_when_pebble_layer_updated_then_malloc_uses_hugepages(
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = self._statefulset(privileged=True)
+        self.harness.update_config(
+            {"cpu": "2", "memory": "4Gi", "hugepages-size": "1Gi", "hugepages-memory": "2Gi"}
+        )
+
+        service = self.harness.charm._pebble_layer["services"]["cu"]
+
+        self.assertEqual(
+            service["environment"], {"GLIBC_TUNABLES": "glibc.malloc.hugetlb=1073741824"}
+        )
+
+    def test_given_hugepages_configured_without_cpu_when_config_changed_then_status_is_blocked(
+        self,
+    ):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"hugepages-size": "2Mi", "hugepages-memory": "1Gi"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['hugepages-size']"),
+        )
+
+    @patch("lightkube.Client.get")
+    def test_given_config_file_pushed_when_log_profile_changed_to_debug_then_service_is_restarted_once_with_debug_log_config(  # noqa: E501
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch("ops.model.Container.restart") as mock_restart:
+            self.harness.update_config({"log-profile": "debug"})
+
+        config = (
+            self.harness.model.unit.get_container("cu").pull("/opt/oai-gnb/etc/gnb.conf").read()
+        )
+        self.assertIn('       rlc_log_level                         ="debug";\n', config)
+        self.assertIn(
+            '       global_log_options                    =("level", "nocolor", "time");', config
+        )
+        mock_restart.assert_called_once_with("cu")
+
+    def test_given_unknown_log_layer_when_config_changed_then_status_is_blocked(self):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"log-profile": "custom", "log-levels": "sdap=debug"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['log-levels']"),
+        )
+
+    @patch("lightkube.Client.get")
+    @patch("ops.model.Container.push")
+    def test_given_amf_publishes_fewer_inbound_streams_when_n2_relation_changed_then_outbound_streams_are_capped_and_gnb_streams_are_published(  # noqa: E501
+        self, mock_push, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.update_config({"sctp-instreams": "32", "sctp-outstreams": "32"})
+        self._create_du_relation_with_valid_data()
+        relation_id = self.harness.add_relation("fiveg-n2", "amf")
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="amf/0")
+
+        self.harness.update_relation_data(
+            relation_id=relation_id,
+            app_or_unit="amf",
+            key_values={
+                "amf_address": "5.6.7.8",
+                "amf_sctp_instreams": "8",
+                "amf_sctp_outstreams": "8",
+            },
+        )
+
+        config = mock_push.call_args.kwargs["source"]
+        self.assertIn("        SCTP_INSTREAMS  = 32;\n", config)
+        self.assertIn("        SCTP_OUTSTREAMS = 8;\n", config)
+        self.assertEqual(
+            self.harness.get_relation_data(relation_id, self.harness.model.app.name),
+            {"gnb_sctp_instreams": "32", "gnb_sctp_outstreams": "32"},
+        )
+
+    def test_given_sctp_stream_count_out_of_range_when_config_changed_then_status_is_blocked(self):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"sctp-instreams": "0", "sctp-outstreams": "65536"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus(
+                "The following configurations are not valid: ['sctp-instreams', 'sctp-outstreams']"
+            ),
+        )
+
+    def test_given_unit_is_leader_when_metrics_endpoint_relation_joined_then_scrape_job_and_unit_address_are_published(  # noqa: E501
+        self,
+    ):
+        self.harness.set_leader(True)
+        relation_id = self.harness.add_relation("metrics-endpoint", "prometheus")
+
+        self.harness.add_relation_unit(relation_id=relation_id, remote_unit_name="prometheus/0")
+
+        app_data = self.harness.get_relation_data(relation_id, self.harness.model.app.name)
+        self.assertEqual(
+            json.loads(app_data["scrape_jobs"]),
+            [{"metrics_path": "/metrics", "static_configs": [{"targets": ["*:9102"]}]}],
+        )
+        self.assertEqual(json.loads(app_data["scrape_metadata"])["application"], "oai-5g-cu")
+        unit_data = self.harness.get_relation_data(relation_id, self.harness.model.unit.name)
+        self.assertEqual(unit_data["prometheus_scrape_unit_name"], "oai-5g-cu/0")
+        self.assertIn("prometheus_scrape_unit_address", unit_data)
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_relations_ready_when_config_changed_then_hook_phases_are_timed_and_exported(
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch.object(self.harness.charm.tracer.exporter, "export") as patch_export:
+            self.harness.update_config({"mcc": "001"})
+
+        exported_spans = self._exported_spans(patch_export)
+        self.assertEqual(
+            [span.name for span in exported_spans],
+            [
+                "config_validation",
+                "pebble_connectivity",
+                "scale_out",
+                "relation_validation",
+                "load_balancer_lookup",
+                "n2_publish",
+                "exporter_push",
+                "config_render",
+                "config_push",
+                "pebble_layer_update",
+                "f1_publish",
+                "reconcile",
+            ],
+        )
+        self.assertEqual(exported_spans[-1].outcome, "active")
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_unit_is_active_when_pebble_check_failed_then_status_is_waiting(
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        container = self.harness.model.unit.get_container("cu")
+
+        self.harness.charm.on.cu_pebble_check_failed.emit(container, "ngap-association")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            WaitingStatus("Waiting for CU checks to pass: ngap-association"),
+        )
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_pebble_check_failed_when_pebble_check_recovered_then_status_is_active(
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        container = self.harness.model.unit.get_container("cu")
+        self.harness.charm.on.cu_pebble_check_failed.emit(container, "f1u-listener")
+        self.harness.charm.on.cu_pebble_check_failed.emit(container, "ngu-listener")
+
+        self.harness.charm.on.cu_pebble_check_recovered.emit(container, "f1u-listener")
+        self.assertEqual(
+            self.harness.model.unit.status,
+            WaitingStatus("Waiting for CU checks to pass: ngu-listener"),
+        )
+        self.harness.charm.on.cu_pebble_check_recovered.emit(container, "ngu-listener")
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    def test_given_unit_is_blocked_when_pebble_check_failed_then_status_is_unchanged(self):
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.charm.on.config_changed.emit()
+        container = self.harness.model.unit.get_container("cu")
+
+        self.harness.charm.on.cu_pebble_check_failed.emit(container, "f1c-listener")
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("Waiting for relation to AMF to be created"),
+        )
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_pebble_not_reachable_when_relations_created_then_nothing_is_deferred_and_pebble_ready_configures_workload(  # noqa: E501
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        self.assertEqual(
+            self.harness.model.unit.status,
+            WaitingStatus("Waiting for Pebble in workload container"),
+        )
+        self.assertEqual(list(self.harness.framework._storage.notices()), [])
+
+        self.harness.container_pebble_ready("cu")
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_desired_state_already_applied_when_update_status_then_workload_is_not_reconciled(  # noqa: E501
+        self, patch_k8s_get, patch_push
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        patch_k8s_get.reset_mock()
+        self.harness.charm._reconciled_fingerprint = None  # update-status runs in a new hook
+
+        with patch("ops.model.Container.can_connect") as patch_can_connect, patch.object(
+            self.harness.charm.tracer.exporter, "export"
+        ) as patch_export:
+            self.harness.charm.on.update_status.emit()
+
+        exported_spans = self._exported_spans(patch_export)
+        patch_can_connect.assert_not_called()
+        patch_k8s_get.assert_not_called()
+        self.assertEqual([span.outcome for span in exported_spans], ["unchanged"])
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_workload_reconciled_when_unconsumed_relation_field_changed_then_reconciliation_is_coalesced(  # noqa: E501
+        self, patch_k8s_get, patch_push
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        relation = self.harness.model.get_relation("fiveg-f1")
+        assert relation is not None
+
+        with patch.object(self.harness.charm.tracer.exporter, "export") as patch_export:
+            self.harness.update_relation_data(
+                relation_id=relation.id,
+                app_or_unit="du/0",
+                key_values={"egress-subnets": "10.0.0.1/32"},
+            )
+
+        exported_spans = self._exported_spans(patch_export)
+        self.assertEqual([span.outcome for span in exported_spans], ["coalesced"])
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_desired_state_changed_when_update_status_then_workload_is_reconciled(
+        self, patch_k8s_get, patch_push
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        self.harness.charm._stored.applied_fingerprint = ""
+        self.harness.charm._reconciled_fingerprint = None
+
+        with patch.object(self.harness.charm.tracer.exporter, "export") as patch_export:
+            self.harness.charm.on.update_status.emit()
+
+        exported_spans = self._exported_spans(patch_export)
+        self.assertEqual(exported_spans[-1].outcome, "active")
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.get")
+    def test_given_workload_reconciled_when_same_desired_state_triggered_again_in_hook_then_reconciliation_is_coalesced(  # noqa: E501
+        self, patch_k8s_get, patch_push
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+
+        with patch.object(self.harness.charm.tracer.exporter, "export") as patch_export:
+            self.harness.charm.on.config_changed.emit()
+            self.harness.charm.on.fiveg_f1_relation_changed.emit(
+                self.harness.model.get_relation("fiveg-f1"), app=self.harness.model.get_app("du")
+            )
+
+        exported_spans = self._exported_spans(patch_export)
+        self.assertEqual([span.outcome for span in exported_spans], ["coalesced", "coalesced"])
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_unit_installed_when_pebble_ready_then_workload_is_configured_and_time_to_active_is_recorded(  # noqa: E501
+        self, patch_k8s_get, _, __
+    ):
+        service = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        statefulset = self._statefulset(privileged=True)
+        patch_k8s_get.side_effect = lambda *args, **kwargs: (
+            statefulset if StatefulSet in (*args, kwargs.get("res")) else service
+        )
+        clock = [1000.0]
+        with patch("time.time", lambda: clock[0]):
+            self.harness.charm.on.install.emit()
+            self._create_amf_relation_with_valid_data()
+            self._create_du_relation_with_valid_data()
+            self.assertEqual(
+                self.harness.model.unit.status,
+                WaitingStatus("Waiting for Pebble in workload container"),
+            )
+            clock[0] = 1042.5
+
+            self.harness.container_pebble_ready("cu")
+
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+        self.assertTrue(self.harness.model.unit.get_container("cu").get_service("cu").is_running())
+        self.assertEqual(self.harness.charm._stored.time_to_active_seconds, 42.5)
+        self.assertIsNone(self.harness.charm._stored.installed_at)
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_scale_out_when_dus_related_then_dus_are_assigned_to_units_and_assigned_unit_addresses_are_published(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        peer_relation_id = self.harness.add_relation("cu-peers", "oai-5g-cu")
+        self.harness.add_relation_unit(peer_relation_id, "oai-5g-cu/1")
+        self.harness.update_relation_data(
+            peer_relation_id, "oai-5g-cu/1", {"f1_address": "10.0.0.2"}
+        )
+        self._create_amf_relation_with_valid_data()
+        du_relation_ids = []
+        for du_name in ["du-a", "du-b", "du-c", "du-d"]:
+            relation_id = self.harness.add_relation("fiveg-f1", du_name)
+            self.harness.add_relation_unit(relation_id, f"{du_name}/0")
+            self.harness.update_relation_data(
+                relation_id, du_name, {"du_address": "5.6.7.8", "du_port": "2152"}
+            )
+            du_relation_ids.append(relation_id)
+
+        self.harness.update_config({"scale-out": True})
+
+        self.assertEqual(patch_k8s_patch.call_args.kwargs["name"], "oai-5g-cu-0")
+        self.assertEqual(
+            patch_k8s_patch.call_args.kwargs["obj"]["spec"]["selector"],
+            {"statefulset.kubernetes.io/pod-name": "oai-5g-cu-0"},
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(peer_relation_id, "oai-5g-cu/0")["f1_address"],
+            "1.2.3.4",
+        )
+        du_assignments = json.loads(
+            self.harness.get_relation_data(peer_relation_id, "oai-5g-cu")["du_assignments"]
+        )
+        self.assertEqual(
+            set(du_assignments), {str(relation_id) for relation_id in du_relation_ids}
+        )
+        self.assertEqual(
+            sorted(du_assignments.values()), ["oai-5g-cu/0"] * 2 + ["oai-5g-cu/1"] * 2
+        )
+        unit_addresses = {"oai-5g-cu/0": "1.2.3.4", "oai-5g-cu/1": "10.0.0.2"}
+        for relation_id in du_relation_ids:
+            self.assertEqual(
+                self.harness.get_relation_data(relation_id, "oai-5g-cu")["cu_address"],
+                unit_addresses[du_assignments[str(relation_id)]],
+            )
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("ops.model.Container.push")
+    @patch("kubernetes_client.KubernetesClient.wait_for_service_load_balancer_address")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_scale_out_when_reconciled_then_load_balancer_address_is_waited_for_once(
+        self, patch_k8s_get, _, patch_wait_for_address, __
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        patch_wait_for_address.return_value = (None, "1.2.3.4")
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.add_relation("cu-peers", "oai-5g-cu")
+        self._create_amf_relation_with_valid_data()
+        du_relation_id = self.harness.add_relation("fiveg-f1", "du")
+        self.harness.update_relation_data(
+            du_relation_id, "du", {"du_address": "5.6.7.8", "du_port": "2152"}
+        )
+        patch_wait_for_address.reset_mock()
+
+        self.harness.update_config({"scale-out": True})
+
+        patch_wait_for_address.assert_called_once()
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_scale_out_and_no_du_assigned_to_unit_when_du_related_then_status_is_waiting_without_workload(  # noqa: E501
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.update_config({"scale-out": True})
+        peer_relation_id = self.harness.add_relation("cu-peers", "oai-5g-cu")
+        self._create_amf_relation_with_valid_data()
+        du_relation_id = self.harness.add_relation("fiveg-f1", "du")
+        self.harness.update_relation_data(
+            peer_relation_id,
+            "oai-5g-cu",
+            {"du_assignments": json.dumps({str(du_relation_id): "oai-5g-cu/1"})},
+        )
+        self.harness.charm._stored.installed_at = time.time()
+
+        self.harness.update_relation_data(
+            du_relation_id, "du", {"du_address": "5.6.7.8", "du_port": "2152"}
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status, WaitingStatus("No DU assigned to this unit")
+        )
+        self.assertEqual(self.harness.get_container_pebble_plan("cu").services, {})
+        self.assertNotEqual(self.harness.charm._stored.applied_fingerprint, "")
+        self.assertIsNone(self.harness.charm._stored.time_to_active_seconds)
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_scale_out_and_du_reassigned_to_other_unit_when_peer_relation_changed_then_service_is_stopped(  # noqa: E501
+        self, patch_k8s_get, _, __
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.update_config({"scale-out": True})
+        peer_relation_id = self.harness.add_relation("cu-peers", "oai-5g-cu")
+        self._create_amf_relation_with_valid_data()
+        du_relation_id = self.harness.add_relation("fiveg-f1", "du")
+        self.harness.update_relation_data(
+            du_relation_id, "du", {"du_address": "5.6.7.8", "du_port": "2152"}
+        )
+        self.harness.update_relation_data(
+            peer_relation_id,
+            "oai-5g-cu",
+            {"du_assignments": json.dumps({str(du_relation_id): "oai-5g-cu/0"})},
+        )
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+        with patch("ops.model.Container.stop") as patch_stop:
+            self.harness.update_relation_data(
+                peer_relation_id,
+                "oai-5g-cu",
+                {"du_assignments": json.dumps({str(du_relation_id): "oai-5g-cu/1"})},
+            )
+
+        patch_stop.assert_called_once_with("cu")
+        self.assertEqual(
+            self.harness.model.unit.status, WaitingStatus("No DU assigned to this unit")
+        )
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_scale_out_and_du_reassigned_back_to_unit_when_peer_relation_changed_then_service_is_started(  # noqa: E501
+        self, patch_k8s_get, _
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.model.unit.get_container("cu").make_dir("/opt/oai-gnb/etc", make_parents=True)
+        self.harness.update_config({"scale-out": True})
+        peer_relation_id = self.harness.add_relation("cu-peers", "oai-5g-cu")
+        self._create_amf_relation_with_valid_data()
+        du_relation_id = self.harness.add_relation("fiveg-f1", "du")
+        self.harness.update_relation_data(
+            du_relation_id, "du", {"du_address": "5.6.7.8", "du_port": "2152"}
+        )
+        for unit_name in ["oai-5g-cu/0", "oai-5g-cu/1", "oai-5g-cu/0"]:
+            self.harness.update_relation_data(
+                peer_relation_id,
+                "oai-5g-cu",
+                {"du_assignments": json.dumps({str(du_relation_id): unit_name})},
+            )
+
+        self.assertTrue(self.harness.model.unit.get_container("cu").get_service("cu").is_running())
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+        self.harness.charm._reconciled_fingerprint = None  # update-status runs in a new hook
+        self.harness.charm.on.update_status.emit()
+        self.assertTrue(self.harness.model.unit.get_container("cu").get_service("cu").is_running())
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_cu_up_role_when_e1_relation_changed_then_nr_cuup_is_configured_with_unit_address_and_address_is_published(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_can_connect(container="cu", val=True)
+        container = self.harness.model.unit.get_container("cu")
+        container.make_dir("/opt/oai-gnb/etc", make_parents=True)
+        self.harness.update_config({"role": "cu-up"})
+        e1_relation_id = self.harness.add_relation("fiveg-e1-cu-cp", "cu-cp")
+        self.harness.add_relation_unit(e1_relation_id, "cu-cp/0")
+
+        self.harness.update_relation_data(
+            e1_relation_id, "cu-cp", {"cucp_address": "5.6.7.8", "cucp_port": "38462"}
+        )
+
+        self.assertEqual(patch_k8s_patch.call_args.kwargs["name"], "oai-5g-cu-0")
+        self.assertEqual(
+            [port["name"] for port in patch_k8s_patch.call_args.kwargs["obj"]["spec"]["ports"]],
+            ["s1u", "f1"],
+        )
+        self.assertEqual(
+            self.harness.get_relation_data(e1_relation_id, "oai-5g-cu/0"),
+            {"cuup_address": "1.2.3.4"},
+        )
+        config = container.pull("/opt/oai-gnb/etc/gnb.conf").read()
+        self.assertIn('type = "up";', config)
+        self.assertIn('ipv4_cucp = "5.6.7.8";', config)
+        self.assertIn('ipv4_cuup = "1.2.3.4";', config)
+        plan = self.harness.get_container_pebble_plan("cu")
+        self.assertEqual(
+            plan.services["cu"].command,
+            "/opt/oai-gnb/bin/nr-cuup -O /opt/oai-gnb/etc/gnb.conf --sa",
+        )
+        self.assertTrue(plan.services["cu-exporter"].command.endswith("--role cu-up"))
+        self.assertEqual(set(plan.checks), {"f1u-listener", "ngu-listener", "e1-association"})
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("lightkube.Client.get")
+    def test_given_cu_cp_role_when_cu_up_publishes_its_address_then_e1_interface_is_rendered_and_cu_cp_address_is_published(  # noqa: E501
+        self, patch_k8s_get
+    ):
+        patch_k8s_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        container = self.harness.model.unit.get_container("cu")
+        container.make_dir("/opt/oai-gnb/etc", make_parents=True)
+        self.harness.update_config({"role": "cu-cp"})
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("Waiting for relation to CU-UP to be created"),
+        )
+        e1_relation_id = self.harness.add_relation("fiveg-e1", "cu-up")
+        self.harness.add_relation_unit(e1_relation_id, "cu-up/0")
+
+        self.harness.update_relation_data(e1_relation_id, "cu-up/0", {"cuup_address": "9.9.9.9"})
+
+        self.assertEqual(
+            self.harness.get_relation_data(e1_relation_id, "oai-5g-cu"),
+            {"cucp_address": "1.2.3.4", "cucp_port": "38462"},
+        )
+        config = container.pull("/opt/oai-gnb/etc/gnb.conf").read()
+        self.assertIn('type = "cp";', config)
+        self.assertIn('ipv4_cuup = "9.9.9.9";', config)
+        plan = self.harness.get_container_pebble_plan("cu")
+        self.assertIn("nr-softmodem", plan.services["cu"].command)
+        self.assertEqual(set(plan.checks), {"f1c-listener", "ngap-association", "e1-listener"})
+        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+
+    @patch("ops.model.Container.push")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_secondary_interfaces_configured_when_config_changed_then_networks_are_attached_and_rendered(  # noqa: E501
+        self, patch_k8s_get, patch_k8s_patch, mock_push
+    ):
+        service = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+            ),
+        )
+        statefulset = self._statefulset(privileged=True)
+        patch_k8s_get.side_effect = lambda *args, **kwargs: (
+            statefulset if StatefulSet in (*args, kwargs.get("res")) else service
+        )
+        self.harness.set_leader(True)
+        self.harness.set_can_connect(container="cu", val=True)
+        self._create_amf_relation_with_valid_data()
+        self._create_du_relation_with_valid_data()
+        relation = self.harness.model.get_relation("fiveg-f1")
+        assert relation is not None
+        du_relation_id = relation.id
+
+        self.harness.update_config(
+            {
+                "f1u-ip-address": "192.168.251.5/24",
+                "f1u-host-interface": "ens5",
+                "ngu-ip-address": "192.168.252.5/24",
+                "ngu-host-interface": "ens6",
+            }
+        )
+
+        applied_objects = [call.kwargs["obj"] for call in patch_k8s_patch.call_args_list]
+        network_attachment_definitions = {
+            obj["metadata"]["name"]: json.loads(obj["spec"]["config"])
+            for obj in applied_objects
+            if obj["kind"] == "NetworkAttachmentDefinition"
+        }
+        self.assertEqual(
+            network_attachment_definitions["oai-5g-cu-f1u"],
+            {
+                "cniVersion": "0.3.1",
+                "type": "macvlan",
+                "master": "ens5",
+                "mode": "bridge",
+                "capabilities": {"ips": True},
+                "ipam": {"type": "static"},
+            },
+        )
+        self.assertEqual(network_attachment_definitions["oai-5g-cu-ngu"]["master"], "ens6")
+        statefulset_patch = applied_objects[-1]
+        self.assertEqual(statefulset_patch["kind"], "StatefulSet")
+        self.assertEqual(
+            json.loads(
+                statefulset_patch["spec"]["template"]["metadata"]["annotations"][
+                    "k8s.v1.cni.cncf.io/networks"
+                ]
+            ),
+            [
+                {"name": "oai-5g-cu-f1u", "interface": "f1u", "ips": ["192.168.251.5/24"]},
+                {"name": "oai-5g-cu-ngu", "interface": "ngu", "ips": ["192.168.252.5/24"]},
+            ],
+        )
+        config = mock_push.call_args.kwargs["source"]
+        self.assertIn('local_s_if_name = "f1u";', config)
+        self.assertIn('local_s_address = "192.168.251.5";', config)
+        self.assertIn('GNB_INTERFACE_NAME_FOR_NGU               = "ngu";', config)
+        self.assertIn('GNB_IPV4_ADDRESS_FOR_NGU                 = "192.168.252.5";', config)
+        self.assertIn('GNB_IPV4_ADDRESS_FOR_NG_AMF              = "1.2.3.4";', config)
+        self.assertEqual(
+            self.harness.get_relation_data(du_relation_id, "oai-5g-cu")["cu_address"],
+            "192.168.251.5",
+        )
+
+    @patch("lightkube.Client.patch")
+    def test_given_macvlan_interface_without_host_interface_when_config_changed_then_status_is_blocked_and_no_network_is_applied(  # noqa: E501
+        self, patch_k8s_patch
+    ):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config({"ngu-ip-address": "192.168.252.5/24"})
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['ngu-host-interface']"),
+        )
+        patch_k8s_patch.assert_not_called()
+
+    def test_given_secondary_address_and_several_units_when_config_changed_then_status_is_blocked(
+        self,
+    ):
+        self.harness.set_can_connect(container="cu", val=True)
+        self.harness.set_planned_units(3)
+
+        self.harness.update_config(
+            {"f1u-ip-address": "192.168.251.5/24", "f1u-host-interface": "ens5"}
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['f1u-ip-address']"),
+        )
+
+    def test_given_secondary_address_and_cu_up_role_when_config_changed_then_status_is_blocked(
+        self,
+    ):
+        self.harness.set_can_connect(container="cu", val=True)
+
+        self.harness.update_config(
+            {
+                "role": "cu-up",
+                "ngu-ip-address": "192.168.252.5/24",
+                "ngu-host-interface": "ens6",
+            }
+        )
+
+        self.assertEqual(
+            self.harness.model.unit.status,
+            BlockedStatus("The following configurations are not valid: ['ngu-ip-address']"),
+        )
+
+    @patch("lightkube.Client.patch")
+    def test_given_invalid_network_config_when_statefulset_patched_then_nothing_is_applied(
+        self, patch_k8s_patch
+    ):
+        self.harness.update_config({"ngu-ip-address": "192.168.252.5/24"})
+
+        self.harness.charm._patch_statefulset()
+
+        patch_k8s_patch.assert_not_called()
+        self.assertTrue(self.harness.charm._stored.statefulset_patch_pending)
+
+    @patch("lightkube.Client.delete")
+    def test_given_last_unit_when_remove_then_network_attachment_definitions_are_deleted(
+        self, patch_k8s_delete
+    ):
+        self.harness.set_planned_units(0)
+
+        self.harness.charm.on.remove.emit()
+
+        self.assertEqual(
+            [call.args[1] for call in patch_k8s_delete.call_args_list],
+            ["oai-5g-cu-f1u", "oai-5g-cu-ngu"],
+        )
+
+    @patch("lightkube.Client.delete")
+    def test_given_other_units_remain_when_remove_then_network_attachment_definitions_are_kept(
+        self, patch_k8s_delete
+    ):
+        self.harness.set_planned_units(1)
+
+        self.harness.charm.on.remove.emit()
+
+        patch_k8s_delete.assert_not_called()
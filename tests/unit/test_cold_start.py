@@ -0,0 +1,97 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Hook cold-start budget.
+
+Each hook runs in a fresh interpreter, so the cost of importing the charm module dominates
+hooks that have no work to do such as `update-status`. The measurements run in a subprocess
+to start from a cold interpreter. Wall-clock budgets depend on the load of the machine, so
+they are only enforced by `tox -e benchmark`, which sets `ENFORCE_COLD_START_BUDGETS`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from typing import List
+
+REPOSITORY_ROOT = Path(__file__).parents[2]
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+UPDATE_STATUS_HOOK_BUDGET_SECONDS = 2.0
+RUNS = 3
+ENFORCE_BUDGETS = bool(os.environ.get("ENFORCE_COLD_START_BUDGETS"))
+
+MEASUREMENT_SCRIPT = """
+import json
+import sys
+import time
+
+sys.path[:0] = {paths!r}
+start = time.perf_counter()
+import charm
+import_time = time.perf_counter() - start
+
+from ops.testing import Harness
+
+start = time.perf_counter()
+harness = Harness(charm.Oai5GCUOperatorCharm)
+harness.begin()
+harness.charm.on.update_status.emit()
+hook_time = time.perf_counter() - start + import_time
+
+print(
+    json.dumps(
+        {{
+            "import_time": import_time,
+            "hook_time": hook_time,
+            "modules": sorted(sys.modules),
+        }}
+    )
+)
+"""
+
+
+def _measure_cold_start() -> dict:
+    paths = [str(REPOSITORY_ROOT / "src"), str(REPOSITORY_ROOT / "lib"), str(REPOSITORY_ROOT)]
+    output = subprocess.run(
+        [sys.executable, "-c", MEASUREMENT_SCRIPT.format(paths=paths)],
+        capture_output=True,
+        check=True,
+        cwd=REPOSITORY_ROOT,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+class TestColdStart(unittest.TestCase):
+    measurements: List[dict]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.measurements = [_measure_cold_start() for _ in range(RUNS)]
+
+    @unittest.skipUnless(ENFORCE_BUDGETS, "wall-clock budgets are enforced by tox -e benchmark")
+    def test_given_update_status_hook_when_charm_is_imported_then_import_time_is_within_budget(
+        self,
+    ):
+        import_time = min(measurement["import_time"] for measurement in self.measurements)
+        print(f"Charm import time: {import_time:.3f}s")
+
+        self.assertLess(import_time, IMPORT_TIME_BUDGET_SECONDS)
+
+    @unittest.skipUnless(ENFORCE_BUDGETS, "wall-clock budgets are enforced by tox -e benchmark")
+    def test_given_update_status_hook_when_dispatched_then_hook_time_is_within_budget(self):
+        hook_time = min(measurement["hook_time"] for measurement in self.measurements)
+        print(f"update-status cold-start time: {hook_time:.3f}s")
+
+        self.assertLess(hook_time, UPDATE_STATUS_HOOK_BUDGET_SECONDS)
+
+    def test_given_update_status_hook_when_dispatched_then_jinja2_and_lightkube_are_not_imported(  # noqa: E501
+        self,
+    ):
+        modules = self.measurements[0]["modules"]
+
+        self.assertNotIn("jinja2", modules)
+        self.assertNotIn("lightkube", modules)
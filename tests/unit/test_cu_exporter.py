@@ -0,0 +1,144 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import os
+import tempfile
+import unittest
+from typing import Optional, Tuple
+
+from cu_exporter import StatsSource, collect, parse_process_stat, render
+
+RRC_STATS = """2 connected DUs
+[1] DU ID 3584 (du0) assoc_id 1: nrCellID 12345678, PCI 0
+[2] DU ID 3585 (du1) assoc_id 2: nrCellID 12345679, PCI 1
+UE 0 CU UE ID 1 DU UE ID 44354 RNTI ad42 random identity 4f1e2e5d5c00000 S-TMSI 0:
+    last RRC activity: 1 seconds ago
+    PDU session 0 ID 1 status established
+UE 1 CU UE ID 2 DU UE ID 26389 RNTI 6715 random identity 1c9e31ec7b00000 S-TMSI 0:
+    last RRC activity: 3 seconds ago
+    PDU session 0 ID 1 status established
+    PDU session 1 ID 2 status established
+"""
+NET_DEV = """Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:     100       1    0    0    0     0          0         0      100       1    0    0    0     0       0          0
+  eth0: 1000000    2000    0    0    0     0          0         0  3000000     4000    0    0    0     0       0          0
+  net1:  500000    1000    0    0    0     0          0         0   600000     1200    0    0    0     0       0          0
+"""  # noqa: E501
+PROCESS_STAT = (
+    "42 (nr-softmodem) S 1 42 42 0 -1 4194560 1000 0 0 0 250 150 0 0 20 0 30 0 100 "
+    "1000000000 2048 18446744073709551615 0 0 0 0 0 0 0 0 0 0 0 0 17 3 0 0 0 0 0"
+)
+PROCESS_STATUS = "Name:\tnr-softmodem\nVmRSS:\t  409600 kB\n"
+
+
+class FakeStatsSource:
+    """Stats source serving fixed content instead of reading the filesystem."""
+
+    def __init__(
+        self,
+        rrc_stats: Optional[str] = RRC_STATS,
+        net_dev: Optional[str] = NET_DEV,
+        process_stat: Optional[Tuple[str, str]] = (PROCESS_STAT, PROCESS_STATUS),
+    ):
+        """Serves the given content."""
+        self.rrc_stats = rrc_stats
+        self.net_dev = net_dev
+        self.process_stat = process_stat
+
+    def read_rrc_stats(self) -> Optional[str]:
+        return self.rrc_stats
+
+    def read_net_dev(self) -> Optional[str]:
+        return self.net_dev
+
+    def read_process_stat(self) -> Optional[Tuple[str, str]]:
+        return self.process_stat
+
+
+class TestCUExporter(unittest.TestCase):
+    def test_given_softmodem_stats_when_collect_then_cu_kpis_are_rendered(self):
+        metrics = collect(FakeStatsSource(), f1u_interface="net1", ngu_interface="eth0")  # type: ignore[arg-type]  # noqa: E501
+
+        exposition = render(metrics)
+
+        self.assertIn("oai_cu_connected_dus 2\n", exposition)
+        self.assertIn("oai_cu_rrc_connected_ues 2\n", exposition)
+        self.assertIn("oai_cu_pdu_sessions 3\n", exposition)
+        self.assertIn(
+            'oai_cu_interface_packets_total{endpoint="f1u",interface="net1",direction="rx"} 1000\n',  # noqa: E501
+            exposition,
+        )
+        self.assertIn(
+            'oai_cu_interface_bytes_total{endpoint="ngu",interface="eth0",direction="tx"} 3000000\n',  # noqa: E501
+            exposition,
+        )
+        self.assertIn("# TYPE oai_cu_process_cpu_seconds_total counter\n", exposition)
+        self.assertIn("oai_cu_process_resident_memory_bytes 419430400\n", exposition)
+
+    def test_given_softmodem_not_started_when_collect_then_only_interface_metrics_are_rendered(
+        self,
+    ):
+        metrics = collect(
+            FakeStatsSource(rrc_stats=None, process_stat=None),  # type: ignore[arg-type]
+            f1u_interface="eth0",
+            ngu_interface="eth0",
+        )
+
+        self.assertEqual(
+            [metric.name for metric in metrics],
+            ["oai_cu_interface_packets_total", "oai_cu_interface_bytes_total"],
+        )
+
+    def test_given_f1u_and_ngu_on_same_interface_when_collect_then_interface_is_exported_once(
+        self,
+    ):
+        metrics = collect(
+            FakeStatsSource(rrc_stats=None, process_stat=None),  # type: ignore[arg-type]
+            f1u_interface="eth0",
+            ngu_interface="eth0",
+        )
+
+        self.assertEqual(
+            metrics[0].samples,
+            [
+                ({"endpoint": "f1u,ngu", "interface": "eth0", "direction": "rx"}, 2000),
+                ({"endpoint": "f1u,ngu", "interface": "eth0", "direction": "tx"}, 4000),
+            ],
+        )
+
+    def test_given_du_list_without_count_when_collect_then_du_lines_are_counted(self):
+        rrc_stats = "[1] DU ID 3584 (du0) assoc_id 1\n"
+
+        metrics = collect(
+            FakeStatsSource(rrc_stats=rrc_stats, net_dev=None, process_stat=None),  # type: ignore[arg-type]  # noqa: E501
+            f1u_interface="eth0",
+            ngu_interface="eth0",
+        )
+
+        self.assertIn("oai_cu_connected_dus 1\n", render(metrics))
+
+    def test_given_process_stat_when_parse_process_stat_then_user_and_system_time_are_summed(
+        self,
+    ):
+        process_stats = parse_process_stat(
+            PROCESS_STAT, status="", clock_ticks=100, page_size=4096
+        )
+
+        self.assertEqual(process_stats.cpu_seconds, 4.0)
+        self.assertEqual(process_stats.resident_memory_bytes, 2048 * 4096)
+
+    def test_given_cu_up_process_when_read_process_stat_then_nr_cuup_stat_is_returned(self):
+        with tempfile.TemporaryDirectory() as proc_directory:
+            for pid, name in [("42", "nr-softmodem"), ("43", "nr-cuup")]:
+                os.makedirs(os.path.join(proc_directory, pid))
+                for file_name, content in [("comm", f"{name}\n"), ("stat", pid), ("status", name)]:
+                    with open(os.path.join(proc_directory, pid, file_name), "w") as file:
+                        file.write(content)
+            source = StatsSource(
+                stats_directory=proc_directory,
+                process_name="nr-cuup",
+                proc_directory=proc_directory,
+            )
+
+            self.assertEqual(source.read_process_stat(), ("43", "nr-cuup"))
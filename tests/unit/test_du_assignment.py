@@ -0,0 +1,36 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import unittest
+from collections import Counter
+
+from du_assignment import assign_dus
+
+DUS = [str(relation_id) for relation_id in range(20)]
+UNITS = ["oai-5g-cu/0", "oai-5g-cu/1", "oai-5g-cu/2"]
+
+
+class TestDUAssignment(unittest.TestCase):
+    def test_given_dus_and_units_when_assign_dus_then_assignment_does_not_depend_on_input_order(
+        self,
+    ):
+        self.assertEqual(assign_dus(DUS, UNITS), assign_dus(reversed(DUS), list(reversed(UNITS))))
+
+    def test_given_more_dus_than_units_when_assign_dus_then_no_unit_serves_more_than_its_share(
+        self,
+    ):
+        loads = Counter(assign_dus(DUS, UNITS).values())
+
+        self.assertEqual(set(loads), set(UNITS))
+        self.assertLessEqual(max(loads.values()), 7)
+
+    def test_given_unit_added_when_assign_dus_then_most_dus_stay_on_their_unit(self):
+        assignments = assign_dus(DUS, UNITS)
+
+        new_assignments = assign_dus(DUS, UNITS + ["oai-5g-cu/3"])
+
+        moved_dus = [du for du in DUS if assignments[du] != new_assignments[du]]
+        self.assertLess(len(moved_dus), len(DUS) / 2)
+
+    def test_given_no_unit_when_assign_dus_then_no_du_is_assigned(self):
+        self.assertEqual(assign_dus(DUS, []), {})
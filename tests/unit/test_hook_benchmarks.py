@@ -0,0 +1,303 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+"""Hook performance benchmarks.
+
+Drives the charm through its events with the ops Harness and records, for each event, the wall
+time and the number of Kubernetes API calls, Pebble calls and relation data reads and writes.
+Set `HOOK_BENCHMARK_OUTPUT` to a file path (as `tox -e benchmark` does) to write the results as
+JSON so that they can be compared across versions.
+"""
+
+import json
+import os
+import time
+import unittest
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional
+from unittest.mock import patch
+
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import (
+    Container,
+    LoadBalancerIngress,
+    LoadBalancerStatus,
+    PodSecurityContext,
+    PodSpec,
+    PodTemplateSpec,
+    SecurityContext,
+    Service,
+    ServiceSpec,
+)
+from lightkube.models.core_v1 import ServiceStatus as K8sServiceStatus
+from lightkube.models.meta_v1 import LabelSelector
+from lightkube.resources.apps_v1 import StatefulSet
+from ops import model
+from ops.testing import Harness
+
+from charm import Oai5GCUOperatorCharm
+from kubernetes_client import get_lightkube_client
+
+KUBERNETES_API_CALLS = ["get", "list", "watch", "patch", "apply", "create", "delete", "replace"]
+PEBBLE_CALLS = [
+    "can_connect",
+    "get_plan",
+    "add_layer",
+    "replan",
+    "start",
+    "stop",
+    "restart",
+    "get_service",
+    "get_services",
+    "get_check",
+    "get_checks",
+    "push",
+    "pull",
+    "exists",
+    "list_files",
+    "make_dir",
+    "remove_path",
+    "exec",
+]
+FAN_OUT_DU_COUNTS = [1, 10]
+RESULTS: List["EventMeasurement"] = []
+
+
+@dataclass
+class EventMeasurement:
+    """Cost of handling a single event."""
+
+    scenario: str
+    event: str
+    wall_time: float
+    kubernetes_api_calls: int
+    pebble_calls: int
+    relation_data_reads: int
+    relation_data_writes: int
+    error: Optional[str] = None
+
+
+class CallCounter:
+    """Counts the calls made to methods of a class while still calling them."""
+
+    def __init__(self):
+        """Starts counting from zero."""
+        self.count = 0
+
+    def wrap(self, method: Callable, only_in_hook: bool = False) -> Callable:
+        """Returns `method` wrapped so that its calls are counted.
+
+        With `only_in_hook`, the method must be one of the Harness model backend and the calls
+        made by the Harness itself outside of an event (e.g. to update remote relation data)
+        are not counted.
+        """
+
+        def wrapper(*args, **kwargs):
+            if not only_in_hook or args[0]._hook_is_running:
+                self.count += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+
+def _load_balancer_service() -> Service:
+    return Service(
+        spec=ServiceSpec(type="LoadBalancer"),
+        status=K8sServiceStatus(
+            loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip="1.2.3.4")])
+        ),
+    )
+
+
+def _patched_statefulset() -> StatefulSet:
+    return StatefulSet(
+        spec=StatefulSetSpec(
+            selector=LabelSelector(),
+            serviceName="oai-5g-cu",
+            template=PodTemplateSpec(
+                spec=PodSpec(
+                    containers=[
+                        Container(name="charm"),
+                        Container(name="cu", securityContext=SecurityContext(privileged=True)),
+                    ],
+                    securityContext=PodSecurityContext(runAsUser=0, runAsGroup=0),
+                )
+            ),
+        )
+    )
+
+
+def _kubernetes_get(res, *args, **kwargs):
+    if res is StatefulSet:
+        return _patched_statefulset()
+    return _load_balancer_service()
+
+
+class TestHookBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(get_lightkube_client.cache_clear)
+        exit_stack = ExitStack()
+        self.addCleanup(exit_stack.close)
+        exit_stack.enter_context(patch("lightkube.core.client.GenericSyncClient"))
+        exit_stack.enter_context(patch("kubernetes_client.KubernetesClient.patch_service"))
+        self.kubernetes_counter = CallCounter()
+        for method_name in KUBERNETES_API_CALLS:
+            exit_stack.enter_context(
+                patch(
+                    f"lightkube.Client.{method_name}",
+                    side_effect=self.kubernetes_counter.wrap(
+                        _kubernetes_get if method_name == "get" else lambda *args, **kwargs: None
+                    ),
+                )
+            )
+        self.pebble_counter = CallCounter()
+        for method_name in PEBBLE_CALLS:
+            method = getattr(model.Container, method_name)
+            exit_stack.enter_context(
+                patch.object(model.Container, method_name, self.pebble_counter.wrap(method))
+            )
+        self._begin_harness()
+        self.relation_reads_counter = CallCounter()
+        self.relation_writes_counter = CallCounter()
+        backend_class = type(self.harness._backend)
+        exit_stack.enter_context(
+            patch.object(
+                backend_class,
+                "relation_get",
+                self.relation_reads_counter.wrap(backend_class.relation_get, only_in_hook=True),
+            )
+        )
+        exit_stack.enter_context(
+            patch.object(
+                backend_class,
+                "update_relation_data",
+                self.relation_writes_counter.wrap(
+                    backend_class.update_relation_data, only_in_hook=True
+                ),
+            )
+        )
+
+    def _begin_harness(self) -> None:
+        self.harness = Harness(Oai5GCUOperatorCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.set_model_name(name="whatever")
+        self.harness.set_leader(True)
+        self.harness.add_storage(storage_name="config", attach=True)
+        self.harness.begin()
+        self.harness.set_can_connect(container="cu", val=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        output_path = os.environ.get("HOOK_BENCHMARK_OUTPUT")
+        if not output_path:
+            return
+        with open(output_path, "w") as output_file:
+            json.dump([asdict(measurement) for measurement in RESULTS], output_file, indent=2)
+
+    def _measure(self, scenario: str, event: str, trigger: Callable[[], None]) -> EventMeasurement:
+        counters = [
+            self.kubernetes_counter,
+            self.pebble_counter,
+            self.relation_reads_counter,
+            self.relation_writes_counter,
+        ]
+        for counter in counters:
+            counter.count = 0
+        error = None
+        start = time.perf_counter()
+        try:
+            trigger()
+        except Exception as e:
+            error = type(e).__name__
+        wall_time = time.perf_counter() - start
+        measurement = EventMeasurement(
+            scenario=scenario,
+            event=event,
+            wall_time=wall_time,
+            kubernetes_api_calls=self.kubernetes_counter.count,
+            pebble_calls=self.pebble_counter.count,
+            relation_data_reads=self.relation_reads_counter.count,
+            relation_data_writes=self.relation_writes_counter.count,
+            error=error,
+        )
+        RESULTS.append(measurement)
+        return measurement
+
+    def _add_amf_relation(self, scenario: str) -> List[EventMeasurement]:
+        relation_id = self.harness.add_relation("fiveg-n2", "amf")
+        return [
+            self._measure(
+                scenario,
+                "fiveg-n2-relation-joined",
+                lambda: self.harness.add_relation_unit(relation_id, "amf/0"),
+            ),
+            self._measure(
+                scenario,
+                "fiveg-n2-relation-changed",
+                lambda: self.harness.update_relation_data(
+                    relation_id, "amf", {"amf_address": "5.6.7.8"}
+                ),
+            ),
+        ]
+
+    def _add_du_relation(self, scenario: str, du_index: int) -> List[EventMeasurement]:
+        du_app = f"du{du_index}"
+        relation_id = self.harness.add_relation("fiveg-f1", du_app)
+        return [
+            self._measure(
+                scenario,
+                "fiveg-f1-relation-joined",
+                lambda: self.harness.add_relation_unit(relation_id, f"{du_app}/0"),
+            ),
+            self._measure(
+                scenario,
+                "fiveg-f1-relation-changed",
+                lambda: self.harness.update_relation_data(
+                    relation_id,
+                    du_app,
+                    {"du_address": f"10.0.0.{du_index + 1}", "du_port": "2152"},
+                ),
+            ),
+        ]
+
+    def test_given_no_relations_when_install_then_hook_cost_is_recorded(self):
+        measurement = self._measure("install", "install", self.harness.charm.on.install.emit)
+
+        self.assertIsNone(measurement.error)
+        self.assertEqual(measurement.kubernetes_api_calls, 1)
+
+    def test_given_relations_created_when_relation_events_then_hook_cost_is_recorded(self):
+        measurements = self._add_amf_relation("relations")
+        measurements += self._add_du_relation("relations", du_index=0)
+
+        for measurement in measurements:
+            self.assertIsNone(measurement.error, measurement.event)
+
+    def test_given_cu_configured_when_config_changed_then_no_kubernetes_call_is_repeated(self):
+        self._add_amf_relation("steady-state")
+        self._add_du_relation("steady-state", du_index=0)
+
+        measurement = self._measure(
+            "steady-state", "config-changed", lambda: self.harness.update_config({})
+        )
+
+        self.assertIsNone(measurement.error)
+        self.assertLessEqual(measurement.kubernetes_api_calls, 1)
+
+    def test_given_many_dus_when_relations_created_then_hook_cost_is_recorded(self):
+        for du_count in FAN_OUT_DU_COUNTS:
+            with self.subTest(du_count=du_count):
+                self._begin_harness()
+                scenario = f"fan-out-{du_count}-du"
+                measurements = self._add_amf_relation(scenario)
+                for du_index in range(du_count):
+                    measurements += self._add_du_relation(scenario, du_index=du_index)
+                measurements.append(
+                    self._measure(
+                        scenario, "config-changed", lambda: self.harness.update_config({})
+                    )
+                )
+
+                for measurement in measurements:
+                    self.assertIsNone(measurement.error, measurement.event)
@@ -0,0 +1,74 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import unittest
+from typing import List, Sequence
+
+from instrumentation import Span, SpanExporter, Tracer
+
+
+class RecordingSpanExporter(SpanExporter):
+    def __init__(self):
+        """Records the exported spans."""
+        self.exports: List[Sequence[Span]] = []
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.exports.append(spans)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.exporter = RecordingSpanExporter()
+        self.tracer = Tracer(exporter=self.exporter)
+
+    def test_given_nested_spans_when_outermost_span_ends_then_spans_of_the_trace_are_exported_once(  # noqa: E501
+        self,
+    ):
+        with self.tracer.span("hook") as hook_span:
+            with self.tracer.span("render", path="gnb.conf") as render_span:
+                render_span.outcome = "unchanged"
+            self.assertEqual(self.exporter.exports, [])
+
+        self.assertEqual(self.exporter.exports, [[render_span, hook_span]])
+        self.assertEqual(render_span.parent_span_id, hook_span.span_id)
+        self.assertEqual(render_span.trace_id, hook_span.trace_id)
+        self.assertIsNone(hook_span.parent_span_id)
+        self.assertEqual(render_span.attributes, {"path": "gnb.conf"})
+        self.assertGreaterEqual(hook_span.duration_ns, render_span.duration_ns)
+
+    def test_given_phase_raises_when_span_ends_then_outcome_is_error_and_exception_is_propagated(  # noqa: E501
+        self,
+    ):
+        with self.assertRaises(ConnectionError):
+            with self.tracer.span("hook"):
+                raise ConnectionError()
+
+        span = self.exporter.exports[0][0]
+        self.assertEqual(span.outcome, "error")
+        self.assertEqual(span.attributes["exception"], "ConnectionError")
+
+    def test_given_span_when_it_ends_then_structured_log_line_is_emitted(self):
+        with self.assertLogs("instrumentation", level="INFO") as logs:
+            with self.tracer.span("pebble_layer_update", services=["cu"]) as span:
+                span.outcome = "replanned"
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["span"], "pebble_layer_update")
+        self.assertEqual(record["outcome"], "replanned")
+        self.assertEqual(record["services"], ["cu"])
+        self.assertIn("duration_ms", record)
+
+    def test_given_exporter_fails_when_span_ends_then_error_is_not_propagated(self):
+        self.exporter.export = lambda spans: 1 / 0  # type: ignore[assignment]
+
+        with self.tracer.span("hook"):
+            pass
+
+    def test_given_no_exporter_when_span_ends_then_spans_are_dropped(self):
+        tracer = Tracer()
+
+        with tracer.span("hook") as span:
+            pass
+
+        self.assertEqual(span.outcome, "ok")
@@ -0,0 +1,332 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import json
+import unittest
+from unittest.mock import patch
+
+from lightkube.core.exceptions import ApiError
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import (
+    Container,
+    EmptyDirVolumeSource,
+    LoadBalancerIngress,
+    LoadBalancerStatus,
+    PodSecurityContext,
+    PodSpec,
+    PodTemplateSpec,
+    ResourceRequirements,
+    SecurityContext,
+    Service,
+    ServicePort,
+    ServiceSpec,
+)
+from lightkube.models.core_v1 import ServiceStatus as K8sServiceStatus
+from lightkube.models.core_v1 import Volume, VolumeMount
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta, Status
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.core_v1 import Service as ServiceResource
+from lightkube.types import PatchType
+
+from kubernetes_client import KubernetesClient, get_lightkube_client
+
+
+class TestKubernetesClient(unittest.TestCase):
+    def setUp(self):
+        self.namespace = "whatever"
+        self.addCleanup(get_lightkube_client.cache_clear)
+
+    def _load_balancer_service(self, ip: str) -> Service:
+        return Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(
+                loadBalancer=LoadBalancerStatus(ingress=[LoadBalancerIngress(ip=ip)])
+            ),
+        )
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.get")
+    def test_given_cache_disabled_when_get_service_load_balancer_address_twice_then_service_is_fetched_twice(  # noqa: E501
+        self, patch_get, _
+    ):
+        patch_get.return_value = self._load_balancer_service(ip="1.2.3.4")
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        kubernetes.get_service_load_balancer_address(name="cu")
+        kubernetes.get_service_load_balancer_address(name="cu")
+
+        self.assertEqual(patch_get.call_count, 2)
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.get")
+    def test_given_cache_enabled_when_get_service_load_balancer_address_twice_then_service_is_fetched_once(  # noqa: E501
+        self, patch_get, _
+    ):
+        patch_get.return_value = self._load_balancer_service(ip="1.2.3.4")
+        kubernetes = KubernetesClient(namespace=self.namespace, cache_ttl=30)
+
+        first_address = kubernetes.get_service_load_balancer_address(name="cu")
+        second_address = kubernetes.get_service_load_balancer_address(name="cu")
+
+        patch_get.assert_called_once()
+        self.assertEqual(first_address, second_address)
+        self.assertEqual(kubernetes.cache_misses, 1)
+        self.assertEqual(kubernetes.cache_hits, 1)
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("kubernetes_client.time.monotonic")
+    @patch("lightkube.Client.get")
+    def test_given_cache_entry_expired_when_get_service_load_balancer_address_then_service_is_fetched_again(  # noqa: E501
+        self, patch_get, patch_monotonic, _
+    ):
+        patch_get.return_value = self._load_balancer_service(ip="1.2.3.4")
+        patch_monotonic.side_effect = [0, 31, 31]
+        kubernetes = KubernetesClient(namespace=self.namespace, cache_ttl=30)
+
+        kubernetes.get_service_load_balancer_address(name="cu")
+        kubernetes.get_service_load_balancer_address(name="cu")
+
+        self.assertEqual(patch_get.call_count, 2)
+        self.assertEqual(kubernetes.cache_misses, 2)
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_service_cached_when_load_balancer_service_applied_then_service_is_fetched_again(  # noqa: E501
+        self, patch_get, _, __
+    ):
+        patch_get.return_value = self._load_balancer_service(ip="1.2.3.4")
+        kubernetes = KubernetesClient(namespace=self.namespace, cache_ttl=30)
+        kubernetes.get_service_load_balancer_address(name="cu-0")
+
+        kubernetes.apply_load_balancer_service(name="cu-0", selector={}, ports=[])
+        kubernetes.get_service_load_balancer_address(name="cu-0")
+
+        self.assertEqual(patch_get.call_count, 2)
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_service_ports_differ_when_patch_service_then_ports_are_merge_patched(
+        self, patch_get, patch_patch, _
+    ):
+        patch_get.return_value = Service(
+            spec=ServiceSpec(type="ClusterIP", ports=[ServicePort(port=65535)])
+        )
+        ports = [{"name": "f1", "port": 2153, "protocol": "UDP", "targetPort": 2153}]
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        patched = kubernetes.patch_service(name="cu", ports=ports, service_type="LoadBalancer")
+
+        self.assertTrue(patched)
+        patch_patch.assert_called_once_with(
+            ServiceResource,
+            "cu",
+            {"spec": {"type": "LoadBalancer", "ports": ports}},
+            patch_type=PatchType.MERGE,
+            namespace=self.namespace,
+        )
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.patch")
+    @patch("lightkube.Client.get")
+    def test_given_service_already_patched_when_patch_service_then_service_is_not_patched(
+        self, patch_get, patch_patch, _
+    ):
+        patch_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer", ports=[ServicePort(port=2153, targetPort=2153)])
+        )
+        ports = [{"name": "f1", "port": 2153, "protocol": "UDP", "targetPort": 2153}]
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        patched = kubernetes.patch_service(name="cu", ports=ports, service_type="LoadBalancer")
+
+        self.assertFalse(patched)
+        patch_patch.assert_not_called()
+
+    @patch("lightkube.Client")
+    def test_given_no_api_call_made_when_kubernetes_client_created_then_lightkube_client_is_not_created(  # noqa: E501
+        self, patch_client
+    ):
+        KubernetesClient(namespace=self.namespace)
+
+        patch_client.assert_not_called()
+
+    @patch("lightkube.Client")
+    def test_given_two_kubernetes_clients_when_client_used_then_lightkube_client_is_shared(  # noqa: E501
+        self, patch_client
+    ):
+        first_kubernetes_client = KubernetesClient(namespace=self.namespace)
+        second_kubernetes_client = KubernetesClient(namespace=self.namespace)
+
+        self.assertIs(first_kubernetes_client.client, second_kubernetes_client.client)
+        patch_client.assert_called_once()
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.watch")
+    @patch("lightkube.Client.get")
+    def test_given_load_balancer_has_no_ingress_when_address_assigned_while_watching_then_address_is_returned(  # noqa: E501
+        self, patch_get, patch_watch, _
+    ):
+        patch_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(loadBalancer=LoadBalancerStatus(ingress=[])),
+        )
+        patch_watch.return_value = iter([("MODIFIED", self._load_balancer_service(ip="1.2.3.4"))])
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        hostname, ip = kubernetes.wait_for_service_load_balancer_address(name="cu", timeout=5)
+
+        self.assertEqual(ip, "1.2.3.4")
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.watch")
+    @patch("lightkube.Client.get")
+    def test_given_load_balancer_has_ingress_when_wait_for_address_then_service_is_not_watched(  # noqa: E501
+        self, patch_get, patch_watch, _
+    ):
+        patch_get.return_value = self._load_balancer_service(ip="1.2.3.4")
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        hostname, ip = kubernetes.wait_for_service_load_balancer_address(name="cu", timeout=5)
+
+        self.assertEqual(ip, "1.2.3.4")
+        patch_watch.assert_not_called()
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.watch")
+    @patch("lightkube.Client.get")
+    def test_given_address_not_assigned_when_watch_ends_then_none_is_returned(
+        self, patch_get, patch_watch, _
+    ):
+        patch_get.return_value = Service(
+            spec=ServiceSpec(type="LoadBalancer"),
+            status=K8sServiceStatus(loadBalancer=LoadBalancerStatus(ingress=[])),
+        )
+        patch_watch.return_value = iter([])
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        hostname, ip = kubernetes.wait_for_service_load_balancer_address(name="cu", timeout=5)
+
+        self.assertIsNone(ip)
+
+    def test_given_statefulset_has_hugepages_volume_when_statefulset_is_patched_then_hugepages_page_size_is_compared(  # noqa: E501
+        self,
+    ):
+        statefulset = StatefulSet(
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="cu",
+                template=PodTemplateSpec(
+                    spec=PodSpec(
+                        containers=[
+                            Container(
+                                name="cu",
+                                securityContext=SecurityContext(privileged=True),
+                                volumeMounts=[
+                                    VolumeMount(name="hugepages", mountPath="/dev/hugepages")
+                                ],
+                            )
+                        ],
+                        securityContext=PodSecurityContext(runAsUser=0, runAsGroup=0),
+                        volumes=[
+                            Volume(
+                                name="hugepages",
+                                emptyDir=EmptyDirVolumeSource(medium="HugePages-2Mi"),
+                            )
+                        ],
+                    )
+                ),
+            )
+        )
+
+        self.assertTrue(
+            KubernetesClient._statefulset_is_patched(
+                statefulset, container_name="cu", hugepages_page_size="2Mi"
+            )
+        )
+        self.assertFalse(
+            KubernetesClient._statefulset_is_patched(
+                statefulset, container_name="cu", hugepages_page_size="1Gi"
+            )
+        )
+        self.assertFalse(
+            KubernetesClient._statefulset_is_patched(statefulset, container_name="cu")
+        )
+
+    @patch("lightkube.core.client.GenericSyncClient")
+    @patch("lightkube.Client.delete")
+    def test_given_service_does_not_exist_when_delete_service_then_no_error_is_raised(
+        self, patch_delete, _
+    ):
+        patch_delete.side_effect = ApiError(status=Status(code=404, message="not found"))
+        kubernetes = KubernetesClient(namespace=self.namespace)
+
+        kubernetes.delete_service(name="cu-0")
+
+        patch_delete.assert_called_once_with(ServiceResource, "cu-0", namespace=self.namespace)
+
+    def test_given_statefulset_has_networks_annotation_when_statefulset_is_patched_then_networks_are_compared(  # noqa: E501
+        self,
+    ):
+        networks = [{"name": "cu-f1u", "interface": "f1u", "ips": ["192.168.251.5/24"]}]
+        statefulset = StatefulSet(
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="cu",
+                template=PodTemplateSpec(
+                    metadata=ObjectMeta(
+                        annotations={"k8s.v1.cni.cncf.io/networks": json.dumps(networks)}
+                    ),
+                    spec=PodSpec(
+                        containers=[
+                            Container(name="cu", securityContext=SecurityContext(privileged=True))
+                        ],
+                        securityContext=PodSecurityContext(runAsUser=0, runAsGroup=0),
+                    ),
+                ),
+            )
+        )
+
+        self.assertTrue(
+            KubernetesClient._statefulset_is_patched(
+                statefulset, container_name="cu", networks=networks
+            )
+        )
+        self.assertFalse(
+            KubernetesClient._statefulset_is_patched(statefulset, container_name="cu")
+        )
+
+    def test_given_charm_container_without_resources_when_statefulset_is_patched_then_resources_differ(  # noqa: E501
+        self,
+    ):
+        resources = {"cpu": "2", "memory": "4Gi"}
+        statefulset = StatefulSet(
+            spec=StatefulSetSpec(
+                selector=LabelSelector(),
+                serviceName="cu",
+                template=PodTemplateSpec(
+                    spec=PodSpec(
+                        containers=[
+                            Container(name="charm"),
+                            Container(
+                                name="cu",
+                                securityContext=SecurityContext(privileged=True),
+                                resources=ResourceRequirements(
+                                    requests=resources, limits=resources
+                                ),
+                            ),
+                        ],
+                        initContainers=[Container(name="charm-init")],
+                        securityContext=PodSecurityContext(runAsUser=0, runAsGroup=0),
+                    ),
+                ),
+            )
+        )
+
+        self.assertFalse(
+            KubernetesClient._statefulset_is_patched(
+                statefulset, container_name="cu", resources=resources
+            )
+        )
+        self.assertTrue(KubernetesClient._statefulset_is_patched(statefulset, container_name="cu"))
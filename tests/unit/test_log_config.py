@@ -0,0 +1,32 @@
+# Copyright 2023 Guillaume Belanger
+# See LICENSE file for licensing details.
+
+import unittest
+
+from log_config import log_levels, parse_log_level_overrides
+
+
+class TestLogConfig(unittest.TestCase):
+    def test_given_valid_overrides_when_parse_log_level_overrides_then_level_by_layer_is_returned(  # noqa: E501
+        self,
+    ):
+        self.assertEqual(
+            parse_log_level_overrides("rlc=debug, f1ap = info,"), {"rlc": "debug", "f1ap": "info"}
+        )
+
+    def test_given_unknown_layer_when_parse_log_level_overrides_then_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            parse_log_level_overrides("sdap=debug")
+
+    def test_given_unknown_level_when_parse_log_level_overrides_then_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            parse_log_level_overrides("rlc=verbose")
+
+    def test_given_custom_profile_when_log_levels_then_overrides_apply_to_production_levels(self):
+        levels = log_levels("custom", "rlc=debug")
+
+        self.assertEqual(levels["rlc"], "debug")
+        self.assertEqual(levels["pdcp"], "warn")
+
+    def test_given_production_profile_when_log_levels_then_overrides_are_ignored(self):
+        self.assertEqual(log_levels("production", "rlc=debug")["rlc"], "warn")